@@ -0,0 +1,4 @@
+"""
+SSMS Benchmarks
+Synthetic data generation and headless timing of the tab loaders and reports
+"""
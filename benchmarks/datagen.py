@@ -0,0 +1,238 @@
+"""
+Synthetic Data Generator for SSMS Benchmarks
+Deterministic, skewed datasets bulk-loaded straight into the schema tables
+"""
+
+import logging
+import random
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from decimal import Decimal
+from itertools import accumulate
+
+from database_schema import create_tables
+from db_connection import DatabaseConnection
+from ssms.customer_stats import rebuild_customer_stats
+from ssms.migrations import MigrationRunner
+
+logger = logging.getLogger(__name__)
+
+SCALES = {
+    'tiny': {'products': 500, 'customers': 2000, 'suppliers': 50, 'sales': 20000, 'purchases': 5000},
+    'small': {'products': 5000, 'customers': 50000, 'suppliers': 200, 'sales': 500000, 'purchases': 50000},
+    'medium': {'products': 20000, 'customers': 200000, 'suppliers': 500, 'sales': 5000000,
+               'purchases': 200000},
+    'large': {'products': 100000, 'customers': 1000000, 'suppliers': 2000, 'sales': 50000000,
+              'purchases': 1000000},
+}
+
+CATEGORIES = ["Electronics", "Clothing", "Food & Beverages", "Books", "Home & Garden", "Sports"]
+UNITS = ["Pieces", "Kg", "Set", "Box", "Litre"]
+CITIES = [("Mumbai", "Maharashtra"), ("Delhi", "Delhi"), ("Bangalore", "Karnataka"),
+          ("Chennai", "Tamil Nadu"), ("Kolkata", "West Bengal"), ("Pune", "Maharashtra"),
+          ("Hyderabad", "Telangana"), ("Ahmedabad", "Gujarat")]
+CUSTOMER_TYPES = ["Individual", "Individual", "Individual", "Retail", "Business", "Wholesale"]
+SALE_PAYMENT_METHODS = ["Cash", "Cash", "Card", "Card", "UPI", "UPI", "Bank Transfer", "Cheque"]
+PURCHASE_PAYMENT_METHODS = ["Bank Transfer", "Bank Transfer", "Cheque", "Cash", "Card"]
+HISTORY_DAYS = 730
+
+# Tables emptied before loading, children first
+GENERATED_TABLES = ['customer_stats', 'purchase_demands', 'stock_movements', 'sales', 'purchases', 'products',
+                    'customers', 'suppliers']
+
+
+class ZipfSampler:
+    """Draws ranks 0..n-1 where rank r has weight 1 / (r + 1) ** exponent
+
+    A handful of best sellers and regular customers account for most sales,
+    as they do in a real shop.
+    """
+
+    def __init__(self, rng, n, exponent=1.1):
+        self.rng = rng
+        self.cumulative = list(accumulate(1 / (rank + 1) ** exponent for rank in range(n)))
+        self.total = self.cumulative[-1]
+
+    def sample(self):
+        return bisect_left(self.cumulative, self.rng.random() * self.total)
+
+
+class DataGenerator:
+    """Generates one deterministic dataset; the same scale and seed always give the same rows
+
+    Timestamps are relative to the day the data is generated, so reports over
+    the last 30 days, like the Reports tab and benchmark defaults, see the
+    busiest part of the history.
+    """
+
+    def __init__(self, scale='small', seed=42, batch_rows=5000, progress=None):
+        if scale not in SCALES:
+            raise ValueError(f"Unknown scale {scale}, choose from {', '.join(SCALES)}")
+        self.counts = SCALES[scale]
+        self.seed = seed
+        self.batch_rows = batch_rows
+        self.progress = progress or (lambda message: logger.info(message))
+        self.today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def run(self):
+        """Create the schema if needed, empty the generated tables and load them"""
+        started = time.monotonic()
+        create_tables(DatabaseConnection())
+        MigrationRunner(progress=self.progress).run()
+
+        with DatabaseConnection() as conn:
+            if conn is None:
+                raise RuntimeError("Database connection failed")
+            conn.autocommit(False)
+            with conn.cursor() as cursor:
+                cursor.execute("SET SESSION foreign_key_checks = 0")
+                cursor.execute("SET SESSION unique_checks = 0")
+                for table in GENERATED_TABLES:
+                    cursor.execute(f"TRUNCATE TABLE {table}")
+
+                rng = random.Random(self.seed)
+                prices = self._load(conn, cursor, 'products', self._products(rng))
+                self._load(conn, cursor, 'customers', self._customers(rng))
+                self._load(conn, cursor, 'suppliers', self._suppliers(rng))
+                self._load(conn, cursor, 'sales', self._sales(rng, prices))
+                self._load(conn, cursor, 'purchases', self._purchases(rng, prices))
+                self.progress(rebuild_customer_stats(cursor))
+                conn.commit()
+
+                cursor.execute("SET SESSION foreign_key_checks = 1")
+                cursor.execute("SET SESSION unique_checks = 1")
+                for table in GENERATED_TABLES:
+                    cursor.execute(f"ANALYZE TABLE {table}")
+                    cursor.fetchall()
+            conn.commit()
+
+        seconds = round(time.monotonic() - started, 1)
+        self.progress(f"Generated {sum(self.counts.values()):,} rows in {seconds}s")
+        return {"counts": dict(self.counts), "seed": self.seed, "seconds": seconds}
+
+    def _load(self, conn, cursor, table, rows):
+        """Bulk insert (columns, row iterator) in multi-row batches, one commit per batch"""
+        columns, generator, result = rows
+        sql = (
+            f"INSERT INTO {table} ({', '.join(columns)}) "
+            f"VALUES ({', '.join(['%s'] * len(columns))})"
+        )
+        total = self.counts[table]
+        started = time.monotonic()
+        batch = []
+        loaded = 0
+        for row in generator:
+            batch.append(row)
+            if len(batch) >= self.batch_rows:
+                cursor.executemany(sql, batch)
+                conn.commit()
+                loaded += len(batch)
+                batch = []
+                if loaded % (self.batch_rows * 100) == 0:
+                    self.progress(f"{table}: {loaded:,} / {total:,}")
+        if batch:
+            cursor.executemany(sql, batch)
+            conn.commit()
+            loaded += len(batch)
+        self.progress(f"{table}: {loaded:,} rows in {time.monotonic() - started:.1f}s")
+        return result
+
+    def _timestamp(self, rng):
+        """A time in the history window up to yesterday, busier towards the present and in the afternoon"""
+        day = int(HISTORY_DAYS * (1 - rng.random() ** 1.5)) + 1
+        seconds = int(rng.triangular(8 * 3600, 21 * 3600, 15 * 3600))
+        return self.today - timedelta(days=day) + timedelta(seconds=seconds)
+
+    def _products(self, rng):
+        columns = ['id', 'name', 'sku', 'category', 'description', 'purchase_price', 'selling_price',
+                   'stock_quantity', 'min_stock_level', 'unit', 'supplier', 'barcode']
+        count = self.counts['products']
+        suppliers = self.counts['suppliers']
+        prices = []
+        for product_id in range(1, count + 1):
+            cost = Decimal(round(rng.lognormvariate(5.5, 1.2), 2)).quantize(Decimal('0.01'))
+            prices.append((f"Product {product_id:06d}", cost * Decimal('1.3')))
+        rows = (
+            (
+                product_id, name, f"SKU{product_id:07d}", CATEGORIES[product_id % len(CATEGORIES)],
+                f"Synthetic product {product_id}", (price / Decimal('1.3')).quantize(Decimal('0.01')),
+                price.quantize(Decimal('0.01')), rng.randint(0, 500), rng.randint(0, 20),
+                UNITS[product_id % len(UNITS)], f"Supplier {product_id % suppliers + 1:05d}",
+                f"{8900000000000 + product_id}"
+            )
+            for product_id, (name, price) in enumerate(prices, start=1)
+        )
+        return columns, rows, prices
+
+    def _customers(self, rng):
+        columns = ['id', 'name', 'first_name', 'last_name', 'email', 'phone', 'address', 'city', 'state',
+                   'pincode', 'customer_type', 'credit_limit', 'created_at']
+        rows = (
+            (
+                customer_id, f"Customer {customer_id:07d}", "Customer", f"{customer_id:07d}",
+                f"customer{customer_id}@example.com",
+                f"9{rng.randint(100000000, 999999999)}", f"{rng.randint(1, 999)} Market Road",
+                *CITIES[rng.randrange(len(CITIES))], f"{rng.randint(110000, 799999)}",
+                rng.choice(CUSTOMER_TYPES), rng.choice([0, 5000, 10000, 50000]), self._timestamp(rng)
+            )
+            for customer_id in range(1, self.counts['customers'] + 1)
+        )
+        return columns, rows, None
+
+    def _suppliers(self, rng):
+        columns = ['id', 'name', 'contact_person', 'email', 'phone', 'city', 'state', 'payment_terms']
+        rows = (
+            (
+                supplier_id, f"Supplier {supplier_id:05d}", f"Contact {supplier_id}",
+                f"supplier{supplier_id}@example.com", f"8{rng.randint(100000000, 999999999)}",
+                *CITIES[rng.randrange(len(CITIES))], rng.choice(["Net 15", "Net 30", "Net 60"])
+            )
+            for supplier_id in range(1, self.counts['suppliers'] + 1)
+        )
+        return columns, rows, None
+
+    def _sales(self, rng, prices):
+        columns = ['customer_id', 'customer_name', 'product_id', 'product_name', 'quantity',
+                   'unit_price', 'total_amount', 'discount_amount', 'payment_method',
+                   'payment_status', 'created_at', 'sale_date']
+        products = ZipfSampler(rng, len(prices))
+        customers = ZipfSampler(rng, self.counts['customers'], exponent=0.8)
+
+        def rows():
+            for _ in range(self.counts['sales']):
+                product = products.sample()
+                customer = customers.sample() + 1
+                name, price = prices[product]
+                quantity = min(int(rng.expovariate(0.6)) + 1, 50)
+                total = (price * quantity).quantize(Decimal('0.01'))
+                discount = (total * Decimal('0.05')).quantize(Decimal('0.01')) if rng.random() < 0.1 else 0
+                payment_method = rng.choice(SALE_PAYMENT_METHODS)
+                payment_status = 'Paid' if rng.random() < 0.95 else 'Pending'
+                sold_at = self._timestamp(rng)
+                yield (
+                    customer, f"Customer {customer:07d}", product + 1, name, quantity,
+                    price.quantize(Decimal('0.01')), total - discount, discount,
+                    payment_method, payment_status, sold_at, sold_at
+                )
+        return columns, rows(), None
+
+    def _purchases(self, rng, prices):
+        columns = ['supplier_name', 'product_id', 'product_name', 'quantity', 'unit_price',
+                   'total_amount', 'purchase_date', 'payment_method', 'payment_status', 'created_at']
+        products = ZipfSampler(rng, len(prices))
+        suppliers = self.counts['suppliers']
+
+        def rows():
+            for _ in range(self.counts['purchases']):
+                product = products.sample()
+                name, price = prices[product]
+                cost = (price / Decimal('1.3')).quantize(Decimal('0.01'))
+                quantity = rng.randint(10, 500)
+                created = self._timestamp(rng)
+                yield (
+                    f"Supplier {product % suppliers + 1:05d}", product + 1, name, quantity, cost,
+                    cost * quantity, created.date(), rng.choice(PURCHASE_PAYMENT_METHODS),
+                    rng.choice(['Paid', 'Paid', 'Pending', 'Partially Paid']), created
+                )
+        return columns, rows(), None
@@ -0,0 +1,220 @@
+"""
+SSMS Benchmark Runner
+Times the real tab loaders and reports headlessly and writes JSON results
+
+Usage:
+    python -m benchmarks.run --scale small --generate --output results.json
+    python -m benchmarks.run --scale small --compare results.json
+    python -m benchmarks.run --scale tiny --backend sqlite --generate
+    python -m benchmarks.run --scale small --headless
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+
+USER_DATA = {'id': 1, 'username': 'benchmark', 'role': 'Admin'}
+
+# (tab module, tab class, methods timed on one instance)
+BENCHMARKS = [
+    ('gui.tabs.dashboard', 'DashboardTab', ['get_dashboard_stats', 'get_quick_stats', 'get_recent_sales']),
+    ('gui.tabs.sales', 'SalesTab', ['load_sales_data']),
+    ('gui.tabs.customers', 'CustomersTab', ['load_customers_data']),
+    ('gui.tabs.inventory', 'InventoryTab', ['load_products_data']),
+    ('gui.tabs.purchases', 'PurchasesTab', ['load_purchases_data', 'load_demands_data', 'load_suppliers_data']),
+    ('gui.tabs.reports', 'ReportsTab', ['load_key_metrics', 'load_financial_report']),
+]
+
+# Detailed reports rendered by ssms.report_engine, timed in-process without the worker pool
+REPORT_BENCHMARKS = ["Sales Report", "Inventory Report", "Customer Report", "Product Performance"]
+
+
+def add_arguments(parser):
+    """Benchmark options, shared with the `python -m ssms benchmark` command"""
+    parser.add_argument('--scale', default='small', help="tiny, small, medium or large")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--database', default='ssms_bench',
+                        help="database to generate into and benchmark (never the live one)")
+    parser.add_argument('--backend', default='mysql', choices=['mysql', 'sqlite'],
+                        help="sqlite uses an embedded <database>.db file, no server needed")
+    parser.add_argument('--generate', action='store_true', help="(re)generate the dataset first")
+    parser.add_argument('--repeat', type=int, default=5, help="timed runs per benchmark")
+    parser.add_argument('--filter', default=None, help="only run benchmarks whose name contains this")
+    parser.add_argument('--output', default=None, help="write results to this JSON file")
+    parser.add_argument('--compare', default=None, help="print speedups against an earlier results file")
+    parser.add_argument('--headless', action='store_true',
+                        help="only time the Qt-free engines; PyQt6 is not imported")
+    return parser
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark SSMS loaders against synthetic data")
+    return add_arguments(parser).parse_args(argv)
+
+
+def prepare_database(database, backend='mysql'):
+    """Point the app at the benchmark database and create it if needed
+
+    config reads DB_NAME at import, so this must run before any app module is imported.
+    """
+    os.environ['DB_NAME'] = database
+    os.environ['DB_BACKEND'] = backend
+    if backend == 'sqlite':
+        os.environ['DB_SQLITE_PATH'] = os.path.join(os.path.dirname(os.path.dirname(__file__)),
+                                                    f"{database}.db")
+        return
+    from db_connection import DatabaseConnection
+
+    with DatabaseConnection(database=None) as conn:
+        if conn is None:
+            raise SystemExit("Cannot connect to MySQL; check DB_HOST, DB_USER and DB_PASSWORD")
+        with conn.cursor() as cursor:
+            cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{database}` CHARACTER SET utf8mb4")
+
+
+def table_counts():
+    """Row counts of the benchmarked tables, recorded with the results"""
+    from db_connection import DatabaseConnection
+
+    counts = {}
+    with DatabaseConnection() as conn:
+        with conn.cursor() as cursor:
+            for table in ('products', 'customers', 'suppliers', 'sales', 'purchases'):
+                cursor.execute(f"SELECT COUNT(*) AS row_count FROM {table}")
+                counts[table] = cursor.fetchone()['row_count']
+            if os.environ.get('DB_BACKEND') != 'sqlite':
+                cursor.execute("SELECT VERSION() AS version")
+                counts['mysql_version'] = cursor.fetchone()['version']
+    return counts
+
+
+def time_method(method, repeat):
+    """Run a loader once to warm up, then time it `repeat` times"""
+    from ssms.query_stats import query_stats
+
+    method()
+    timings = []
+    queries_before = query_stats.summary()['count']
+    for _ in range(repeat):
+        started = time.perf_counter()
+        method()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return {
+        "runs": repeat,
+        "min_ms": round(timings[0], 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "mean_ms": round(statistics.fmean(timings), 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        "max_ms": round(timings[-1], 3),
+        "queries_per_run": (query_stats.summary()['count'] - queries_before) / repeat,
+    }
+
+
+def run_benchmarks(repeat, name_filter=None, headless=False):
+    """Instantiate each tab offscreen and time its loaders, then time the engines"""
+    import importlib
+
+    if headless:
+        return run_report_benchmarks(repeat, name_filter)
+
+    from PyQt6.QtWidgets import QApplication
+
+    app = QApplication.instance() or QApplication(['ssms-benchmark'])
+    results = {}
+    for module_name, class_name, methods in BENCHMARKS:
+        selected = [m for m in methods if not name_filter or name_filter in f"{class_name}.{m}"]
+        if not selected:
+            continue
+        tab = getattr(importlib.import_module(module_name), class_name)(USER_DATA)
+        for method_name in selected:
+            name = f"{class_name}.{method_name}"
+            print(f"  {name}...", flush=True)
+            results[name] = time_method(getattr(tab, method_name), repeat)
+            app.processEvents()
+        tab.deleteLater()
+    app.processEvents()
+    results.update(run_report_benchmarks(repeat, name_filter))
+    return results
+
+
+def run_report_benchmarks(repeat, name_filter=None):
+    """Time the report engine's renderers over the Reports tab's default 30 days"""
+    from datetime import date, timedelta
+
+    from ssms.report_engine import render_report
+
+    end = date.today()
+    params = {'start': end - timedelta(days=30), 'end': end}
+    results = {}
+    for report in REPORT_BENCHMARKS:
+        name = f"ReportEngine.{report}"
+        if name_filter and name_filter not in name:
+            continue
+        print(f"  {name}...", flush=True)
+        results[name] = time_method(lambda: render_report(report, params), repeat)
+    return results
+
+
+def compare(results, baseline_path):
+    """Print median timings against an earlier run"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    print(f"\n{'benchmark':<50}{'before':>12}{'after':>12}{'speedup':>10}")
+    for name, result in results.items():
+        before = baseline.get(name, {}).get('median_ms')
+        after = result['median_ms']
+        speedup = f"{before / after:.2f}x" if before and after else "-"
+        print(f"{name:<50}{before if before is not None else '-':>12}{after:>12}{speedup:>10}")
+
+
+def main(argv=None):
+    return run(parse_args(argv))
+
+
+def run(args):
+    """Generate data if asked, run the benchmarks and write or compare results"""
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    prepare_database(args.database, args.backend)
+
+    generation = None
+    if args.generate:
+        from benchmarks.datagen import DataGenerator
+        print(f"Generating {args.scale} dataset (seed {args.seed}) into {args.database}...")
+        generation = DataGenerator(args.scale, args.seed, progress=print).run()
+
+    print("Running benchmarks...")
+    results = run_benchmarks(args.repeat, args.filter, args.headless)
+    report = {
+        "meta": {
+            "timestamp": datetime.now().isoformat(timespec='seconds'),
+            "scale": args.scale,
+            "seed": args.seed,
+            "database": args.database,
+            "backend": args.backend,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "tables": table_counts(),
+            "generation": generation,
+        },
+        "results": results,
+    }
+
+    for name, result in results.items():
+        print(f"{name:<50}{result['median_ms']:>10.1f} ms median")
+    if args.compare:
+        compare(results, args.compare)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, default=str)
+        print(f"Results written to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,7 @@ Configuration file for SSMS
 Contains all configurable settings for the application
 """
 
+import json
 import os
 from pathlib import Path
 
@@ -13,6 +14,8 @@ APP_AUTHOR = "SSMS Team"
 
 # Database Configuration
 DATABASE_CONFIG = {
+    'backend': os.getenv('DB_BACKEND', 'mysql'),  # 'mysql' or the embedded 'sqlite'
+    'sqlite_path': os.getenv('DB_SQLITE_PATH', str(Path(__file__).parent / 'ssms.db')),
     'host': os.getenv('DB_HOST', 'localhost'),
     'user': os.getenv('DB_USER', 'root'),
     'password': os.getenv('DB_PASSWORD', 'SAh16ITU$530'),
@@ -49,6 +52,7 @@ BASE_DIR = Path(__file__).parent
 LOG_DIR = BASE_DIR / 'logs'
 REPORTS_DIR = BASE_DIR / 'reports'
 BACKUP_DIR = BASE_DIR / 'backups'
+SETTINGS_FILE = BASE_DIR / 'settings.json'
 
 # Create directories if they don't exist
 for directory in [LOG_DIR, REPORTS_DIR, BACKUP_DIR]:
@@ -60,7 +64,97 @@ LOGGING_CONFIG = {
     'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
     'file': LOG_DIR / 'ssms.log',
     'max_size': 10 * 1024 * 1024,  # 10MB
-    'backup_count': 5
+    'backup_count': 5,
+    'console_level': 'WARNING',
+    'batch_size': 200,  # records buffered before writing to the log file
+    'flush_interval': 1.0,  # seconds of quiet before buffered records are written
+    'levels': {  # per-module overrides of 'level'
+        'PyQt6': 'WARNING',
+    },
+    'sampling': {  # keep 1 in N debug records from these hot-path modules
+        'db_connection': 100,
+    },
+}
+
+# Backup Configuration
+BACKUP_CONFIG = {
+    'chunk_rows': 50000,  # rows per chunk file
+    'workers': 4,  # parallel table dump threads
+    'compress_level': 6,  # gzip level when compress_backups is enabled
+    'snapshot_lock_timeout': 2,  # seconds to wait for the snapshot sync lock
+    'incremental_overlap': 300,  # seconds re-read before each high-water mark
+}
+
+# Import Configuration
+IMPORT_CONFIG = {
+    'chunk_rows': 5000,  # rows handed to a validation worker at a time
+    'workers': 4,  # validation worker processes
+    'batch_rows': 1000,  # rows per upsert statement
+}
+
+# Query Instrumentation
+QUERY_CONFIG = {
+    'slow_query_ms': 500,  # log statements at least this slow; None disables the slow log
+    'explain_slow_queries': False,  # also log the EXPLAIN plan of slow SELECTs
+    'max_fingerprints': 500,  # distinct statement shapes tracked
+}
+
+# Maintenance Configuration
+MAINTENANCE_CONFIG = {
+    'fragmentation_ratio': 0.1,  # free space share above which a table is optimized
+    'fragmentation_min_bytes': 4 * 1024 * 1024,  # ignore free space below 4MB
+    'delete_batch_rows': 5000,  # rows per cleanup DELETE
+}
+
+# Offline Write Queue
+OFFLINE_CONFIG = {
+    'journal_path': BASE_DIR / 'offline_journal.db',  # local journal used while the server is unreachable
+    'flush_batch': 200,  # journaled writes replayed per transaction
+    'retry_interval': 5,  # seconds between replay attempts
+}
+
+# Stock Ledger
+STOCK_CONFIG = {
+    'lock_retries': 3,  # retries of a sale or purchase after a deadlock or lock wait timeout
+    'allow_oversell': False,  # let sales take stock_quantity below zero
+}
+
+# Stock Snapshots
+SNAPSHOT_CONFIG = {
+    'granularity': 'monthly',  # 'daily' or 'monthly' snapshots of every product's stock
+    'backfill_days': 730,  # history covered by the first run
+    'interval': 3600,  # seconds between checks for a newly completed period
+}
+
+# Demand Forecasting
+FORECAST_CONFIG = {
+    'history_days': 90,  # sales history the daily demand rate and its variability are measured over
+    'lead_time_days': 7,  # days from raising a demand to the goods being on the shelf
+    'review_days': 14,  # demand covered by each order beyond the reorder point
+    'service_level': 0.95,  # share of lead times that should end without a stockout
+}
+
+# Product and Customer Search
+SEARCH_CONFIG = {
+    'suggestions': 10,  # as-you-type suggestions shown under a search box
+    'result_limit': 500,  # rows a search fills the table with
+    'refresh_interval': 30,  # seconds between picking up changed rows into the prefix index
+}
+
+# Duplicate Customer Detection
+DEDUPE_CONFIG = {
+    'threshold': 0.8,  # pair score from 0 to 1 at which two customers are listed as a merge candidate
+    'phone_suffix_digits': 7,  # trailing phone digits that put customers in the same block
+    'max_block': 500,  # blocks larger than this are skipped as too common to tell customers apart
+    'workers': None,  # scoring processes; None uses every CPU
+    'task_pairs': 50000,  # pairs scored per worker task
+}
+
+# Report Rendering
+REPORT_CONFIG = {
+    'workers': 2,  # processes that query and format the detailed reports off the GUI thread
+    'schedule_interval': 300,  # seconds between checks for scheduled reports that are due
+    'claim_timeout': 1800,  # seconds before another terminal takes over a scheduled report left unfinished
 }
 
 # Security Settings
@@ -100,6 +194,58 @@ def get_logging_config():
     """Get logging configuration"""
     return LOGGING_CONFIG.copy()
 
+def get_backup_config():
+    """Get backup configuration"""
+    return BACKUP_CONFIG.copy()
+
+def get_import_config():
+    """Get import configuration"""
+    return IMPORT_CONFIG.copy()
+
+def get_query_config():
+    """Get query instrumentation configuration"""
+    return QUERY_CONFIG.copy()
+
+def get_maintenance_config():
+    """Get maintenance configuration"""
+    return MAINTENANCE_CONFIG.copy()
+
+def get_offline_config():
+    """Get offline write queue configuration"""
+    return OFFLINE_CONFIG.copy()
+
+def get_stock_config():
+    """Get stock ledger configuration"""
+    return STOCK_CONFIG.copy()
+
+def get_snapshot_config():
+    """Get stock snapshot configuration"""
+    return SNAPSHOT_CONFIG.copy()
+
+def get_forecast_config():
+    """Get demand forecasting configuration"""
+    return FORECAST_CONFIG.copy()
+
+def get_search_config():
+    """Get search configuration"""
+    return SEARCH_CONFIG.copy()
+
+def get_dedupe_config():
+    """Get duplicate customer detection configuration"""
+    return DEDUPE_CONFIG.copy()
+
+def get_report_config():
+    """Get report rendering configuration"""
+    return REPORT_CONFIG.copy()
+
+def get_user_settings():
+    """Get user settings saved from the Settings tab"""
+    try:
+        with open(SETTINGS_FILE, 'r') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
 def get_security_config():
     """Get security configuration"""
     return SECURITY_CONFIG.copy()
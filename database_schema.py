@@ -3,9 +3,13 @@ Database Schema Setup for SSMS
 Creates all necessary tables and initial data
 """
 
+import logging
 import sys
 import os
 from db_connection import DatabaseConnection
+from ssms.migrations import MigrationError, MigrationRunner
+
+logger = logging.getLogger(__name__)
 
 
 def create_database_schema():
@@ -28,6 +32,18 @@ def create_database_schema():
         if tables_created:
             print("✅ All tables created successfully")
             
+            # Bring tables created by earlier releases up to the current schema
+            try:
+                MigrationRunner(db, progress=print).run()
+            except MigrationError as e:
+                print(f"❌ {e}")
+                return False
+            
+            # Capture deletions for incremental backups
+            if not create_tombstone_triggers(db):
+                print("❌ Failed to create tombstone triggers; incremental backups would miss deletions")
+                return False
+            
             # Insert initial data
             insert_initial_data(db)
             
@@ -59,7 +75,8 @@ def create_tables(db):
             phone VARCHAR(20),
             is_active BOOLEAN DEFAULT TRUE,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_updated_at (updated_at)
         )
         """,
         
@@ -79,7 +96,9 @@ def create_tables(db):
             notes TEXT,
             is_active BOOLEAN DEFAULT TRUE,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_name (name),
+            INDEX idx_updated_at (updated_at)
         )
         """,
         
@@ -111,7 +130,9 @@ def create_tables(db):
             barcode VARCHAR(50),
             is_active BOOLEAN DEFAULT TRUE,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_name (name),
+            INDEX idx_updated_at (updated_at)
         )
         """,
         
@@ -133,6 +154,8 @@ def create_tables(db):
             notes TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_updated_at (updated_at),
+            INDEX idx_created_product (created_at, product_id),
             FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE SET NULL,
             FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE SET NULL
         )
@@ -154,6 +177,7 @@ def create_tables(db):
             notes TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_updated_at (updated_at),
             FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE SET NULL
         )
         """,
@@ -169,10 +193,21 @@ def create_tables(db):
             reference_id INT,
             notes TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_created_at (created_at),
             FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE
         )
         """,
         
+        # Stock snapshots table (stock at the end of snapshot_date, see ssms.snapshots)
+        """
+        CREATE TABLE IF NOT EXISTS stock_snapshots (
+            product_id INT NOT NULL,
+            snapshot_date DATE NOT NULL,
+            stock_quantity INT NOT NULL,
+            PRIMARY KEY (snapshot_date, product_id)
+        )
+        """,
+        
         # Suppliers table
         """
         CREATE TABLE IF NOT EXISTS suppliers (
@@ -189,7 +224,8 @@ def create_tables(db):
             notes TEXT,
             is_active BOOLEAN DEFAULT TRUE,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_updated_at (updated_at)
         )
         """,
         
@@ -206,6 +242,7 @@ def create_tables(db):
             ip_address VARCHAR(45),
             user_agent TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_created_at (created_at),
             FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE SET NULL
         )
         """,
@@ -219,7 +256,28 @@ def create_tables(db):
             setting_type ENUM('STRING', 'NUMBER', 'BOOLEAN', 'JSON') DEFAULT 'STRING',
             description TEXT,
             created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+            INDEX idx_updated_at (updated_at)
+        )
+        """,
+        
+        # Deleted rows table (tombstones for incremental backups)
+        """
+        CREATE TABLE IF NOT EXISTS deleted_rows (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            table_name VARCHAR(64) NOT NULL,
+            row_id INT NOT NULL,
+            deleted_at TIMESTAMP(6) DEFAULT CURRENT_TIMESTAMP(6),
+            INDEX idx_deleted_at (deleted_at)
+        )
+        """,
+        
+        # Offline writes table (idempotency keys of replayed offline journal entries)
+        """
+        CREATE TABLE IF NOT EXISTS offline_writes (
+            idempotency_key VARCHAR(36) PRIMARY KEY,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_applied_at (applied_at)
         )
         """
     ]
@@ -236,6 +294,33 @@ def create_tables(db):
         return False
 
 
+# Tables whose deletions are recorded in deleted_rows
+TOMBSTONE_TABLES = [
+    'users', 'customers', 'categories', 'products', 'sales', 'purchases',
+    'stock_movements', 'suppliers', 'audit_log', 'settings', 'purchase_demands'
+]
+
+
+def create_tombstone_triggers(db):
+    """Create AFTER DELETE triggers that record tombstones in deleted_rows
+    
+    Incremental backups pick deletions up from deleted_rows. Rows removed by
+    a foreign key cascade do not fire triggers; restore reproduces those by
+    applying the parent delete with the same cascade. Returns False if any
+    trigger could not be created, e.g. without the TRIGGER privilege.
+    """
+    for table in TOMBSTONE_TABLES:
+        # execute_query returns None instead of raising when the server rejects a statement
+        if db.execute_query(f"DROP TRIGGER IF EXISTS trg_{table}_tombstone") is None or db.execute_query(f"""
+            CREATE TRIGGER trg_{table}_tombstone AFTER DELETE ON {table}
+            FOR EACH ROW INSERT INTO deleted_rows (table_name, row_id) VALUES ('{table}', OLD.id)
+        """) is None:
+            logger.error(f"Could not create the tombstone trigger on {table}; deletions there will not be backed up")
+            return False
+    logger.info("Tombstone triggers created")
+    return True
+
+
 def insert_initial_data(db):
     """Insert initial data into tables"""
     try:
@@ -290,11 +375,12 @@ def insert_initial_data(db):
         ]
         
         for name, email, phone, address, city, state, pincode, customer_type, credit_limit in customers:
+            first_name, _, last_name = name.partition(' ')
             customer_query = """
-                INSERT IGNORE INTO customers (name, email, phone, address, city, state, pincode, customer_type, credit_limit)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+                INSERT IGNORE INTO customers (name, first_name, last_name, email, phone, address, city, state, pincode, customer_type, credit_limit)
+                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
             """
-            db.execute_query(customer_query, (name, email, phone, address, city, state, pincode, customer_type, credit_limit))
+            db.execute_query(customer_query, (name, first_name, last_name, email, phone, address, city, state, pincode, customer_type, credit_limit))
         print("✅ Sample customers created")
         
         # Insert sample suppliers
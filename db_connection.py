@@ -1,18 +1,27 @@
 import pymysql
 import logging
+import threading
+import time
+from contextlib import contextmanager
 from typing import Optional
 from config import get_database_config
+from ssms import sqlite_backend
+from ssms.query_stats import query_stats
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 class DatabaseConnection:
+    # Process-wide connection counters, shown in System Information
+    _stats = {'opened': 0, 'failed': 0, 'open': 0}
+    _stats_lock = threading.Lock()
+
     def __init__(self, **kwargs):
         # Get default config and override with any provided kwargs
         config = get_database_config()
         config.update(kwargs)
         
+        self.backend = config['backend']
+        self.sqlite_path = config['sqlite_path']
         self.host = config['host']
         self.user = config['user']
         self.password = config['password']
@@ -26,52 +35,155 @@ class DatabaseConnection:
     def __enter__(self) -> Optional[pymysql.Connection]:
         """Establish the connection when entering the context"""
         try:
-            self.connection = pymysql.connect(
-                host=self.host,
-                user=self.user,
-                password=self.password,
-                database=self.database,
-                charset=self.charset,
-                cursorclass=pymysql.cursors.DictCursor,
-                autocommit=True,
-                connect_timeout=self.connect_timeout,
-                read_timeout=self.read_timeout,
-                write_timeout=self.write_timeout
-            )
-            logger.info("Database connection established successfully")
+            if self.backend == 'sqlite':
+                self.connection = sqlite_backend.connect(self.sqlite_path)
+            else:
+                self.connection = self._connect_mysql()
+            logger.debug("Database connection established successfully")
+            self._count('opened', 'open')
             return self.connection
         except pymysql.Error as e:
             logger.error(f"Database connection failed: {e}")
+            self._count('failed')
             return None
         except Exception as e:
             logger.error(f"Unexpected error during database connection: {e}")
+            self._count('failed')
             return None
 
+    def _connect_mysql(self):
+        """Open a MySQL connection with the SSMS session defaults"""
+        return pymysql.connect(
+            host=self.host,
+            user=self.user,
+            password=self.password,
+            database=self.database,
+            charset=self.charset,
+            cursorclass=pymysql.cursors.DictCursor,
+            autocommit=True,
+            connect_timeout=self.connect_timeout,
+            read_timeout=self.read_timeout,
+            write_timeout=self.write_timeout
+        )
+
     def __exit__(self, exc_type, exc_val, exc_tb):
         """Properly close the connection when exiting the context"""
         if self.connection:
             try:
                 self.connection.close()
-                logger.info("Database connection closed successfully")
+                logger.debug("Database connection closed successfully")
             except Exception as e:
                 logger.error(f"Error closing database connection: {e}")
+            finally:
+                self.connection = None
+                self._count(open=-1)
+
+    def execute_query(self, query: str, params: tuple = None, offline: tuple = None):
+        """Execute a query and return results
 
-    def execute_query(self, query: str, params: tuple = None):
-        """Execute a query and return results"""
+        offline is an (entity, payload) pair set by execute_write; such writes
+        are journaled instead of lost when the server cannot be reached.
+        """
+        started = time.perf_counter()
+        elapsed_ms = None
+        rows = 0
+        error = False
         try:
             with self as conn:
                 if conn is None:
+                    if offline is not None:
+                        return self._journal_write(query, params, offline)
+                    error = True
                     return None
                 with conn.cursor() as cursor:
                     cursor.execute(query, params)
                     if query.strip().upper().startswith('SELECT'):
-                        return cursor.fetchall()
+                        result = cursor.fetchall()
+                        rows = len(result)
                     else:
                         conn.commit()
-                        return cursor.rowcount
+                        result = rows = cursor.rowcount
+                    elapsed_ms = (time.perf_counter() - started) * 1000
+                    if query_stats.is_slow(elapsed_ms):
+                        query_stats.log_slow(query, params, elapsed_ms, cursor)
+                    return result
         except Exception as e:
+            error = True
             logger.error(f"Query execution failed: {e}")
             return None
+        finally:
+            if elapsed_ms is None:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+            query_stats.record(query, elapsed_ms, rows, error)
+
+    @contextmanager
+    def transaction(self):
+        """Run statements in one transaction on a dedicated connection
+
+        Yields a cursor; commits when the block completes and rolls back if
+        it raises. Raises pymysql OperationalError if the server is unreachable.
+        """
+        with self as conn:
+            if conn is None:
+                raise pymysql.err.OperationalError(2003, "Database connection failed")
+            conn.begin()
+            try:
+                with conn.cursor() as cursor:
+                    yield cursor
+                conn.commit()
+            except BaseException:
+                try:
+                    conn.rollback()
+                except pymysql.Error as e:
+                    logger.warning(f"Rollback failed: {e}")
+                raise
+
+    def execute_write(self, query: str, params: tuple = None, entity: str = None, payload: dict = None):
+        """Execute an INSERT/UPDATE/DELETE that must not be lost
+
+        Returns the affected row count, offline_queue.QUEUED when the write was
+        journaled for later replay, or None if the server rejected it. While
+        journaled writes are pending, new ones queue behind them to keep order.
+        """
+        # Imported here: the offline queue opens its own DatabaseConnections
+        from ssms.offline_queue import offline_queue
+
+        if offline_queue.has_pending():
+            return self._journal_write(query, params, (entity, payload))
+        return self.execute_query(query, params, offline=(entity, payload))
+
+    @staticmethod
+    def _journal_write(query, params, offline):
+        from ssms.offline_queue import QUEUED, offline_queue
+
+        entity, payload = offline
+        offline_queue.enqueue(query, params, entity=entity, payload=payload)
+        return QUEUED
+
+    @staticmethod
+    def query_stats() -> list:
+        """Per-statement timing statistics, heaviest total time first"""
+        return query_stats.snapshot()
+
+    @staticmethod
+    def dump_query_stats(path) -> str:
+        """Write per-statement timing statistics to a JSON file"""
+        return query_stats.dump(path)
+
+    @classmethod
+    def _count(cls, *names, **deltas):
+        """Bump connection counters"""
+        with cls._stats_lock:
+            for name in names:
+                cls._stats[name] += 1
+            for name, delta in deltas.items():
+                cls._stats[name] += delta
+
+    @classmethod
+    def connection_stats(cls) -> dict:
+        """Snapshot of the connection counters"""
+        with cls._stats_lock:
+            return dict(cls._stats)
 
     @staticmethod
     def test_connection() -> bool:
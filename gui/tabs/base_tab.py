@@ -3,10 +3,32 @@ Base Tab Class for SSMS
 Provides common functionality for all tabs
 """
 
-from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton
-from PyQt6.QtCore import pyqtSignal, QTimer
+from PyQt6.QtWidgets import QWidget, QVBoxLayout, QHBoxLayout, QLabel, QPushButton, QCompleter
+from PyQt6.QtCore import Qt, pyqtSignal, QTimer, QThread, QStringListModel
 from PyQt6.QtGui import QFont
+from config import get_search_config
 from db_connection import DatabaseConnection
+from ssms.search import get_index
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SearchIndexThread(QThread):
+    """Thread for loading or refreshing a search prefix index"""
+    finished = pyqtSignal(bool, str)
+    
+    def __init__(self, entity):
+        super().__init__()
+        self.entity = entity
+        
+    def run(self):
+        """Apply rows changed since the last refresh"""
+        try:
+            applied = get_index(self.entity).refresh()
+            self.finished.emit(True, f"{applied} {self.entity} indexed")
+        except Exception as e:
+            self.finished.emit(False, f"Search index refresh failed: {str(e)}")
 
 
 class BaseTab(QWidget):
@@ -92,8 +114,55 @@ class BaseTab(QWidget):
     def show_success(self, message):
         """Show success message"""
         # This could be implemented with a notification system
-        print(f"✅ {message}")
+        logger.info(message)
+        
+    def attach_search(self, entity, search_input, on_search):
+        """Offer suggestions from the entity's prefix index while typing, and call on_search when typing pauses"""
+        self.search_entity = entity
+        self.search_thread = None
         
+        self.suggestions = QStringListModel(self)
+        self.completer = QCompleter(self.suggestions, self)
+        self.completer.setCompletionMode(QCompleter.CompletionMode.UnfilteredPopupCompletion)
+        self.completer.setCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        search_input.setCompleter(self.completer)
+        search_input.textEdited.connect(self.suggest)
+        
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(300)
+        self.search_timer.timeout.connect(on_search)
+        search_input.textChanged.connect(self.search_timer.start)
+        
+        # Pick up products or customers changed on other terminals
+        self.search_index_timer = QTimer(self)
+        self.search_index_timer.setInterval(get_search_config()['refresh_interval'] * 1000)
+        self.search_index_timer.timeout.connect(self.refresh_search_index)
+        self.search_index_timer.start()
+        self.refresh_search_index()
+        
+    def suggest(self, text):
+        """Show suggestions for the text typed so far"""
+        index = get_index(self.search_entity)
+        self.suggestions.setStringList(index.suggest(text) if text.strip() and index.loaded else [])
+        if self.suggestions.rowCount():
+            self.completer.complete()
+            
+    def refresh_search_index(self):
+        """Refresh the search index in the background"""
+        if self.search_thread and self.search_thread.isRunning():
+            return
+        self.search_thread = SearchIndexThread(self.search_entity)
+        self.search_thread.finished.connect(self.search_index_refreshed)
+        self.search_thread.start()
+        
+    def search_index_refreshed(self, success, message):
+        """Log the outcome of an index refresh"""
+        if success:
+            logger.debug(message)
+        else:
+            logger.warning(message)
+            
     def get_database_connection(self):
         """Get database connection"""
         return self.db
@@ -105,3 +174,11 @@ class BaseTab(QWidget):
         except Exception as e:
             self.show_error(f"Database error: {str(e)}")
             return None
+
+    def execute_write(self, query, params=None, entity=None, payload=None):
+        """Execute a write that is journaled offline if the server is unreachable"""
+        try:
+            return self.db.execute_write(query, params, entity=entity, payload=payload)
+        except Exception as e:
+            self.show_error(f"Database error: {str(e)}")
+            return None
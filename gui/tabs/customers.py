@@ -2,7 +2,12 @@ from PyQt6.QtWidgets import *
 from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 from .base_tab import BaseTab
+from ssms.dedupe import DuplicateFinder, dismiss_candidate, merge_candidates, merge_customers
+from ssms.search import SearchError, search
 from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class CleanButton(QPushButton):
@@ -96,6 +101,26 @@ class CleanCombo(QComboBox):
         """)
 
 
+class DedupeThread(QThread):
+    """Thread that scans all customers for likely duplicates"""
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+    
+    def run(self):
+        """Find and store merge candidates"""
+        try:
+            found = DuplicateFinder(progress_callback=self.report_progress).run()
+            self.finished.emit(True, f"Found {found} possible duplicates")
+        except Exception as e:
+            self.finished.emit(False, f"Duplicate scan failed: {str(e)}")
+            
+    def report_progress(self, percent, message):
+        """Forward finder progress to the dialog"""
+        self.progress.emit(percent)
+        self.status.emit(message)
+
+
 class CustomersTab(BaseTab):
     """Clean, modern customers management tab"""
     
@@ -125,6 +150,11 @@ class CustomersTab(BaseTab):
         self.add_customer_btn.clicked.connect(self.show_add_customer_dialog)
         header_layout.addWidget(self.add_customer_btn)
         
+        # Duplicate customers button
+        self.duplicates_btn = CleanButton("🔍 Find Duplicates", "#8b5cf6")
+        self.duplicates_btn.clicked.connect(self.show_duplicates_dialog)
+        header_layout.addWidget(self.duplicates_btn)
+        
         self.main_layout.addLayout(header_layout)
         
         # Filters
@@ -133,7 +163,7 @@ class CustomersTab(BaseTab):
         
         # Search
         self.search_input = CleanInput("Search customers...")
-        self.search_input.textChanged.connect(self.filter_customers)
+        self.attach_search('customers', self.search_input, self.filter_customers)
         filter_layout.addWidget(self.search_input)
         
         # Type filter
@@ -152,7 +182,7 @@ class CustomersTab(BaseTab):
         
         # Refresh button
         self.refresh_btn = CleanButton("Refresh", "#6b7280")
-        self.refresh_btn.clicked.connect(self.load_customers_data)
+        self.refresh_btn.clicked.connect(self.filter_customers)
         filter_layout.addWidget(self.refresh_btn)
         
         self.main_layout.addLayout(filter_layout)
@@ -223,18 +253,23 @@ class CustomersTab(BaseTab):
         
         self.main_layout.addWidget(self.customers_table)
         
-    def load_customers_data(self):
-        """Load customers data from database"""
+    def load_customers_data(self, ids=None):
+        """Load customers data from database, only the given ids in their order if any"""
         try:
             query = """
                 SELECT c.id, CONCAT(c.first_name, ' ', c.last_name) as customer_name, c.email, c.phone, 
-                       c.customer_type, c.city, COUNT(s.id) as total_orders
+                       c.customer_type, c.city, COALESCE(cs.orders, 0) as total_orders
                 FROM customers c
-                LEFT JOIN sales s ON c.id = s.customer_id
-                GROUP BY c.id
-                ORDER BY c.first_name, c.last_name
+                LEFT JOIN customer_stats cs ON cs.customer_id = c.id
             """
-            results = self.execute_query(query)
+            if ids is None:
+                results = self.execute_query(query + " ORDER BY c.first_name, c.last_name")
+            elif ids:
+                results = self.execute_query(query + f" WHERE c.id IN ({', '.join(['%s'] * len(ids))})", ids)
+                rank = {customer_id: position for position, customer_id in enumerate(ids)}
+                results = sorted(results or [], key=lambda customer: rank[customer['id']])
+            else:
+                results = []
             
             if results is None:
                 results = []
@@ -286,18 +321,29 @@ class CustomersTab(BaseTab):
                 
                 self.customers_table.setCellWidget(row, 7, actions_widget)
                 
-            print(f"✅ Loaded {len(results)} customer records")
+            logger.debug("Loaded %s customer records", len(results))
             
         except Exception as e:
-            print(f"❌ Error loading customers data: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error loading customers data: {e}")
             QMessageBox.critical(self, "Error", f"Failed to load customers data: {e}")
     
     def filter_customers(self):
-        """Filter customers based on search criteria"""
-        # This is a simplified filter - in a real app you'd implement proper filtering
-        self.load_customers_data()
+        """Show the customers matching the search box, or all of them when it is empty"""
+        text = self.search_input.text().strip()
+        if not text:
+            self.load_customers_data()
+            return
+        try:
+            self.load_customers_data(search('customers', text))
+        except SearchError as e:
+            self.show_error(str(e))
+    
+    def show_duplicates_dialog(self):
+        """Review likely duplicate customers and merge them"""
+        dialog = DuplicatesDialog(self)
+        dialog.exec()
+        if dialog.merged:
+            self.filter_customers()
     
     def show_add_customer_dialog(self):
         """Show add customer dialog"""
@@ -312,4 +358,155 @@ class CustomersTab(BaseTab):
         reply = QMessageBox.question(self, "Delete Customer", f"Are you sure you want to delete customer {customer_id}?")
         if reply == QMessageBox.StandardButton.Yes:
             QMessageBox.information(self, "Delete Customer", f"Customer {customer_id} deleted successfully")
-            self.load_customers_data()
\ No newline at end of file
+            self.load_customers_data()
+
+
+class DuplicatesDialog(QDialog):
+    """Merge candidates found by the duplicate scan"""
+    
+    COLUMNS = ["Customer", "Email", "Phone", "Orders", "Duplicate", "Email", "Phone", "Orders", "Score", "Why"]
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.candidates = []
+        self.merged = 0
+        self.scan_thread = None
+        self.setup_ui()
+        self.load_candidates()
+        
+    def setup_ui(self):
+        """Setup dialog UI"""
+        self.setWindowTitle("Duplicate Customers")
+        self.setModal(True)
+        self.resize(1100, 600)
+        
+        layout = QVBoxLayout(self)
+        
+        self.candidates_table = QTableWidget()
+        self.candidates_table.setColumnCount(len(self.COLUMNS))
+        self.candidates_table.setHorizontalHeaderLabels(self.COLUMNS)
+        self.candidates_table.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.candidates_table.setSelectionMode(QAbstractItemView.SelectionMode.SingleSelection)
+        self.candidates_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.candidates_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        layout.addWidget(self.candidates_table)
+        
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+        
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("color: #cbd5e1;")
+        layout.addWidget(self.status_label)
+        
+        # Buttons
+        button_layout = QHBoxLayout()
+        
+        self.scan_btn = QPushButton("Scan Customers")
+        self.scan_btn.clicked.connect(self.start_scan)
+        button_layout.addWidget(self.scan_btn)
+        
+        merge_btn = QPushButton("Merge")
+        merge_btn.setToolTip("Keep the customer with more orders and move the other's sales to it")
+        merge_btn.clicked.connect(self.merge_selected)
+        button_layout.addWidget(merge_btn)
+        
+        dismiss_btn = QPushButton("Not a Duplicate")
+        dismiss_btn.clicked.connect(self.dismiss_selected)
+        button_layout.addWidget(dismiss_btn)
+        
+        button_layout.addStretch()
+        
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.reject)
+        button_layout.addWidget(close_btn)
+        
+        layout.addLayout(button_layout)
+        
+    def load_candidates(self):
+        """Show pending merge candidates, best first"""
+        try:
+            self.candidates = merge_candidates()
+        except Exception as e:
+            self.status_label.setText(str(e))
+            return
+        self.candidates_table.setRowCount(len(self.candidates))
+        for row, candidate in enumerate(self.candidates):
+            values = [
+                candidate['customer_name'], candidate['customer_email'], candidate['customer_phone'],
+                candidate['customer_orders'], candidate['duplicate_name'], candidate['duplicate_email'],
+                candidate['duplicate_phone'], candidate['duplicate_orders'], f"{float(candidate['score']):.0%}",
+                candidate['reasons'],
+            ]
+            for column, value in enumerate(values):
+                self.candidates_table.setItem(row, column, QTableWidgetItem("" if value is None else str(value)))
+        if not self.candidates:
+            self.status_label.setText("No possible duplicates pending; scan to look for new ones")
+            
+    def selected_candidate(self):
+        """The candidate of the selected row, or None"""
+        row = self.candidates_table.currentRow()
+        if row < 0 or row >= len(self.candidates):
+            QMessageBox.information(self, "Duplicate Customers", "Select a pair first")
+            return None
+        return self.candidates[row]
+        
+    def start_scan(self):
+        """Scan every customer in the background"""
+        self.scan_btn.setEnabled(False)
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setValue(0)
+        self.scan_thread = DedupeThread()
+        self.scan_thread.progress.connect(self.progress_bar.setValue)
+        self.scan_thread.status.connect(self.status_label.setText)
+        self.scan_thread.finished.connect(self.scan_finished)
+        self.scan_thread.start()
+        
+    def scan_finished(self, success, message):
+        """Handle scan completion"""
+        self.scan_btn.setEnabled(True)
+        self.progress_bar.setVisible(False)
+        self.status_label.setText(message)
+        if success:
+            self.load_candidates()
+        else:
+            QMessageBox.critical(self, "Duplicate Customers", message)
+            
+    def merge_selected(self):
+        """Merge the selected pair into the customer with more orders"""
+        candidate = self.selected_candidate()
+        if not candidate:
+            return
+        if candidate['duplicate_orders'] > candidate['customer_orders']:
+            keep, duplicate = 'duplicate', 'customer'
+        else:
+            keep, duplicate = 'customer', 'duplicate'
+        reply = QMessageBox.question(
+            self, "Merge Customers",
+            f"Merge {candidate[duplicate + '_name']} into {candidate[keep + '_name']}?\n\n"
+            f"{candidate[duplicate + '_orders']} sales move over and "
+            f"{candidate[duplicate + '_name']} is deleted."
+        )
+        if reply != QMessageBox.StandardButton.Yes:
+            return
+        try:
+            moved = merge_customers(candidate[keep + '_id'], candidate[duplicate + '_id'])
+        except Exception as e:
+            QMessageBox.critical(self, "Merge Customers", f"Merge failed: {str(e)}")
+            return
+        self.merged += 1
+        self.status_label.setText(f"Merged, {moved} sales moved to {candidate[keep + '_name']}")
+        self.load_candidates()
+        
+    def dismiss_selected(self):
+        """Hide the selected pair from this and later scans"""
+        candidate = self.selected_candidate()
+        if candidate:
+            dismiss_candidate(candidate['id'])
+            self.load_candidates()
+            
+    def reject(self):
+        """Wait for a running scan before closing"""
+        if self.scan_thread and self.scan_thread.isRunning():
+            self.scan_thread.wait()
+        super().reject()
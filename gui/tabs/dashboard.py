@@ -4,6 +4,9 @@ from PyQt6.QtGui import *
 from .base_tab import BaseTab
 import json
 from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class CleanCard(QWidget):
@@ -115,12 +118,11 @@ class DashboardTab(BaseTab):
         
     def refresh_data(self):
         """Refresh dashboard data with clean cards"""
-        print("🔄 Refreshing dashboard data...")
+        logger.debug("Refreshing dashboard data")
         
         try:
             # Get stats data
             stats_data = self.get_dashboard_stats()
-            print(f"Dashboard data: Sales={stats_data[0][1]}, Orders={stats_data[1][1]}, Customers={stats_data[2][1]}, Inventory={stats_data[3][1]}")
             
             # Clear existing cards
             for card in self.cards:
@@ -129,19 +131,15 @@ class DashboardTab(BaseTab):
             
             # Create new clean cards with proper data
             for i, (title, value, icon, color) in enumerate(stats_data):
-                print(f"Creating card {i}: {title} = {value}")
                 card = CleanCard(title, value, icon, color)
                 row = i // 2
                 col = i % 2
                 self.metrics_layout.addWidget(card, row, col)
                 self.cards.append(card)
                 
-            print("✅ Clean cards created successfully!")
             
         except Exception as e:
-            print(f"❌ Error refreshing dashboard: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error refreshing dashboard: {e}")
     
     def get_dashboard_stats(self):
         """Get dashboard statistics from database"""
@@ -169,7 +167,8 @@ class DashboardTab(BaseTab):
             inventory_result = self.execute_query(inventory_query)
             in_stock_items = inventory_result[0]['in_stock'] if inventory_result and inventory_result[0] else 0
             
-            print(f"Dashboard stats: Sales={total_sales}, Orders={total_orders}, Customers={total_customers}, Stock={in_stock_items}")
+            logger.debug("Dashboard stats: Sales=%s, Orders=%s, Customers=%s, Stock=%s",
+                         total_sales, total_orders, total_customers, in_stock_items)
             
             return [
                 ("Total Sales", f"PKR {total_sales:,.2f}", "💰", "#10b981"),
@@ -179,7 +178,7 @@ class DashboardTab(BaseTab):
             ]
             
         except Exception as e:
-            print(f"❌ Error getting dashboard stats: {e}")
+            logger.error(f"Error getting dashboard stats: {e}")
             return [
                 ("Total Sales", "PKR 0.00", "💰", "#10b981"),
                 ("Total Orders", "0", "📦", "#3b82f6"),
@@ -330,7 +329,8 @@ class DashboardTab(BaseTab):
             monthly_result = self.execute_query(monthly_sales_query)
             monthly_sales = monthly_result[0]['monthly_sales'] if monthly_result and monthly_result[0] else 0
             
-            print(f"Quick stats: Low stock={low_stock}, Pending={pending_purchases}, Monthly={monthly_sales}")
+            logger.debug("Quick stats: Low stock=%s, Pending=%s, Monthly=%s",
+                         low_stock, pending_purchases, monthly_sales)
             
             return [
                 {"label": "Low Stock Items", "value": str(low_stock), "color": "#f59e0b"},
@@ -338,7 +338,7 @@ class DashboardTab(BaseTab):
                 {"label": "This Month", "value": f"PKR {monthly_sales:,.0f}", "color": "#10b981"}
             ]
         except Exception as e:
-            print(f"❌ Error getting quick stats: {e}")
+            logger.error(f"Error getting quick stats: {e}")
             return [
                 {"label": "Low Stock Items", "value": "0", "color": "#f59e0b"},
                 {"label": "Pending Purchases", "value": "0", "color": "#ef4444"},
@@ -355,8 +355,8 @@ class DashboardTab(BaseTab):
                 LIMIT 5
             """
             result = self.execute_query(query)
-            print(f"Recent sales: {len(result) if result else 0} records")
+            logger.debug("Recent sales: %s records", len(result) if result else 0)
             return result if result else []
         except Exception as e:
-            print(f"❌ Error getting recent sales: {e}")
+            logger.error(f"Error getting recent sales: {e}")
             return []
\ No newline at end of file
@@ -2,7 +2,11 @@ from PyQt6.QtWidgets import *
 from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 from .base_tab import BaseTab
+from ssms.search import SearchError, search
 from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class CleanButton(QPushButton):
@@ -133,7 +137,7 @@ class InventoryTab(BaseTab):
         
         # Search
         self.search_input = CleanInput("Search products...")
-        self.search_input.textChanged.connect(self.filter_products)
+        self.attach_search('products', self.search_input, self.filter_products)
         filter_layout.addWidget(self.search_input)
         
         # Category filter
@@ -152,7 +156,7 @@ class InventoryTab(BaseTab):
         
         # Refresh button
         self.refresh_btn = CleanButton("Refresh", "#6b7280")
-        self.refresh_btn.clicked.connect(self.load_products_data)
+        self.refresh_btn.clicked.connect(self.filter_products)
         filter_layout.addWidget(self.refresh_btn)
         
         self.main_layout.addLayout(filter_layout)
@@ -225,16 +229,22 @@ class InventoryTab(BaseTab):
         
         self.main_layout.addWidget(self.products_table)
         
-    def load_products_data(self):
-        """Load products data from database"""
+    def load_products_data(self, ids=None):
+        """Load products data from database, only the given ids in their order if any"""
         try:
             query = """
                 SELECT p.id, p.name, p.sku, p.category, p.stock_quantity, 
                        p.selling_price, p.supplier
                 FROM products p
-                ORDER BY p.name
             """
-            results = self.execute_query(query)
+            if ids is None:
+                results = self.execute_query(query + " ORDER BY p.name")
+            elif ids:
+                results = self.execute_query(query + f" WHERE p.id IN ({', '.join(['%s'] * len(ids))})", ids)
+                rank = {product_id: position for position, product_id in enumerate(ids)}
+                results = sorted(results or [], key=lambda product: rank[product['id']])
+            else:
+                results = []
             
             if results is None:
                 results = []
@@ -300,18 +310,22 @@ class InventoryTab(BaseTab):
                 
                 self.products_table.setCellWidget(row, 8, actions_widget)
                 
-            print(f"✅ Loaded {len(results)} product records")
+            logger.debug("Loaded %s product records", len(results))
             
         except Exception as e:
-            print(f"❌ Error loading products data: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error loading products data: {e}")
             QMessageBox.critical(self, "Error", f"Failed to load products data: {e}")
     
     def filter_products(self):
-        """Filter products based on search criteria"""
-        # This is a simplified filter - in a real app you'd implement proper filtering
-        self.load_products_data()
+        """Show the products matching the search box, or all of them when it is empty"""
+        text = self.search_input.text().strip()
+        if not text:
+            self.load_products_data()
+            return
+        try:
+            self.load_products_data(search('products', text))
+        except SearchError as e:
+            self.show_error(str(e))
     
     def show_add_product_dialog(self):
         """Show add product dialog"""
@@ -6,18 +6,325 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
                             QLabel, QPushButton, QTableWidget, QTableWidgetItem,
                             QLineEdit, QComboBox, QDateEdit, QSpinBox, QDoubleSpinBox,
                             QGroupBox, QHeaderView, QMessageBox, QDialog, QFormLayout,
-                            QTextEdit, QFrame, QSplitter, QTabWidget, QCheckBox)
-from PyQt6.QtCore import Qt, QDate, pyqtSignal
-from PyQt6.QtGui import QFont
+                            QTextEdit, QFrame, QSplitter, QTabWidget, QCheckBox, QTableView,
+                            QFileDialog)
+from PyQt6.QtCore import Qt, QDate, QThread, pyqtSignal, QAbstractTableModel, QModelIndex
+from PyQt6.QtGui import QFont, QColor
 from .base_tab import BaseTab
+from ssms.forecast import DemandForecaster
+from ssms.offline_queue import QUEUED, offline_queue
+from ssms.purchase_reports import REPORTS, PurchaseReportEngine
+from ssms.stock import StockError, StockLedger
+from ssms.suppliers import supplier_performance
 from datetime import datetime, date
+from decimal import Decimal
+
+
+def selected_product_id(combo):
+    """Product id of the combo's entry, also when its name was typed rather than picked"""
+    index = combo.findText(combo.currentText(), Qt.MatchFlag.MatchFixedString)
+    return combo.itemData(index) if index >= 0 else None
+
+
+# Open demands listed in the Purchase Demands table, most pressing first
+DEMAND_ROWS = 500
+
+
+class DemandForecastThread(QThread):
+    """Thread that raises purchase demands for every product due for an order"""
+    finished = pyqtSignal(bool, str)
+    
+    def __init__(self, requested_by):
+        super().__init__()
+        self.requested_by = requested_by
+        
+    def run(self):
+        """Run the forecast and bulk insert the demands"""
+        try:
+            plans = DemandForecaster().generate_demands(self.requested_by)
+            urgent = sum(plan['priority'] == 'URGENT' for plan in plans)
+            self.finished.emit(True, f"Raised {len(plans)} purchase demands ({urgent} urgent)")
+        except Exception as e:
+            self.finished.emit(False, f"Demand forecast failed: {str(e)}")
+
+
+class PurchaseReportThread(QThread):
+    """Thread that runs a purchase report, or exports one when given a path"""
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str, object)
+    
+    def __init__(self, report, start, end, export_path=None, file_format='csv'):
+        super().__init__()
+        self.report = report
+        self.start_date = start
+        self.end_date = end
+        self.export_path = export_path
+        self.file_format = file_format
+        
+    def run(self):
+        """Run or export the report"""
+        try:
+            engine = PurchaseReportEngine(progress_callback=self.report_progress)
+            if self.export_path:
+                count = engine.export(self.report, self.start_date, self.end_date, self.export_path,
+                                      self.file_format)
+                self.finished.emit(True, f"Exported {count:,} rows to {self.export_path}", None)
+            else:
+                result = engine.run(self.report, self.start_date, self.end_date)
+                self.finished.emit(True, f"{result['title']}: {len(result['rows']):,} rows", result)
+        except Exception as e:
+            self.finished.emit(False, f"Purchase report failed: {str(e)}", None)
+            
+    def report_progress(self, percent, message):
+        """Forward engine progress to the tab"""
+        self.progress.emit(percent)
+        self.status.emit(message)
+
+
+class ReportRowsModel(QAbstractTableModel):
+    """Table model over report rows; columns is a list of (key, header)"""
+    
+    def __init__(self, columns, rows, parent=None):
+        super().__init__(parent)
+        self.columns = columns
+        self.rows = rows
+        
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+        
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+        
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.columns[section][1]
+        return None
+        
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+            return None
+        value = self.rows[index.row()][self.columns[index.column()][0]]
+        if value is None:
+            return ""
+        if isinstance(value, int):
+            return f"{value:,}" if abs(value) >= 10000 else str(value)
+        if isinstance(value, (float, Decimal)):
+            return f"{value:,.2f}"
+        return str(value)
+
+
+class PurchaseReportDialog(QDialog):
+    """Shows a purchase report result and exports it"""
+    
+    EXPORT_FILTERS = {"CSV Files (*.csv)": 'csv', "Excel Files (*.xlsx)": 'excel', "JSON Lines (*.jsonl)": 'json'}
+    
+    def __init__(self, parent, report, start, end, result):
+        super().__init__(parent)
+        self.report = report
+        self.start_date = start
+        self.end_date = end
+        self.export_thread = None
+        self.setWindowTitle(f"{result['title']} ({start} to {end})")
+        self.resize(900, 600)
+        
+        layout = QVBoxLayout(self)
+        table = QTableView()
+        table.setModel(ReportRowsModel(result['columns'], result['rows'], self))
+        table.verticalHeader().setVisible(False)
+        layout.addWidget(table)
+        
+        footer = QHBoxLayout()
+        self.status_label = QLabel(
+            f"{len(result['rows']):,} rows in {result['seconds']:.2f}s{' (cached)' if result['cached'] else ''}"
+        )
+        footer.addWidget(self.status_label)
+        footer.addStretch()
+        self.export_btn = QPushButton("Export")
+        self.export_btn.clicked.connect(self.export_report)
+        footer.addWidget(self.export_btn)
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.accept)
+        footer.addWidget(close_btn)
+        layout.addLayout(footer)
+        
+    def export_report(self):
+        """Export the report in the background"""
+        path, selected = QFileDialog.getSaveFileName(
+            self, "Export Report", f"{self.report}_{self.start_date}_{self.end_date}",
+            ";;".join(self.EXPORT_FILTERS)
+        )
+        if not path:
+            return
+        self.export_btn.setEnabled(False)
+        self.export_thread = PurchaseReportThread(self.report, self.start_date, self.end_date, path,
+                                                  self.EXPORT_FILTERS.get(selected, 'csv'))
+        self.export_thread.status.connect(self.status_label.setText)
+        self.export_thread.finished.connect(self.export_finished)
+        self.export_thread.start()
+        
+    def export_finished(self, success, message, result):
+        """Show the export outcome"""
+        self.export_btn.setEnabled(True)
+        self.status_label.setText(message)
+        if not success:
+            QMessageBox.warning(self, "Export Failed", message)
+
+
+class SupplierStatsModel(QAbstractTableModel):
+    """Table model over supplier_performance rows; the view only asks for visible cells"""
+    
+    # (header, row key, formatter)
+    COLUMNS = [
+        ("Supplier", 'name', lambda value: value),
+        ("Contact", 'contact_person', lambda value: value or "N/A"),
+        ("Terms", 'payment_terms', lambda value: value or "N/A"),
+        ("Orders", 'orders', lambda value: f"{value:,}"),
+        ("Spend", 'spend', lambda value: f"PKR {value:,.2f}"),
+        ("Avg Unit Price", 'avg_unit_price', lambda value: f"PKR {value:,.2f}"),
+        ("Price Trend", 'price_change', lambda value: "—" if value is None else f"{value:+.1%}"),
+        ("Paid / Pending / Partial", None, None),
+        ("Outstanding", 'outstanding', lambda value: f"PKR {value:,.2f}"),
+        ("On Time", 'on_time_rate', lambda value: "—" if value is None else f"{value:.0%}"),
+        ("Last Purchase", 'last_purchase', lambda value: str(value) if value else "Never"),
+    ]
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.rows = []
+        
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+        
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+        
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.COLUMNS[section][0]
+        return None
+        
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        _, key, formatter = self.COLUMNS[index.column()]
+        if role == Qt.ItemDataRole.DisplayRole:
+            if key is None:
+                return f"{row['paid_orders']} / {row['pending_orders']} / {row['partial_orders']}"
+            return formatter(row[key])
+        if role == Qt.ItemDataRole.ForegroundRole:
+            if key == 'price_change' and row['price_change']:
+                return QColor("#F87171" if row['price_change'] > 0 else "#34D399")
+            if key == 'on_time_rate' and row['on_time_rate'] is not None and row['on_time_rate'] < 0.8:
+                return QColor("#FBBF24")
+        if role == Qt.ItemDataRole.ToolTipRole and key == 'outstanding':
+            return f"{row['overdue_orders']} unpaid past terms"
+        return None
+        
+    def sort(self, column, order=Qt.SortOrder.AscendingOrder):
+        key = self.COLUMNS[column][1] or 'paid_orders'
+        self.layoutAboutToBeChanged.emit()
+        # Missing values (no purchases yet) always sort last
+        present = [row for row in self.rows if row[key] is not None]
+        missing = [row for row in self.rows if row[key] is None]
+        present.sort(key=lambda row: row[key], reverse=order == Qt.SortOrder.DescendingOrder)
+        self.rows = present + missing
+        self.layoutChanged.emit()
+        
+    def set_rows(self, rows):
+        """Replace the displayed suppliers"""
+        self.beginResetModel()
+        self.rows = rows
+        self.endResetModel()
+
+
+class SupplierDialog(QDialog):
+    """Dialog for adding suppliers"""
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Add Supplier")
+        self.setModal(True)
+        self.resize(450, 400)
+        
+        layout = QVBoxLayout(self)
+        form_group = QGroupBox("Supplier Information")
+        form_layout = QFormLayout(form_group)
+        
+        self.name_input = QLineEdit()
+        form_layout.addRow("Name:", self.name_input)
+        self.contact_input = QLineEdit()
+        form_layout.addRow("Contact Person:", self.contact_input)
+        self.email_input = QLineEdit()
+        form_layout.addRow("Email:", self.email_input)
+        self.phone_input = QLineEdit()
+        form_layout.addRow("Phone:", self.phone_input)
+        self.city_input = QLineEdit()
+        form_layout.addRow("City:", self.city_input)
+        self.state_input = QLineEdit()
+        form_layout.addRow("State:", self.state_input)
+        self.terms_combo = QComboBox()
+        self.terms_combo.setEditable(True)
+        self.terms_combo.addItems(["Net 7", "Net 15", "Net 30", "Net 60", "Net 90"])
+        self.terms_combo.setCurrentText("Net 30")
+        form_layout.addRow("Payment Terms:", self.terms_combo)
+        layout.addWidget(form_group)
+        
+        button_layout = QHBoxLayout()
+        save_btn = QPushButton("Save Supplier")
+        save_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #10B981;
+                color: white;
+                border: none;
+                padding: 10px 20px;
+                border-radius: 6px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #059669;
+            }
+        """)
+        save_btn.clicked.connect(self.accept)
+        cancel_btn = QPushButton("Cancel")
+        cancel_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #6B7280;
+                color: white;
+                border: none;
+                padding: 10px 20px;
+                border-radius: 6px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #4B5563;
+            }
+        """)
+        cancel_btn.clicked.connect(self.reject)
+        button_layout.addWidget(save_btn)
+        button_layout.addWidget(cancel_btn)
+        layout.addLayout(button_layout)
+        
+    def get_data(self):
+        """Get form data"""
+        return {
+            'name': self.name_input.text().strip(),
+            'contact_person': self.contact_input.text().strip() or None,
+            'email': self.email_input.text().strip() or None,
+            'phone': self.phone_input.text().strip() or None,
+            'city': self.city_input.text().strip() or None,
+            'state': self.state_input.text().strip() or None,
+            'payment_terms': self.terms_combo.currentText().strip() or None,
+        }
 
 
 class PurchaseDialog(QDialog):
     """Dialog for creating/editing purchases"""
     
-    def __init__(self, parent=None, purchase_data=None):
+    def __init__(self, parent=None, purchase_data=None, products=None):
         super().__init__(parent)
+        self.products = products or []
         self.purchase_data = purchase_data
         self.setup_ui()
         
@@ -46,6 +353,8 @@ class PurchaseDialog(QDialog):
         # Product selection
         self.product_combo = QComboBox()
         self.product_combo.setEditable(True)
+        for product in self.products:
+            self.product_combo.addItem(product['name'], product['id'])
         form_layout.addRow("Product:", self.product_combo)
         
         # Batch number
@@ -150,14 +459,28 @@ class PurchaseDialog(QDialog):
     def load_data(self):
         """Load existing purchase data"""
         if self.purchase_data:
-            # Load existing data into form
-            pass
+            data = self.purchase_data
+            self.supplier_combo.setCurrentText(data['supplier_name'] or "")
+            self.purchase_date.setDate(QDate.fromString(str(data['purchase_date'])[:10], Qt.DateFormat.ISODate))
+            index = self.product_combo.findData(data['product_id']) if data['product_id'] else -1
+            if index >= 0:
+                self.product_combo.setCurrentIndex(index)
+            else:
+                self.product_combo.setCurrentText(data['product_name'] or "")
+            self.batch_input.setText(data.get('batch_number') or "")
+            self.quantity_spin.setValue(data['quantity'])
+            self.unit_price_spin.setValue(float(data['unit_price']))
+            self.payment_combo.setCurrentText(data['payment_method'] or "")
+            self.payment_status_combo.setCurrentText(data['payment_status'] or "")
+            self.notes_text.setPlainText(data['notes'] or "")
+            self.calculate_total()
             
     def get_data(self):
         """Get form data"""
         return {
             'supplier_name': self.supplier_combo.currentText(),
-            'purchase_date': self.purchase_date.date().toPython(),
+            'purchase_date': self.purchase_date.date().toPyDate(),
+            'product_id': selected_product_id(self.product_combo),
             'product_name': self.product_combo.currentText(),
             'batch_number': self.batch_input.text(),
             'quantity': self.quantity_spin.value(),
@@ -165,7 +488,7 @@ class PurchaseDialog(QDialog):
             'total_amount': float(self.total_amount_label.text().replace('PKR', '').replace(',', '').strip()),
             'payment_method': self.payment_combo.currentText(),
             'payment_status': self.payment_status_combo.currentText(),
-            'expiry_date': self.expiry_date.date().toPython(),
+            'expiry_date': self.expiry_date.date().toPyDate(),
             'notes': self.notes_text.toPlainText()
         }
 
@@ -173,8 +496,9 @@ class PurchaseDialog(QDialog):
 class PurchaseDemandDialog(QDialog):
     """Dialog for creating purchase demands"""
     
-    def __init__(self, parent=None):
+    def __init__(self, parent=None, products=None):
         super().__init__(parent)
+        self.products = products or []
         self.setup_ui()
         
     def setup_ui(self):
@@ -192,6 +516,8 @@ class PurchaseDemandDialog(QDialog):
         # Product selection
         self.product_combo = QComboBox()
         self.product_combo.setEditable(True)
+        for product in self.products:
+            self.product_combo.addItem(product['name'], product['id'])
         form_layout.addRow("Product:", self.product_combo)
         
         # Quantity demanded
@@ -254,6 +580,7 @@ class PurchaseDemandDialog(QDialog):
     def get_data(self):
         """Get form data"""
         return {
+            'product_id': selected_product_id(self.product_combo),
             'product_name': self.product_combo.currentText(),
             'quantity_demanded': self.quantity_spin.value(),
             'priority': self.priority_combo.currentText(),
@@ -509,6 +836,26 @@ class PurchasesTab(BaseTab):
             }
         """)
         add_demand_btn.clicked.connect(self.add_demand)
+        
+        # Raise demands from the reorder forecast
+        self.auto_demand_btn = QPushButton("⚡ Auto Reorder")
+        self.auto_demand_btn.setToolTip("Raise demands for every product at or below its reorder point")
+        self.auto_demand_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #10B981;
+                color: white;
+                border: none;
+                padding: 10px 20px;
+                border-radius: 6px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #059669;
+            }
+        """)
+        self.auto_demand_btn.clicked.connect(self.generate_demands)
+        self.forecast_thread = None
+        header_layout.addWidget(self.auto_demand_btn)
         header_layout.addWidget(add_demand_btn)
         
         layout.addLayout(header_layout)
@@ -590,22 +937,28 @@ class PurchasesTab(BaseTab):
         
         layout.addLayout(header_layout)
         
-        # Suppliers table
-        self.suppliers_table = QTableWidget()
+        # Suppliers table; a model/view table so thousands of suppliers cost only the visible rows
+        self.suppliers_model = SupplierStatsModel(self)
+        self.suppliers_table = QTableView()
+        self.suppliers_table.setModel(self.suppliers_model)
+        self.suppliers_table.setSortingEnabled(True)
+        self.suppliers_table.sortByColumn(4, Qt.SortOrder.DescendingOrder)  # biggest spend first
+        self.suppliers_table.verticalHeader().setVisible(False)
+        self.suppliers_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
         self.suppliers_table.setStyleSheet("""
-            QTableWidget {
+            QTableView {
                 background: transparent;
                 border: 2px solid rgba(255, 255, 255, 0.1);
                 border-radius: 15px;
                 gridline-color: rgba(255, 255, 255, 0.05);
                 color: #f8fafc;
             }
-            QTableWidget::item {
+            QTableView::item {
                 padding: 8px;
                 border-bottom: 1px solid rgba(255, 255, 255, 0.05);
                 background: transparent;
             }
-            QTableWidget::item:selected {
+            QTableView::item:selected {
                 background-color: rgba(59, 130, 246, 0.2);
             }
             QHeaderView::section {
@@ -617,12 +970,6 @@ class PurchasesTab(BaseTab):
             }
         """)
         
-        # Set table columns
-        self.suppliers_table.setColumnCount(8)
-        self.suppliers_table.setHorizontalHeaderLabels([
-            "ID", "Name", "Contact Person", "Email", "Phone", "City", "Payment Terms", "Actions"
-        ])
-        
         layout.addWidget(self.suppliers_table)
         
         return tab
@@ -644,20 +991,37 @@ class PurchasesTab(BaseTab):
         """)
         layout.addWidget(title)
         
+        # Report period; payables aging is as of the end date
+        period_layout = QHBoxLayout()
+        period_layout.addWidget(QLabel("From:"))
+        self.report_start = QDateEdit()
+        self.report_start.setCalendarPopup(True)
+        self.report_start.setDate(QDate.currentDate().addYears(-1))
+        period_layout.addWidget(self.report_start)
+        period_layout.addWidget(QLabel("To:"))
+        self.report_end = QDateEdit()
+        self.report_end.setCalendarPopup(True)
+        self.report_end.setDate(QDate.currentDate())
+        period_layout.addWidget(self.report_end)
+        period_layout.addStretch()
+        self.report_status = QLabel("")
+        self.report_status.setStyleSheet("color: #cbd5e1;")
+        period_layout.addWidget(self.report_status)
+        layout.addLayout(period_layout)
+        
         # Report buttons
         reports_layout = QGridLayout()
         
         reports = [
-            ("Purchase Summary", "📊", "View purchase summary report"),
-            ("Supplier Analysis", "🏢", "Analyze supplier performance"),
-            ("Product Analysis", "📦", "Analyze product purchases"),
-            ("Payment Status", "💰", "View payment status report"),
-            ("Expiry Report", "⏰", "View product expiry report"),
-            ("Demand Report", "📋", "View purchase demands report")
+            ('supplier_spend', "🏢", "Spend, units and outstanding amount per supplier"),
+            ('product_spend', "📦", "Spend and average unit price per product"),
+            ('payables_aging', "💰", "Unpaid purchases by supplier and age at the end date"),
+            ('price_variance', "📈", "Monthly unit price of each product against its period average"),
         ]
+        self.report_thread = None
         
-        for i, (title, icon, description) in enumerate(reports):
-            btn = QPushButton(f"{icon} {title}")
+        for i, (report, icon, description) in enumerate(reports):
+            btn = QPushButton(f"{icon} {REPORTS[report]}")
             btn.setStyleSheet("""
                 QPushButton {
                     background: transparent;
@@ -675,7 +1039,7 @@ class PurchasesTab(BaseTab):
                 }
             """)
             btn.setToolTip(description)
-            btn.clicked.connect(lambda checked, t=title: self.generate_report(t))
+            btn.clicked.connect(lambda checked, r=report: self.generate_report(r))
             
             row = i // 2
             col = i % 2
@@ -767,7 +1131,7 @@ class PurchasesTab(BaseTab):
                             background-color: #2563EB;
                         }
                     """)
-                    edit_btn.clicked.connect(lambda checked, purchase_id=purchase[0]: self.edit_purchase(purchase_id))
+                    edit_btn.clicked.connect(lambda checked, purchase_id=purchase['id']: self.edit_purchase(purchase_id))
                     
                     delete_btn = QPushButton("Delete")
                     delete_btn.setStyleSheet("""
@@ -783,7 +1147,7 @@ class PurchasesTab(BaseTab):
                             background-color: #DC2626;
                         }
                     """)
-                    delete_btn.clicked.connect(lambda checked, purchase_id=purchase[0]: self.delete_purchase(purchase_id))
+                    delete_btn.clicked.connect(lambda checked, purchase_id=purchase['id']: self.delete_purchase(purchase_id))
                     
                     actions_layout.addWidget(edit_btn)
                     actions_layout.addWidget(delete_btn)
@@ -793,35 +1157,143 @@ class PurchasesTab(BaseTab):
             else:
                 self.purchases_table.setRowCount(0)
                 
+            self.show_queued_purchases()
+                
         except Exception as e:
             self.show_error(f"Error loading purchases data: {str(e)}")
             
+    def show_queued_purchases(self):
+        """Append purchases journaled offline and not yet replayed"""
+        for purchase in offline_queue.pending('purchase'):
+            row = self.purchases_table.rowCount()
+            self.purchases_table.insertRow(row)
+            values = [
+                "Queued", purchase['supplier_name'], purchase['product_name'], purchase.get('batch_number'),
+                str(purchase['quantity']), f"PKR {float(purchase['unit_price']):.2f}",
+                f"PKR {float(purchase['total_amount']):.2f}", purchase['purchase_date'], "Queued"
+            ]
+            for column, value in enumerate(values):
+                item = QTableWidgetItem(value or "N/A")
+                item.setForeground(Qt.GlobalColor.gray)
+                self.purchases_table.setItem(row, column, item)
+            
+    def load_product_choices(self):
+        """Active products for the dialogs' product pickers, by name"""
+        result = self.execute_query("SELECT id, name FROM products WHERE is_active = TRUE ORDER BY name")
+        return result or []
+        
     def load_demands_data(self):
-        """Load purchase demands data"""
-        # Implementation for loading demands data
-        pass
+        """Load open purchase demands, most pressing first"""
+        try:
+            query = f"""
+                SELECT d.id, p.name AS product_name, d.quantity_demanded, d.priority, d.status,
+                       u.username, d.reason
+                FROM purchase_demands d
+                JOIN products p ON p.id = d.product_id
+                LEFT JOIN users u ON u.id = d.requested_by
+                WHERE d.status IN ('PENDING', 'ORDERED')
+                ORDER BY CASE d.priority WHEN 'URGENT' THEN 0 WHEN 'HIGH' THEN 1 WHEN 'MEDIUM' THEN 2 ELSE 3 END,
+                         d.created_at DESC
+                LIMIT {DEMAND_ROWS}
+            """
+            result = self.execute_query(query) or []
+            self.demands_table.setRowCount(len(result))
+            
+            for row, demand in enumerate(result):
+                self.demands_table.setItem(row, 0, QTableWidgetItem(str(demand['id'])))
+                product_item = QTableWidgetItem(demand['product_name'])
+                product_item.setToolTip(demand['reason'] or "")
+                self.demands_table.setItem(row, 1, product_item)
+                self.demands_table.setItem(row, 2, QTableWidgetItem(str(demand['quantity_demanded'])))
+                
+                priority_item = QTableWidgetItem(demand['priority'])
+                if demand['priority'] == "URGENT":
+                    priority_item.setBackground(Qt.GlobalColor.red)
+                elif demand['priority'] == "HIGH":
+                    priority_item.setBackground(Qt.GlobalColor.yellow)
+                self.demands_table.setItem(row, 3, priority_item)
+                
+                self.demands_table.setItem(row, 4, QTableWidgetItem(demand['status']))
+                self.demands_table.setItem(row, 5, QTableWidgetItem(demand['username'] or "N/A"))
+                
+                cancel_btn = QPushButton("Cancel")
+                cancel_btn.setStyleSheet("""
+                    QPushButton {
+                        background-color: #EF4444;
+                        color: white;
+                        border: none;
+                        padding: 4px 8px;
+                        border-radius: 4px;
+                        font-size: 12px;
+                    }
+                    QPushButton:hover {
+                        background-color: #DC2626;
+                    }
+                """)
+                cancel_btn.clicked.connect(lambda checked, demand_id=demand['id']: self.cancel_demand(demand_id))
+                self.demands_table.setCellWidget(row, 6, cancel_btn)
+                
+        except Exception as e:
+            self.show_error(f"Error loading demands data: {str(e)}")
+            
+    def generate_demands(self):
+        """Raise demands from the reorder forecast in the background"""
+        if self.forecast_thread and self.forecast_thread.isRunning():
+            return
+        self.auto_demand_btn.setEnabled(False)
+        self.forecast_thread = DemandForecastThread(self.user_data['id'])
+        self.forecast_thread.finished.connect(self.demands_generated)
+        self.forecast_thread.start()
+        
+    def demands_generated(self, success, message):
+        """Show the forecast outcome and the new demands"""
+        self.auto_demand_btn.setEnabled(True)
+        if success:
+            self.show_success(message)
+            QMessageBox.information(self, "Auto Reorder", message)
+            self.load_demands_data()
+        else:
+            self.show_error(message)
+            
+    def cancel_demand(self, demand_id):
+        """Cancel an open purchase demand"""
+        result = self.execute_write(
+            "UPDATE purchase_demands SET status = 'CANCELLED' WHERE id = %s", (demand_id,)
+        )
+        self.show_write_result(result, "Purchase demand cancelled")
+        self.load_demands_data()
         
     def load_suppliers_data(self):
-        """Load suppliers data"""
-        # Implementation for loading suppliers data
-        pass
+        """Load supplier spend, price trend and payment record"""
+        try:
+            self.suppliers_model.set_rows(supplier_performance())
+            header = self.suppliers_table.horizontalHeader()
+            if header.sortIndicatorSection() >= 0:
+                self.suppliers_model.sort(header.sortIndicatorSection(), header.sortIndicatorOrder())
+        except Exception as e:
+            self.show_error(f"Error loading suppliers data: {str(e)}")
         
     def add_purchase(self):
         """Add new purchase"""
-        dialog = PurchaseDialog(self)
+        dialog = PurchaseDialog(self, products=self.load_product_choices())
         if dialog.exec() == QDialog.DialogCode.Accepted:
             data = dialog.get_data()
             self.save_purchase(data)
             
     def edit_purchase(self, purchase_id):
         """Edit existing purchase"""
-        dialog = PurchaseDialog(self)
+        rows = self.execute_query("SELECT * FROM purchases WHERE id = %s", (purchase_id,))
+        if not rows:
+            self.show_error(f"Purchase {purchase_id} no longer exists")
+            self.refresh_data()
+            return
+        dialog = PurchaseDialog(self, purchase_data=rows[0], products=self.load_product_choices())
         if dialog.exec() == QDialog.DialogCode.Accepted:
             data = dialog.get_data()
             self.update_purchase(purchase_id, data)
             
     def delete_purchase(self, purchase_id):
-        """Delete purchase"""
+        """Delete purchase and take its stock back out"""
         reply = QMessageBox.question(
             self, "Delete Purchase", 
             "Are you sure you want to delete this purchase?",
@@ -830,72 +1302,59 @@ class PurchasesTab(BaseTab):
         
         if reply == QMessageBox.StandardButton.Yes:
             try:
-                query = "DELETE FROM purchases WHERE id = %s"
-                self.execute_query(query, (purchase_id,))
-                self.show_success("Purchase deleted successfully")
+                result = StockLedger(self.db).delete_purchase(purchase_id)
+                self.show_write_result(result, "Purchase deleted successfully")
                 self.refresh_data()
+            except StockError as e:
+                self.show_error(str(e))
             except Exception as e:
                 self.show_error(f"Error deleting purchase: {str(e)}")
                 
     def save_purchase(self, data):
-        """Save new purchase"""
+        """Save new purchase and receive its stock"""
         try:
-            query = """
-                INSERT INTO purchases (supplier_name, product_name, batch_number, quantity, 
-                                     unit_price, total_amount, purchase_date, payment_method, 
-                                     payment_status, notes, created_at)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, NOW())
-            """
-            params = (
-                data['supplier_name'],
-                data['product_name'],
-                data['batch_number'],
-                data['quantity'],
-                data['unit_price'],
-                data['total_amount'],
-                data['purchase_date'],
-                data['payment_method'],
-                data['payment_status'],
-                data['notes']
+            line = {
+                'product_id': data['product_id'],
+                'product_name': data['product_name'],
+                'quantity': data['quantity'],
+                'unit_price': data['unit_price'],
+                'batch_number': data['batch_number'],
+                'notes': f"Batch {data['batch_number']}" if data['batch_number'] else None,
+            }
+            result = StockLedger(self.db).record_purchase(
+                [line], data['supplier_name'], data['purchase_date'], data['payment_method'],
+                data['payment_status'], data['notes'], offline=True
             )
-            self.execute_query(query, params)
-            self.show_success("Purchase saved successfully")
+            self.show_write_result(result, "Purchase saved successfully")
             self.refresh_data()
+        except StockError as e:
+            self.show_error(str(e))
         except Exception as e:
             self.show_error(f"Error saving purchase: {str(e)}")
             
     def update_purchase(self, purchase_id, data):
-        """Update existing purchase"""
+        """Update existing purchase and correct its stock"""
         try:
-            query = """
-                UPDATE purchases SET supplier_name = %s, product_name = %s, batch_number = %s,
-                                   quantity = %s, unit_price = %s, total_amount = %s,
-                                   purchase_date = %s, payment_method = %s, payment_status = %s,
-                                   notes = %s, updated_at = NOW()
-                WHERE id = %s
-            """
-            params = (
-                data['supplier_name'],
-                data['product_name'],
-                data['batch_number'],
-                data['quantity'],
-                data['unit_price'],
-                data['total_amount'],
-                data['purchase_date'],
-                data['payment_method'],
-                data['payment_status'],
-                data['notes'],
-                purchase_id
-            )
-            self.execute_query(query, params)
-            self.show_success("Purchase updated successfully")
+            result = StockLedger(self.db).update_purchase(purchase_id, data)
+            self.show_write_result(result, "Purchase updated successfully")
             self.refresh_data()
+        except StockError as e:
+            self.show_error(str(e))
         except Exception as e:
             self.show_error(f"Error updating purchase: {str(e)}")
             
+    def show_write_result(self, result, message):
+        """Report a write that was applied, journaled offline or rejected"""
+        if result == QUEUED:
+            self.show_success(f"{message} offline; it will sync when the server is reachable")
+        elif result is None:
+            self.show_error("The database rejected the change; see the log for details")
+        else:
+            self.show_success(message)
+            
     def add_demand(self):
         """Add new purchase demand"""
-        dialog = PurchaseDemandDialog(self)
+        dialog = PurchaseDemandDialog(self, products=self.load_product_choices())
         if dialog.exec() == QDialog.DialogCode.Accepted:
             data = dialog.get_data()
             self.save_demand(data)
@@ -903,32 +1362,66 @@ class PurchasesTab(BaseTab):
     def save_demand(self, data):
         """Save new purchase demand"""
         try:
+            if data['product_id'] is None:
+                self.show_error(f"Unknown product: {data['product_name']}")
+                return
             query = """
                 INSERT INTO purchase_demands (product_id, quantity_demanded, priority, 
                                             reason, requested_by, created_at)
-                VALUES ((SELECT id FROM products WHERE name = %s LIMIT 1), %s, %s, %s, %s, NOW())
+                VALUES (%s, %s, %s, %s, %s, NOW())
             """
             params = (
-                data['product_name'],
+                data['product_id'],
                 data['quantity_demanded'],
                 data['priority'],
                 data['reason'],
                 self.user_data['id']
             )
-            self.execute_query(query, params)
-            self.show_success("Purchase demand created successfully")
+            result = self.execute_write(query, params)
+            self.show_write_result(result, "Purchase demand created successfully")
             self.refresh_data()
         except Exception as e:
             self.show_error(f"Error saving demand: {str(e)}")
             
     def add_supplier(self):
         """Add new supplier"""
-        # Implementation for adding supplier
-        pass
+        dialog = SupplierDialog(self)
+        if dialog.exec() == QDialog.DialogCode.Accepted:
+            data = dialog.get_data()
+            if not data['name']:
+                self.show_error("Supplier name is required")
+                return
+            query = """
+                INSERT INTO suppliers (name, contact_person, email, phone, city, state, payment_terms)
+                VALUES (%s, %s, %s, %s, %s, %s, %s)
+            """
+            params = (data['name'], data['contact_person'], data['email'], data['phone'], data['city'],
+                      data['state'], data['payment_terms'])
+            result = self.execute_write(query, params)
+            self.show_write_result(result, "Supplier added successfully")
+            self.load_suppliers_data()
         
     def generate_report(self, report_type):
-        """Generate purchase report"""
-        self.show_success(f"Generating {report_type} report...")
+        """Run a purchase report in the background and show it when done"""
+        if self.report_thread and self.report_thread.isRunning():
+            self.show_error("A purchase report is already running")
+            return
+        start = self.report_start.date().toPyDate()
+        end = self.report_end.date().toPyDate()
+        self.report_thread = PurchaseReportThread(report_type, start, end)
+        self.report_thread.status.connect(self.report_status.setText)
+        self.report_thread.finished.connect(
+            lambda success, message, result: self.report_finished(report_type, start, end, success, message, result)
+        )
+        self.report_thread.start()
+        
+    def report_finished(self, report_type, start, end, success, message, result):
+        """Show a finished purchase report"""
+        self.report_status.setText(message)
+        if not success:
+            self.show_error(message)
+            return
+        PurchaseReportDialog(self, report_type, start, end, result).exec()
         
     def filter_purchases(self):
         """Filter purchases based on search criteria"""
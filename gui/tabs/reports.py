@@ -6,10 +6,13 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
                             QLabel, QPushButton, QTableWidget, QTableWidgetItem,
                             QLineEdit, QComboBox, QDateEdit, QGroupBox, 
                             QHeaderView, QMessageBox, QFrame, QSplitter,
-                            QTextEdit, QProgressBar, QCheckBox)
-from PyQt6.QtCore import Qt, QDate, pyqtSignal
-from PyQt6.QtGui import QFont
+                            QTextEdit, QProgressBar, QCheckBox, QTableView)
+from PyQt6.QtCore import Qt, QDate, QThread, pyqtSignal, QAbstractTableModel, QModelIndex
+from PyQt6.QtGui import QFont, QColor
 from .base_tab import BaseTab
+from ssms.report_engine import (REPORTS, STYLE_BAD, STYLE_CRITICAL, STYLE_GOOD, STYLE_MUTED, STYLE_WARNING,
+                                submit)
+from ssms.report_schedule import SCHEDULED, ReportScheduler
 from datetime import datetime, timedelta
 import json
 
@@ -114,10 +117,119 @@ class ReportCard(QFrame):
         layout.addStretch()
 
 
+REPORT_TABLE_STYLE = """
+    QTableView {
+        background-color: rgba(255, 255, 255, 0.05);
+        border: 1px solid rgba(255, 255, 255, 0.1);
+        border-radius: 8px;
+        gridline-color: rgba(255, 255, 255, 0.1);
+        color: #f8fafc;
+    }
+    QTableView::item {
+        padding: 8px;
+        border-bottom: 1px solid rgba(255, 255, 255, 0.1);
+    }
+    QHeaderView::section {
+        background-color: rgba(255, 255, 255, 0.1);
+        color: #f8fafc;
+        padding: 8px;
+        border: none;
+        font-weight: bold;
+    }
+"""
+
+
+class ReportRenderThread(QThread):
+    """Thread that waits for a report rendered in a worker process"""
+    finished = pyqtSignal(bool, str, object)
+    
+    def __init__(self, report, params):
+        super().__init__()
+        self.report = report
+        self.params = params
+        
+    def run(self):
+        """Submit the report and wait for its table"""
+        try:
+            table = submit(self.report, **self.params).result()
+            self.finished.emit(True, f"{table.title}: {len(table):,} rows in {table.seconds:.1f}s", table)
+        except Exception as e:
+            self.finished.emit(False, f"Error loading {self.report.lower()}: {str(e)}", None)
+
+
+class ScheduledRefreshThread(QThread):
+    """Thread that recomputes a scheduled report and stores it for every terminal"""
+    finished = pyqtSignal(bool, str)
+    
+    def __init__(self, key):
+        super().__init__()
+        self.key = key
+        
+    def run(self):
+        """Compute and store the report"""
+        try:
+            rows = ReportScheduler().compute(self.key)
+            self.finished.emit(True, f"Refreshed, {rows:,} rows")
+        except Exception as e:
+            self.finished.emit(False, f"Error refreshing report: {str(e)}")
+
+
+class ReportTableModel(QAbstractTableModel):
+    """Table model over a rendered ReportTable; only the cells on screen are ever sliced out"""
+    
+    STYLE_COLORS = {
+        STYLE_GOOD: Qt.GlobalColor.green,
+        STYLE_WARNING: Qt.GlobalColor.yellow,
+        STYLE_BAD: Qt.GlobalColor.red,
+        STYLE_CRITICAL: Qt.GlobalColor.darkRed,
+        STYLE_MUTED: Qt.GlobalColor.gray,
+    }
+    
+    def __init__(self, table, parent=None):
+        super().__init__(parent)
+        self.table = table
+        
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.table)
+        
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.table.headers)
+        
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.table.headers[section]
+        return None
+        
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.DisplayRole:
+            return self.table.cell(index.row(), index.column())
+        if role == Qt.ItemDataRole.BackgroundRole and index.column() == self.table.style_column:
+            color = self.STYLE_COLORS.get(self.table.styles[index.row()])
+            return QColor(color) if color is not None else None
+        return None
+
+
+# Combo box title -> scheduled report key
+SCHEDULED_TITLES = {title: key for key, (title, _, _) in SCHEDULED.items()}
+
+
+def _age(delta):
+    minutes = int(delta.total_seconds() // 60)
+    if minutes < 60:
+        return f"{minutes} min"
+    if minutes < 48 * 60:
+        return f"{minutes // 60} h"
+    return f"{minutes // (24 * 60)} days"
+
+
 class ReportsTab(BaseTab):
     """Reports tab for analytics and reporting"""
     
     def __init__(self, user_data):
+        self.render_thread = None
+        self.render_threads = set()
         super().__init__("Reports & Analytics", "Business intelligence and reporting dashboard", user_data)
         
     def create_content(self):
@@ -175,6 +287,9 @@ class ReportsTab(BaseTab):
             "Sales Report", "Inventory Report", "Customer Report", 
             "Financial Report", "Product Performance"
         ])
+        # Pre-computed off-peak by the report scheduler
+        self.report_tabs.insertSeparator(self.report_tabs.count())
+        self.report_tabs.addItems(list(SCHEDULED_TITLES))
         self.report_tabs.setStyleSheet("""
             QComboBox {
                 background-color: rgba(255, 255, 255, 0.1);
@@ -257,6 +372,31 @@ class ReportsTab(BaseTab):
         """)
         layout.addWidget(self.end_date)
         
+        # Point-in-time stock for the inventory report
+        self.as_of_check = QCheckBox("Stock as of")
+        self.as_of_check.setStyleSheet("""
+            QCheckBox {
+                color: #f8fafc;
+                font-size: 14px;
+                font-weight: 600;
+            }
+        """)
+        self.as_of_check.toggled.connect(self.load_report)
+        layout.addWidget(self.as_of_check)
+        
+        self.as_of_date = QDateEdit()
+        self.as_of_date.setDate(QDate.currentDate())
+        self.as_of_date.setStyleSheet("""
+            QDateEdit {
+                background-color: rgba(255, 255, 255, 0.1);
+                border: 1px solid rgba(255, 255, 255, 0.2);
+                border-radius: 6px;
+                padding: 8px 12px;
+                color: #f8fafc;
+            }
+        """)
+        layout.addWidget(self.as_of_date)
+        
         # Report type
         self.report_type = QComboBox()
         self.report_type.addItems(["Daily", "Weekly", "Monthly", "Yearly"])
@@ -330,23 +470,23 @@ class ReportsTab(BaseTab):
                     child.setParent(None)
                     
             # Get date range
-            start_date = self.start_date.date().toPython()
-            end_date = self.end_date.date().toPython()
+            start_date = self.start_date.date().toPyDate()
+            end_date = self.end_date.date().toPyDate()
             
             # Total Sales
             sales_query = """
                 SELECT COALESCE(SUM(total_amount), 0) as total_sales FROM sales 
-                WHERE DATE(created_at) BETWEEN %s AND %s
+                WHERE created_at >= %s AND created_at < %s
             """
-            sales_result = self.execute_query(sales_query, (start_date, end_date))
+            sales_result = self.execute_query(sales_query, (start_date, end_date + timedelta(days=1)))
             total_sales = sales_result[0]['total_sales'] if sales_result and sales_result[0]['total_sales'] else 0
             
             # Total Orders
             orders_query = """
                 SELECT COUNT(*) as total_orders FROM sales 
-                WHERE DATE(created_at) BETWEEN %s AND %s
+                WHERE created_at >= %s AND created_at < %s
             """
-            orders_result = self.execute_query(orders_query, (start_date, end_date))
+            orders_result = self.execute_query(orders_query, (start_date, end_date + timedelta(days=1)))
             total_orders = orders_result[0]['total_orders'] if orders_result and orders_result[0]['total_orders'] else 0
             
             # Average Order Value
@@ -355,21 +495,25 @@ class ReportsTab(BaseTab):
             # New Customers
             customers_query = """
                 SELECT COUNT(DISTINCT customer_id) as new_customers FROM sales 
-                WHERE DATE(created_at) BETWEEN %s AND %s
+                WHERE created_at >= %s AND created_at < %s
             """
-            customers_result = self.execute_query(customers_query, (start_date, end_date))
+            customers_result = self.execute_query(customers_query, (start_date, end_date + timedelta(days=1)))
             new_customers = customers_result[0]['new_customers'] if customers_result and customers_result[0]['new_customers'] else 0
             
             # Top Selling Product
             top_product_query = """
-                SELECT product_name, SUM(quantity) as total_qty
-                FROM sales 
-                WHERE DATE(created_at) BETWEEN %s AND %s
-                GROUP BY product_name
-                ORDER BY total_qty DESC
-                LIMIT 1
+                SELECT p.name AS product_name, t.total_qty
+                FROM (
+                    SELECT product_id, SUM(quantity) as total_qty
+                    FROM sales 
+                    WHERE created_at >= %s AND created_at < %s
+                    GROUP BY product_id
+                    ORDER BY total_qty DESC
+                    LIMIT 1
+                ) t
+                JOIN products p ON p.id = t.product_id
             """
-            top_product_result = self.execute_query(top_product_query, (start_date, end_date))
+            top_product_result = self.execute_query(top_product_query, (start_date, end_date + timedelta(days=1)))
             top_product = top_product_result[0]['product_name'] if top_product_result and top_product_result[0]['product_name'] else "N/A"
             
             # Create metric cards
@@ -400,205 +544,132 @@ class ReportsTab(BaseTab):
             child = self.report_layout.itemAt(i).widget()
             if child:
                 child.setParent(None)
+        # A render still running belongs to the report just cleared
+        self.render_thread = None
                 
-        if report_type == "Sales Report":
-            self.load_sales_report()
-        elif report_type == "Inventory Report":
-            self.load_inventory_report()
-        elif report_type == "Customer Report":
-            self.load_customer_report()
-        elif report_type == "Financial Report":
+        if report_type == "Financial Report":
             self.load_financial_report()
-        elif report_type == "Product Performance":
-            self.load_product_performance_report()
-            
-    def load_sales_report(self):
-        """Load sales report"""
-        try:
-            # Create sales report table
-            table = QTableWidget()
-            table.setStyleSheet("""
-                QTableWidget {
-                    background-color: rgba(255, 255, 255, 0.05);
-                    border: 1px solid rgba(255, 255, 255, 0.1);
-                    border-radius: 8px;
-                    gridline-color: rgba(255, 255, 255, 0.1);
-                    color: #f8fafc;
-                }
-                QTableWidget::item {
-                    padding: 8px;
-                    border-bottom: 1px solid rgba(255, 255, 255, 0.1);
-                }
-                QHeaderView::section {
-                    background-color: rgba(255, 255, 255, 0.1);
-                    color: #f8fafc;
-                    padding: 8px;
-                    border: none;
-                    font-weight: bold;
-                }
-            """)
-            
-            table.setColumnCount(6)
-            table.setHorizontalHeaderLabels([
-                "Date", "Customer", "Product", "Quantity", "Amount", "Payment"
-            ])
-            
-            # Query sales data
-            start_date = self.start_date.date().toPython()
-            end_date = self.end_date.date().toPython()
-            
-            query = """
-                SELECT DATE(created_at), customer_name, product_name, 
-                       quantity, total_amount, payment_method
-                FROM sales 
-                WHERE DATE(created_at) BETWEEN %s AND %s
-                ORDER BY created_at DESC
-            """
-            result = self.execute_query(query, (start_date, end_date))
-            
-            if result:
-                table.setRowCount(len(result))
-                for row, sale in enumerate(result):
-                    table.setItem(row, 0, QTableWidgetItem(str(sale[0])))
-                    table.setItem(row, 1, QTableWidgetItem(sale[1] or "N/A"))
-                    table.setItem(row, 2, QTableWidgetItem(sale[2] or "N/A"))
-                    table.setItem(row, 3, QTableWidgetItem(str(sale[3])))
-                    table.setItem(row, 4, QTableWidgetItem(f"PKR {sale[4]:.2f}"))
-                    table.setItem(row, 5, QTableWidgetItem(sale[5] or "N/A"))
-            else:
-                table.setRowCount(0)
-                
-            self.report_layout.addWidget(table)
-            
-        except Exception as e:
-            self.show_error(f"Error loading sales report: {str(e)}")
-            
-    def load_inventory_report(self):
-        """Load inventory report"""
+        elif report_type in REPORTS:
+            self.render_report(report_type)
+        elif report_type in SCHEDULED_TITLES:
+            self.load_scheduled_report(SCHEDULED_TITLES[report_type])
+            
+    def render_report(self, report_type):
+        """Query and format a detailed report in a worker process, then show it"""
+        params = {'start': self.start_date.date().toPyDate(), 'end': self.end_date.date().toPyDate()}
+        if report_type == "Inventory Report" and self.as_of_check.isChecked():
+            params['as_of'] = self.as_of_date.date().toPyDate()
+            
+        self.report_status = QLabel(f"Loading {report_type.lower()}...")
+        self.report_status.setStyleSheet("color: #cbd5e1;")
+        self.report_layout.addWidget(self.report_status)
+        
+        # Earlier renders still running are kept alive but their results are ignored
+        self.render_thread = ReportRenderThread(report_type, params)
+        self.keep_render_thread(self.render_thread)
+        self.render_thread.finished.connect(self.report_rendered)
+        self.render_thread.start()
+        
+    def report_rendered(self, success, message, table):
+        """Show a rendered report if it is still the one asked for"""
+        thread = self.sender()
+        self.keep_render_thread()
+        if thread is not self.render_thread:
+            return
+        self.report_status.setText(message)
+        if not success:
+            self.show_error(message)
+            return
+        self.show_report_table(table)
+        
+    def keep_render_thread(self, thread=None):
+        """Hold a reference to thread, dropping those whose run() has returned
+
+        A thread emits its result signal before run() returns, so it is only
+        released on a later call, never while Qt is still running it.
+        """
+        self.render_threads = {running for running in self.render_threads if not running.isFinished()}
+        if thread is not None:
+            self.render_threads.add(thread)
+        
+    def show_report_table(self, table):
+        """Add a rendered report to the report area"""
+        view = QTableView()
+        view.setStyleSheet(REPORT_TABLE_STYLE)
+        view.setModel(ReportTableModel(table, view))
+        view.verticalHeader().setVisible(False)
+        view.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Interactive)
+        view.horizontalHeader().setStretchLastSection(True)
+        self.report_layout.addWidget(view)
+            
+    def load_scheduled_report(self, key):
+        """Show the stored result of a scheduled report with how current it is"""
         try:
-            # Create inventory report table
-            table = QTableWidget()
-            table.setStyleSheet("""
-                QTableWidget {
-                    background-color: rgba(255, 255, 255, 0.05);
-                    border: 1px solid rgba(255, 255, 255, 0.1);
-                    border-radius: 8px;
-                    gridline-color: rgba(255, 255, 255, 0.1);
-                    color: #f8fafc;
-                }
-                QTableWidget::item {
-                    padding: 8px;
-                    border-bottom: 1px solid rgba(255, 255, 255, 0.1);
-                }
-                QHeaderView::section {
-                    background-color: rgba(255, 255, 255, 0.1);
-                    color: #f8fafc;
-                    padding: 8px;
-                    border: none;
-                    font-weight: bold;
-                }
-            """)
-            
-            table.setColumnCount(7)
-            table.setHorizontalHeaderLabels([
-                "Product", "Category", "Stock", "Min Level", "Price", "Value", "Status"
-            ])
-            
-            # Query inventory data
-            query = """
-                SELECT name, category, stock_quantity, min_stock_level, 
-                       selling_price, (stock_quantity * selling_price) as total_value
-                FROM products
-                ORDER BY name ASC
-            """
-            result = self.execute_query(query)
-            
-            if result:
-                table.setRowCount(len(result))
-                for row, product in enumerate(result):
-                    table.setItem(row, 0, QTableWidgetItem(product[0] or "N/A"))
-                    table.setItem(row, 1, QTableWidgetItem(product[1] or "N/A"))
-                    table.setItem(row, 2, QTableWidgetItem(str(product[2])))
-                    table.setItem(row, 3, QTableWidgetItem(str(product[3])))
-                    table.setItem(row, 4, QTableWidgetItem(f"PKR {product[4]:.2f}"))
-                    table.setItem(row, 5, QTableWidgetItem(f"PKR {product[5]:.2f}"))
-                    
-                    # Status
-                    status = "Low Stock" if product[2] <= product[3] else "In Stock" if product[2] > 0 else "Out of Stock"
-                    status_item = QTableWidgetItem(status)
-                    if status == "Low Stock":
-                        status_item.setBackground(Qt.GlobalColor.red)
-                    elif status == "Out of Stock":
-                        status_item.setBackground(Qt.GlobalColor.darkRed)
-                    else:
-                        status_item.setBackground(Qt.GlobalColor.green)
-                    table.setItem(row, 6, status_item)
-            else:
-                table.setRowCount(0)
-                
-            self.report_layout.addWidget(table)
-            
+            table, info = ReportScheduler().load(key)
         except Exception as e:
-            self.show_error(f"Error loading inventory report: {str(e)}")
+            self.show_error(f"Error loading scheduled report: {str(e)}")
+            return
             
-    def load_customer_report(self):
-        """Load customer report"""
-        try:
-            # Create customer report table
-            table = QTableWidget()
-            table.setStyleSheet("""
-                QTableWidget {
-                    background-color: rgba(255, 255, 255, 0.05);
-                    border: 1px solid rgba(255, 255, 255, 0.1);
-                    border-radius: 8px;
-                    gridline-color: rgba(255, 255, 255, 0.1);
-                    color: #f8fafc;
-                }
-                QTableWidget::item {
-                    padding: 8px;
-                    border-bottom: 1px solid rgba(255, 255, 255, 0.1);
-                }
-                QHeaderView::section {
-                    background-color: rgba(255, 255, 255, 0.1);
-                    color: #f8fafc;
-                    padding: 8px;
-                    border: none;
-                    font-weight: bold;
-                }
-            """)
-            
-            table.setColumnCount(6)
-            table.setHorizontalHeaderLabels([
-                "Customer", "Email", "Phone", "Type", "Total Orders", "Total Spent"
-            ])
-            
-            # Query customer data
-            query = """
-                SELECT CONCAT(c.first_name, ' ', c.last_name) as name, c.email, c.phone, c.customer_type,
-                       COUNT(s.id) as total_orders, COALESCE(SUM(s.total_amount), 0) as total_spent
-                FROM customers c
-                LEFT JOIN sales s ON c.id = s.customer_id
-                GROUP BY c.id, c.first_name, c.last_name, c.email, c.phone, c.customer_type
-                ORDER BY total_spent DESC
-            """
-            result = self.execute_query(query)
-            
-            if result:
-                table.setRowCount(len(result))
-                for row, customer in enumerate(result):
-                    table.setItem(row, 0, QTableWidgetItem(customer[0] or "N/A"))
-                    table.setItem(row, 1, QTableWidgetItem(customer[1] or "N/A"))
-                    table.setItem(row, 2, QTableWidgetItem(customer[2] or "N/A"))
-                    table.setItem(row, 3, QTableWidgetItem(customer[3] or "N/A"))
-                    table.setItem(row, 4, QTableWidgetItem(str(customer[4])))
-                    table.setItem(row, 5, QTableWidgetItem(f"PKR {customer[5]:.2f}"))
-            else:
-                table.setRowCount(0)
-                
-            self.report_layout.addWidget(table)
-            
-        except Exception as e:
-            self.show_error(f"Error loading customer report: {str(e)}")
+        header = QWidget()
+        header_layout = QHBoxLayout(header)
+        header_layout.setContentsMargins(0, 0, 0, 0)
+        
+        self.report_status = QLabel(self.describe_result(info))
+        self.report_status.setStyleSheet(f"color: {'#F59E0B' if info['stale'] else '#10B981'}; font-weight: 600;")
+        header_layout.addWidget(self.report_status)
+        header_layout.addStretch()
+        
+        refresh_btn = QPushButton("Refresh Now")
+        refresh_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #3B82F6;
+                color: white;
+                border: none;
+                padding: 8px 16px;
+                border-radius: 6px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #2563EB;
+            }
+            QPushButton:disabled {
+                background-color: #64748B;
+            }
+        """)
+        refresh_btn.clicked.connect(lambda: self.refresh_scheduled_report(key, refresh_btn))
+        header_layout.addWidget(refresh_btn)
+        self.report_layout.addWidget(header)
+        
+        if table is not None:
+            self.show_report_table(table)
+            
+    def describe_result(self, info):
+        """Staleness line shown above a scheduled report"""
+        if info['computed_at'] is None:
+            return "Not computed yet - press Refresh Now"
+        computed_at = info['computed_at']
+        age = _age(datetime.now() - computed_at)
+        if info['stale']:
+            return (f"Out of date: {info['period']}, computed {computed_at:%d %b %H:%M} ({age} ago), "
+                    f"before the {info['due']:%d %b %H:%M} run")
+        return f"{info['period']}, computed {computed_at:%d %b %H:%M} ({age} ago)"
+        
+    def refresh_scheduled_report(self, key, button):
+        """Recompute a scheduled report now, then show it again if it is still selected"""
+        button.setEnabled(False)
+        self.report_status.setText("Refreshing...")
+        thread = ScheduledRefreshThread(key)
+        self.keep_render_thread(thread)
+        thread.finished.connect(lambda success, message: self.scheduled_report_refreshed(key, success, message))
+        thread.start()
+        
+    def scheduled_report_refreshed(self, key, success, message):
+        """Reload a refreshed scheduled report"""
+        self.keep_render_thread()
+        if not success:
+            self.show_error(message)
+        if SCHEDULED_TITLES.get(self.report_tabs.currentText()) == key:
+            self.load_report()
             
     def load_financial_report(self):
         """Load financial report"""
@@ -608,24 +679,25 @@ class ReportsTab(BaseTab):
             summary_layout = QVBoxLayout(summary_widget)
             
             # Financial metrics
-            start_date = self.start_date.date().toPython()
-            end_date = self.end_date.date().toPython()
+            start_date = self.start_date.date().toPyDate()
+            end_date = self.end_date.date().toPyDate()
             
             # Total Revenue
             revenue_query = """
                 SELECT COALESCE(SUM(total_amount), 0) as total_revenue FROM sales 
-                WHERE DATE(created_at) BETWEEN %s AND %s
+                WHERE created_at >= %s AND created_at < %s
             """
-            revenue_result = self.execute_query(revenue_query, (start_date, end_date))
+            revenue_result = self.execute_query(revenue_query, (start_date, end_date + timedelta(days=1)))
             total_revenue = revenue_result[0]['total_revenue'] if revenue_result and revenue_result[0]['total_revenue'] else 0
             
             # Total Cost (estimated)
             cost_query = """
-                SELECT COALESCE(SUM(quantity * (SELECT purchase_price FROM products WHERE name = s.product_name LIMIT 1)), 0) as total_cost
+                SELECT COALESCE(SUM(s.quantity * p.purchase_price), 0) as total_cost
                 FROM sales s 
-                WHERE DATE(created_at) BETWEEN %s AND %s
+                JOIN products p ON p.id = s.product_id
+                WHERE s.created_at >= %s AND s.created_at < %s
             """
-            cost_result = self.execute_query(cost_query, (start_date, end_date))
+            cost_result = self.execute_query(cost_query, (start_date, end_date + timedelta(days=1)))
             total_cost = cost_result[0]['total_cost'] if cost_result and cost_result[0]['total_cost'] else 0
             
             # Profit
@@ -651,78 +723,6 @@ class ReportsTab(BaseTab):
         except Exception as e:
             self.show_error(f"Error loading financial report: {str(e)}")
             
-    def load_product_performance_report(self):
-        """Load product performance report"""
-        try:
-            # Create product performance table
-            table = QTableWidget()
-            table.setStyleSheet("""
-                QTableWidget {
-                    background-color: rgba(255, 255, 255, 0.05);
-                    border: 1px solid rgba(255, 255, 255, 0.1);
-                    border-radius: 8px;
-                    gridline-color: rgba(255, 255, 255, 0.1);
-                    color: #f8fafc;
-                }
-                QTableWidget::item {
-                    padding: 8px;
-                    border-bottom: 1px solid rgba(255, 255, 255, 0.1);
-                }
-                QHeaderView::section {
-                    background-color: rgba(255, 255, 255, 0.1);
-                    color: #f8fafc;
-                    padding: 8px;
-                    border: none;
-                    font-weight: bold;
-                }
-            """)
-            
-            table.setColumnCount(6)
-            table.setHorizontalHeaderLabels([
-                "Product", "Units Sold", "Revenue", "Avg Price", "Rank", "Performance"
-            ])
-            
-            # Query product performance data
-            start_date = self.start_date.date().toPython()
-            end_date = self.end_date.date().toPython()
-            
-            query = """
-                SELECT product_name, SUM(quantity) as units_sold, 
-                       SUM(total_amount) as revenue, AVG(total_amount/quantity) as avg_price
-                FROM sales 
-                WHERE DATE(created_at) BETWEEN %s AND %s
-                GROUP BY product_name
-                ORDER BY units_sold DESC
-            """
-            result = self.execute_query(query, (start_date, end_date))
-            
-            if result:
-                table.setRowCount(len(result))
-                for row, product in enumerate(result):
-                    table.setItem(row, 0, QTableWidgetItem(product[0] or "N/A"))
-                    table.setItem(row, 1, QTableWidgetItem(str(product[1])))
-                    table.setItem(row, 2, QTableWidgetItem(f"PKR {product[2]:.2f}"))
-                    table.setItem(row, 3, QTableWidgetItem(f"PKR {product[3]:.2f}"))
-                    table.setItem(row, 4, QTableWidgetItem(f"#{row + 1}"))
-                    
-                    # Performance indicator
-                    performance = "Excellent" if row < 3 else "Good" if row < 6 else "Average"
-                    perf_item = QTableWidgetItem(performance)
-                    if performance == "Excellent":
-                        perf_item.setBackground(Qt.GlobalColor.green)
-                    elif performance == "Good":
-                        perf_item.setBackground(Qt.GlobalColor.yellow)
-                    else:
-                        perf_item.setBackground(Qt.GlobalColor.gray)
-                    table.setItem(row, 5, perf_item)
-            else:
-                table.setRowCount(0)
-                
-            self.report_layout.addWidget(table)
-            
-        except Exception as e:
-            self.show_error(f"Error loading product performance report: {str(e)}")
-            
     def create_financial_card(self, title, value, color):
         """Create financial card widget"""
         card = QFrame()
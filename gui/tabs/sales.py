@@ -3,6 +3,9 @@ from PyQt6.QtCore import *
 from PyQt6.QtGui import *
 from .base_tab import BaseTab
 from datetime import datetime, timedelta
+import logging
+
+logger = logging.getLogger(__name__)
 
 
 class CleanButton(QPushButton):
@@ -280,12 +283,10 @@ class SalesTab(BaseTab):
                 
                 self.sales_table.setCellWidget(row, 6, actions_widget)
                 
-            print(f"✅ Loaded {len(results)} sales records")
+            logger.debug("Loaded %s sales records", len(results))
             
         except Exception as e:
-            print(f"❌ Error loading sales data: {e}")
-            import traceback
-            traceback.print_exc()
+            logger.exception(f"Error loading sales data: {e}")
             QMessageBox.critical(self, "Error", f"Failed to load sales data: {e}")
     
     def filter_sales(self):
@@ -436,7 +436,7 @@ class SettingsTab(BaseTab):
         backup_layout = QFormLayout(backup_group)
         
         self.backup_frequency = QComboBox()
-        self.backup_frequency.addItems(["Daily", "Weekly", "Monthly"])
+        self.backup_frequency.addItems(["Hourly", "Daily", "Weekly", "Monthly"])
         self.backup_frequency.setCurrentText(self.settings_data.get("backup_frequency", "Daily"))
         backup_layout.addRow("Backup Frequency:", self.backup_frequency)
         
@@ -454,6 +454,26 @@ class SettingsTab(BaseTab):
         
         layout.addWidget(backup_group)
         
+        # Scheduled Reports
+        reports_group = QGroupBox("Scheduled Reports")
+        reports_layout = QFormLayout(reports_group)
+        
+        self.auto_reports = QCheckBox("Pre-compute morning reports off-peak")
+        self.auto_reports.setChecked(self.settings_data.get("auto_reports", True))
+        reports_layout.addRow(self.auto_reports)
+        
+        self.report_frequency = QComboBox()
+        self.report_frequency.addItems(["Hourly", "Daily", "Weekly", "Monthly"])
+        self.report_frequency.setCurrentText(self.settings_data.get("report_frequency", "Daily"))
+        reports_layout.addRow("Report Frequency:", self.report_frequency)
+        
+        self.report_hour = QSpinBox()
+        self.report_hour.setRange(0, 23)
+        self.report_hour.setValue(self.settings_data.get("report_hour", 5))
+        reports_layout.addRow("Run at Hour:", self.report_hour)
+        
+        layout.addWidget(reports_group)
+        
         # Backup Actions
         actions_group = QGroupBox("Backup Actions")
         actions_layout = QVBoxLayout(actions_group)
@@ -638,7 +658,10 @@ class SettingsTab(BaseTab):
             "backup_frequency": "Daily",
             "backup_location": "./backups",
             "auto_backup": True,
-            "compress_backups": True
+            "compress_backups": True,
+            "auto_reports": True,
+            "report_frequency": "Daily",
+            "report_hour": 5
         }
         
     def save_settings(self):
@@ -675,7 +698,10 @@ class SettingsTab(BaseTab):
                 "backup_frequency": self.backup_frequency.currentText(),
                 "backup_location": self.backup_location.text(),
                 "auto_backup": self.auto_backup.isChecked(),
-                "compress_backups": self.compress_backups.isChecked()
+                "compress_backups": self.compress_backups.isChecked(),
+                "auto_reports": self.auto_reports.isChecked(),
+                "report_frequency": self.report_frequency.currentText(),
+                "report_hour": self.report_hour.value()
             }
             
             # Save to file
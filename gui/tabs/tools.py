@@ -7,14 +7,24 @@ from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QGridLayout,
                             QLineEdit, QComboBox, QGroupBox, QHeaderView, 
                             QMessageBox, QDialog, QFormLayout, QTextEdit, 
                             QFrame, QSplitter, QProgressBar, QCheckBox,
-                            QFileDialog, QTextBrowser)
-from PyQt6.QtCore import Qt, QThread, pyqtSignal, QTimer
-from PyQt6.QtGui import QFont
+                            QFileDialog, QTextBrowser, QListView)
+from PyQt6.QtCore import (Qt, QThread, pyqtSignal, QTimer, QAbstractListModel,
+                          QModelIndex, QFileSystemWatcher)
+from PyQt6.QtGui import QFont, QColor
 from .base_tab import BaseTab
+from config import (LOG_DIR, SETTINGS_FILE, get_database_config, get_logging_config,
+                    get_user_settings)
+from ssms.backup import MANIFEST_FILE, BackupEngine
+from ssms.logview import LogIndex
+from ssms.maintenance import MaintenanceEngine, format_report
+from ssms.metrics import MetricsSampler
+from ssms.importer import ENTITIES, EXTENSIONS, ImportEngine
+from ssms.restore import RestoreEngine
 import json
 import os
 import shutil
-from datetime import datetime
+from collections import OrderedDict
+from datetime import datetime, timedelta
 
 
 class BackupThread(QThread):
@@ -23,48 +33,282 @@ class BackupThread(QThread):
     status = pyqtSignal(str)
     finished = pyqtSignal(bool, str)
     
-    def __init__(self, backup_path):
+    def __init__(self, backup_path, include_database=True, include_settings=True, include_logs=True,
+                 incremental=False):
         super().__init__()
         self.backup_path = backup_path
+        self.incremental = incremental
+        self.include_database = include_database
+        self.include_settings = include_settings
+        self.include_logs = include_logs
+        self.engine = None
         
     def run(self):
         """Run backup operation"""
         try:
             self.status.emit("Starting backup...")
-            self.progress.emit(10)
+            self.progress.emit(0)
             
-            # Create backup directory
-            os.makedirs(self.backup_path, exist_ok=True)
-            self.progress.emit(20)
+            include_files = []
+            if self.include_settings:
+                include_files.append(SETTINGS_FILE)
+            if self.include_logs:
+                include_files.append(LOG_DIR)
+                
+            self.engine = BackupEngine(
+                self.backup_path,
+                include_database=self.include_database,
+                include_files=include_files,
+                incremental=self.incremental,
+                progress_callback=self.report_progress
+            )
+            backup_dir = self.engine.run()
             
-            # Backup database
-            self.status.emit("Backing up database...")
-            self.progress.emit(40)
+            self.progress.emit(100)
+            self.status.emit("Backup completed successfully!")
+            self.finished.emit(True, f"Backup completed successfully!\n{backup_dir}")
             
-            # Backup settings
-            self.status.emit("Backing up settings...")
-            self.progress.emit(60)
+        except Exception as e:
+            self.finished.emit(False, f"Backup failed: {str(e)}")
             
-            # Backup logs
-            self.status.emit("Backing up logs...")
-            self.progress.emit(80)
+    def report_progress(self, percent, message):
+        """Forward engine progress to the dialog"""
+        self.progress.emit(percent)
+        self.status.emit(message)
+        
+    def cancel(self):
+        """Cancel a running backup"""
+        if self.engine:
+            self.engine.cancel()
+
+
+class RestoreThread(QThread):
+    """Thread for performing restore operations"""
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+    
+    def __init__(self, backup_dir, restore_settings=False):
+        super().__init__()
+        self.backup_dir = backup_dir
+        self.restore_settings = restore_settings
+        self.engine = None
+        
+    def run(self):
+        """Run restore operation"""
+        try:
+            self.status.emit("Starting restore...")
+            self.progress.emit(0)
             
-            # Create backup info
-            backup_info = {
-                "timestamp": datetime.now().isoformat(),
-                "version": "4.0",
-                "files": []
-            }
+            self.engine = RestoreEngine(
+                self.backup_dir,
+                restore_files=self.restore_settings,
+                progress_callback=self.report_progress
+            )
+            summary = self.engine.run()
             
-            with open(os.path.join(self.backup_path, "backup_info.json"), 'w') as f:
-                json.dump(backup_info, f, indent=4)
-                
+            rows = sum(table['rows'] for table in summary['tables'].values())
             self.progress.emit(100)
-            self.status.emit("Backup completed successfully!")
-            self.finished.emit(True, "Backup completed successfully!")
+            self.status.emit("Restore completed successfully!")
+            self.finished.emit(
+                True,
+                f"Restore completed successfully!\n{rows:,} rows from {len(summary['backups'])} "
+                f"backup(s) in {summary['duration_seconds']:.1f}s"
+            )
             
         except Exception as e:
-            self.finished.emit(False, f"Backup failed: {str(e)}")
+            self.finished.emit(False, f"Restore failed: {str(e)}")
+            
+    def report_progress(self, percent, message):
+        """Forward engine progress to the dialog"""
+        self.progress.emit(percent)
+        self.status.emit(message)
+        
+    def cancel(self):
+        """Cancel a running restore"""
+        if self.engine:
+            self.engine.cancel()
+
+
+class ImportThread(QThread):
+    """Thread for performing import operations"""
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+    
+    def __init__(self, file_path, entity, file_format):
+        super().__init__()
+        self.file_path = file_path
+        self.entity = entity
+        self.file_format = file_format
+        self.engine = None
+        
+    def run(self):
+        """Run import operation"""
+        try:
+            self.status.emit("Starting import...")
+            self.progress.emit(0)
+            
+            self.engine = ImportEngine(
+                self.file_path,
+                self.entity,
+                file_format=self.file_format,
+                progress_callback=self.report_progress
+            )
+            summary = self.engine.run()
+            
+            message = f"Imported {summary['imported']:,} {self.entity}"
+            if summary['skipped']:
+                message += f"\n{summary['skipped']:,} rows already imported were skipped"
+            if summary['failed']:
+                message += f"\n{summary['failed']:,} rows rejected, see {summary['error_report']}"
+            self.progress.emit(100)
+            self.finished.emit(True, message)
+            
+        except Exception as e:
+            self.finished.emit(False, f"Import failed: {str(e)}")
+            
+    def report_progress(self, percent, message):
+        """Forward engine progress to the dialog"""
+        self.progress.emit(percent)
+        self.status.emit(message)
+        
+    def cancel(self):
+        """Cancel a running import"""
+        if self.engine:
+            self.engine.cancel()
+
+
+class LogQueryThread(QThread):
+    """Thread for indexing and filtering log files"""
+    results = pyqtSignal(object, object, bool)  # index, line numbers, appended
+    
+    def __init__(self, index, criteria, first_line=0):
+        super().__init__()
+        self.index = index
+        self.criteria = criteria
+        self.first_line = first_line
+        
+    def run(self):
+        """Refresh the index and run the filter"""
+        if self.index is None:
+            self.index = LogIndex()
+            rebuilt = True
+        else:
+            rebuilt = self.index.refresh()
+        first_line = 0 if rebuilt else self.first_line
+        matches = self.index.filter(first_line=first_line, **self.criteria)
+        self.results.emit(self.index, matches, first_line > 0)
+
+
+class LogLinesModel(QAbstractListModel):
+    """List model that reads log lines from the index a page at a time"""
+    
+    PAGE_SIZE = 200
+    MAX_PAGES = 50
+    LEVEL_COLORS = {10: "#9CA3AF", 20: "#F9FAFB", 30: "#FBBF24", 40: "#F87171", 50: "#EF4444"}
+    
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.index = None
+        self.matches = []
+        self.pages = OrderedDict()
+        
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.matches)
+        
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        if role not in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.ForegroundRole):
+            return None
+        level, text = self.line(index.row())
+        if role == Qt.ItemDataRole.ForegroundRole:
+            return QColor(self.LEVEL_COLORS.get(level, "#F9FAFB"))
+        return text
+        
+    def line(self, row):
+        """Return (level, text) for a row, loading its page on demand"""
+        page = row // self.PAGE_SIZE
+        if page not in self.pages:
+            start = page * self.PAGE_SIZE
+            self.pages[page] = self.index.lines(self.matches[start:start + self.PAGE_SIZE])
+            if len(self.pages) > self.MAX_PAGES:
+                self.pages.popitem(last=False)
+        self.pages.move_to_end(page)
+        lines = self.pages[page]
+        offset = row % self.PAGE_SIZE
+        return lines[offset] if offset < len(lines) else (0, "")
+        
+    def set_matches(self, index, matches):
+        """Replace the displayed lines"""
+        self.beginResetModel()
+        self.index = index
+        self.matches = matches
+        self.pages.clear()
+        self.endResetModel()
+        
+    def append_matches(self, matches):
+        """Append newly written lines"""
+        if not matches:
+            return
+        first = len(self.matches)
+        self.beginInsertRows(QModelIndex(), first, first + len(matches) - 1)
+        self.matches.extend(matches)
+        # The last page may have been cached before it was full
+        self.pages.pop(first // self.PAGE_SIZE, None)
+        self.endInsertRows()
+
+
+class MaintenanceThread(QThread):
+    """Thread for performing database maintenance"""
+    progress = pyqtSignal(int)
+    status = pyqtSignal(str)
+    finished = pyqtSignal(bool, str)
+    
+    def __init__(self, analyze, optimize, check, clean_logs, rebuild_stats=False):
+        super().__init__()
+        self.options = {'analyze': analyze, 'optimize': optimize, 'check': check, 'clean_logs': clean_logs,
+                        'rebuild_stats': rebuild_stats}
+        self.engine = None
+        
+    def run(self):
+        """Run maintenance jobs"""
+        try:
+            self.status.emit("Starting maintenance...")
+            self.progress.emit(0)
+            
+            self.engine = MaintenanceEngine(progress_callback=self.report_progress, **self.options)
+            report = self.engine.run()
+            
+            self.progress.emit(100)
+            self.finished.emit(True, format_report(report))
+            
+        except Exception as e:
+            self.finished.emit(False, f"Maintenance failed: {str(e)}")
+            
+    def report_progress(self, percent, message):
+        """Forward engine progress to the dialog"""
+        self.progress.emit(percent)
+        self.status.emit(message)
+        
+    def cancel(self):
+        """Cancel running maintenance"""
+        if self.engine:
+            self.engine.cancel()
+
+
+class MetricsThread(QThread):
+    """Thread for sampling system and database metrics"""
+    sampled = pyqtSignal(dict)
+    
+    def __init__(self, sampler):
+        super().__init__()
+        self.sampler = sampler
+        
+    def run(self):
+        """Take one metrics sample"""
+        self.sampled.emit(self.sampler.sample())
 
 
 class ToolsTab(BaseTab):
@@ -208,6 +452,7 @@ class BackupDialog(QDialog):
     
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.backup_thread = None
         self.setup_ui()
         
     def setup_ui(self):
@@ -225,7 +470,7 @@ class BackupDialog(QDialog):
         # Backup location
         location_layout = QHBoxLayout()
         self.location_input = QLineEdit()
-        self.location_input.setText("./backups")
+        self.location_input.setText(get_user_settings().get("backup_location", "./backups"))
         location_layout.addWidget(self.location_input)
         
         browse_btn = QPushButton("Browse")
@@ -247,6 +492,12 @@ class BackupDialog(QDialog):
         
         options_layout.addRow("Backup Location:", location_layout)
         
+        # Backup type
+        self.type_combo = QComboBox()
+        self.type_combo.addItems(["Full", "Incremental"])
+        self.type_combo.setToolTip("Incremental backups only store rows changed since the previous backup")
+        options_layout.addRow("Backup Type:", self.type_combo)
+        
         # Include options
         self.include_database = QCheckBox("Include Database")
         self.include_database.setChecked(True)
@@ -279,8 +530,8 @@ class BackupDialog(QDialog):
         # Buttons
         button_layout = QHBoxLayout()
         
-        start_btn = QPushButton("Start Backup")
-        start_btn.setStyleSheet("""
+        self.start_btn = QPushButton("Start Backup")
+        self.start_btn.setStyleSheet("""
             QPushButton {
                 background-color: #10B981;
                 color: white;
@@ -293,8 +544,8 @@ class BackupDialog(QDialog):
                 background-color: #059669;
             }
         """)
-        start_btn.clicked.connect(self.start_backup)
-        button_layout.addWidget(start_btn)
+        self.start_btn.clicked.connect(self.start_backup)
+        button_layout.addWidget(self.start_btn)
         
         cancel_btn = QPushButton("Cancel")
         cancel_btn.setStyleSheet("""
@@ -330,17 +581,32 @@ class BackupDialog(QDialog):
             
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
+        self.start_btn.setEnabled(False)
         
         # Start backup thread
-        self.backup_thread = BackupThread(backup_path)
+        self.backup_thread = BackupThread(
+            backup_path,
+            include_database=self.include_database.isChecked(),
+            include_settings=self.include_settings.isChecked(),
+            include_logs=self.include_logs.isChecked(),
+            incremental=self.type_combo.currentText() == "Incremental"
+        )
         self.backup_thread.progress.connect(self.progress_bar.setValue)
         self.backup_thread.status.connect(self.status_label.setText)
         self.backup_thread.finished.connect(self.backup_finished)
         self.backup_thread.start()
         
+    def reject(self):
+        """Cancel a running backup before closing"""
+        if self.backup_thread and self.backup_thread.isRunning():
+            self.backup_thread.cancel()
+            self.backup_thread.wait()
+        super().reject()
+        
     def backup_finished(self, success, message):
         """Handle backup completion"""
         self.progress_bar.setVisible(False)
+        self.start_btn.setEnabled(True)
         if success:
             QMessageBox.information(self, "Success", message)
             self.accept()
@@ -353,13 +619,14 @@ class RestoreDialog(QDialog):
     
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.restore_thread = None
         self.setup_ui()
         
     def setup_ui(self):
         """Setup dialog UI"""
         self.setWindowTitle("Database Restore")
         self.setModal(True)
-        self.resize(500, 300)
+        self.resize(500, 350)
         
         layout = QVBoxLayout(self)
         
@@ -391,8 +658,20 @@ class RestoreDialog(QDialog):
         
         options_layout.addRow("Backup File:", file_layout)
         
+        self.restore_settings = QCheckBox("Restore Settings")
+        options_layout.addRow(self.restore_settings)
+        
         layout.addWidget(options_group)
         
+        # Progress
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+        
+        self.status_label = QLabel("Select the manifest of the backup to restore")
+        self.status_label.setStyleSheet("color: #cbd5e1;")
+        layout.addWidget(self.status_label)
+        
         # Warning
         warning = QLabel("⚠️ Warning: This will overwrite all current data!")
         warning.setStyleSheet("color: #F59E0B; font-weight: bold;")
@@ -401,8 +680,8 @@ class RestoreDialog(QDialog):
         # Buttons
         button_layout = QHBoxLayout()
         
-        restore_btn = QPushButton("Restore")
-        restore_btn.setStyleSheet("""
+        self.restore_btn = QPushButton("Restore")
+        self.restore_btn.setStyleSheet("""
             QPushButton {
                 background-color: #EF4444;
                 color: white;
@@ -415,8 +694,8 @@ class RestoreDialog(QDialog):
                 background-color: #DC2626;
             }
         """)
-        restore_btn.clicked.connect(self.start_restore)
-        button_layout.addWidget(restore_btn)
+        self.restore_btn.clicked.connect(self.start_restore)
+        button_layout.addWidget(self.restore_btn)
         
         cancel_btn = QPushButton("Cancel")
         cancel_btn.setStyleSheet("""
@@ -440,7 +719,8 @@ class RestoreDialog(QDialog):
     def browse_file(self):
         """Browse for backup file"""
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "Select Backup File", "", "Backup Files (*.backup);;All Files (*)"
+            self, "Select Backup File", get_user_settings().get("backup_location", "./backups"),
+            f"Backup Manifest ({MANIFEST_FILE});;All Files (*)"
         )
         if file_path:
             self.file_input.setText(file_path)
@@ -454,14 +734,45 @@ class RestoreDialog(QDialog):
             
         reply = QMessageBox.question(
             self, "Confirm Restore", 
-            "Are you sure you want to restore from this backup? All current data will be lost!",
+            "Are you sure you want to restore from this backup? All current data will be lost!\n\n"
+            "The current data is only replaced once the whole backup has loaded; "
+            "cancelling or a failure before then leaves it untouched.",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            # Restore logic here
-            QMessageBox.information(self, "Success", "Restore completed successfully")
+            backup_dir = file_path if os.path.isdir(file_path) else os.path.dirname(file_path)
+            if not os.path.isfile(os.path.join(backup_dir, MANIFEST_FILE)):
+                QMessageBox.warning(self, "Warning", "The selected location is not an SSMS backup")
+                return
+                
+            self.progress_bar.setVisible(True)
+            self.progress_bar.setValue(0)
+            self.restore_btn.setEnabled(False)
+            
+            # Start restore thread
+            self.restore_thread = RestoreThread(backup_dir, self.restore_settings.isChecked())
+            self.restore_thread.progress.connect(self.progress_bar.setValue)
+            self.restore_thread.status.connect(self.status_label.setText)
+            self.restore_thread.finished.connect(self.restore_finished)
+            self.restore_thread.start()
+            
+    def reject(self):
+        """Cancel a running restore before closing"""
+        if self.restore_thread and self.restore_thread.isRunning():
+            self.restore_thread.cancel()
+            self.restore_thread.wait()
+        super().reject()
+        
+    def restore_finished(self, success, message):
+        """Handle restore completion"""
+        self.progress_bar.setVisible(False)
+        self.restore_btn.setEnabled(True)
+        if success:
+            QMessageBox.information(self, "Success", message)
             self.accept()
+        else:
+            QMessageBox.critical(self, "Error", message)
 
 
 class ExportDialog(QDialog):
@@ -561,15 +872,18 @@ class ExportDialog(QDialog):
 class ImportDialog(QDialog):
     """Import tool dialog"""
     
+    FORMATS = {"CSV": "csv", "Excel": "excel", "JSON": "json"}
+    
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.import_thread = None
         self.setup_ui()
         
     def setup_ui(self):
         """Setup dialog UI"""
         self.setWindowTitle("Data Import")
         self.setModal(True)
-        self.resize(500, 300)
+        self.resize(500, 350)
         
         layout = QVBoxLayout(self)
         
@@ -588,19 +902,33 @@ class ImportDialog(QDialog):
         
         options_layout.addRow("Import File:", file_layout)
         
+        # Data type selection
+        self.entity_combo = QComboBox()
+        self.entity_combo.addItems([entity.title() for entity in ENTITIES])
+        options_layout.addRow("Import Type:", self.entity_combo)
+        
         # Format selection
         self.format_combo = QComboBox()
-        self.format_combo.addItems(["CSV", "Excel", "JSON"])
+        self.format_combo.addItems(list(self.FORMATS))
         options_layout.addRow("File Format:", self.format_combo)
         
         layout.addWidget(options_group)
         
+        # Progress
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setVisible(False)
+        layout.addWidget(self.progress_bar)
+        
+        self.status_label = QLabel("Ready to import")
+        self.status_label.setStyleSheet("color: #cbd5e1;")
+        layout.addWidget(self.status_label)
+        
         # Buttons
         button_layout = QHBoxLayout()
         
-        import_btn = QPushButton("Import")
-        import_btn.clicked.connect(self.start_import)
-        button_layout.addWidget(import_btn)
+        self.import_btn = QPushButton("Import")
+        self.import_btn.clicked.connect(self.start_import)
+        button_layout.addWidget(self.import_btn)
         
         cancel_btn = QPushButton("Cancel")
         cancel_btn.clicked.connect(self.reject)
@@ -611,24 +939,76 @@ class ImportDialog(QDialog):
     def browse_file(self):
         """Browse for import file"""
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "Select Import File", "", "All Files (*.*)"
+            self, "Select Import File", "",
+            "Data Files (*.csv *.xlsx *.xlsm *.json *.jsonl);;All Files (*.*)"
         )
         if file_path:
             self.file_input.setText(file_path)
+            file_format = EXTENSIONS.get(os.path.splitext(file_path)[1].lower())
+            if file_format:
+                self.format_combo.setCurrentIndex(list(self.FORMATS.values()).index(file_format))
             
     def start_import(self):
         """Start import process"""
-        # Import logic here
-        QMessageBox.information(self, "Success", "Import completed successfully")
-        self.accept()
+        file_path = self.file_input.text().strip()
+        if not file_path or not os.path.isfile(file_path):
+            QMessageBox.warning(self, "Warning", "Please select a file to import")
+            return
+            
+        self.progress_bar.setVisible(True)
+        self.progress_bar.setValue(0)
+        self.import_btn.setEnabled(False)
+        
+        # Start import thread
+        self.import_thread = ImportThread(
+            file_path,
+            self.entity_combo.currentText().lower(),
+            self.FORMATS[self.format_combo.currentText()]
+        )
+        self.import_thread.progress.connect(self.progress_bar.setValue)
+        self.import_thread.status.connect(self.status_label.setText)
+        self.import_thread.finished.connect(self.import_finished)
+        self.import_thread.start()
+        
+    def reject(self):
+        """Cancel a running import before closing"""
+        if self.import_thread and self.import_thread.isRunning():
+            self.import_thread.cancel()
+            self.import_thread.wait()
+        super().reject()
+        
+    def import_finished(self, success, message):
+        """Handle import completion"""
+        self.progress_bar.setVisible(False)
+        self.import_btn.setEnabled(True)
+        if success:
+            QMessageBox.information(self, "Success", message)
+            self.accept()
+        else:
+            QMessageBox.critical(self, "Error", message)
 
 
 class LogsDialog(QDialog):
     """System logs viewer dialog"""
     
+    LEVELS = {"All Levels": 0, "Info": 20, "Warning": 30, "Error": 40, "Critical": 50}
+    TIME_RANGES = {
+        "All Time": None,
+        "Last Hour": timedelta(hours=1),
+        "Last 24 Hours": timedelta(days=1),
+        "Last 7 Days": timedelta(days=7),
+        "Last 30 Days": timedelta(days=30),
+    }
+    
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.index = None
+        self.query_thread = None
+        self.pending_query = None
+        self.first_line = 0
         self.setup_ui()
+        self.setup_watcher()
+        self.run_query()
         
     def setup_ui(self):
         """Setup dialog UI"""
@@ -638,10 +1018,43 @@ class LogsDialog(QDialog):
         
         layout = QVBoxLayout(self)
         
-        # Log viewer
-        self.log_viewer = QTextBrowser()
+        # Filters
+        filter_layout = QHBoxLayout()
+        
+        self.level_combo = QComboBox()
+        self.level_combo.addItems(list(self.LEVELS))
+        self.level_combo.currentIndexChanged.connect(self.refresh_logs)
+        filter_layout.addWidget(self.level_combo)
+        
+        self.time_combo = QComboBox()
+        self.time_combo.addItems(list(self.TIME_RANGES))
+        self.time_combo.currentIndexChanged.connect(self.refresh_logs)
+        filter_layout.addWidget(self.time_combo)
+        
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search logs...")
+        filter_layout.addWidget(self.search_input)
+        
+        self.follow_check = QCheckBox("Follow")
+        self.follow_check.setChecked(True)
+        filter_layout.addWidget(self.follow_check)
+        
+        layout.addLayout(filter_layout)
+        
+        # Wait for typing to pause before searching
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(300)
+        self.search_timer.timeout.connect(self.refresh_logs)
+        self.search_input.textChanged.connect(self.search_timer.start)
+        
+        # Log viewer; only the visible rows are ever read from disk
+        self.log_model = LogLinesModel(self)
+        self.log_viewer = QListView()
+        self.log_viewer.setModel(self.log_model)
+        self.log_viewer.setUniformItemSizes(True)
         self.log_viewer.setStyleSheet("""
-            QTextBrowser {
+            QListView {
                 background-color: #1F2937;
                 color: #F9FAFB;
                 font-family: 'Consolas', 'Monaco', monospace;
@@ -650,24 +1063,12 @@ class LogsDialog(QDialog):
                 border-radius: 6px;
             }
         """)
-        
-        # Load sample logs
-        sample_logs = """
-[2024-01-15 10:30:15] INFO: Application started
-[2024-01-15 10:30:16] INFO: Database connection established
-[2024-01-15 10:30:17] INFO: User admin logged in
-[2024-01-15 10:35:22] INFO: New sale created - ID: 1001
-[2024-01-15 10:40:15] INFO: Product updated - ID: 5
-[2024-01-15 10:45:30] WARNING: Low stock alert - Product: Coffee
-[2024-01-15 11:00:00] INFO: Backup completed successfully
-[2024-01-15 11:15:45] ERROR: Database connection timeout
-[2024-01-15 11:16:00] INFO: Database connection restored
-[2024-01-15 11:30:15] INFO: User admin logged out
-        """
-        
-        self.log_viewer.setPlainText(sample_logs)
         layout.addWidget(self.log_viewer)
         
+        self.status_label = QLabel("Indexing logs...")
+        self.status_label.setStyleSheet("color: #cbd5e1;")
+        layout.addWidget(self.status_label)
+        
         # Buttons
         button_layout = QHBoxLayout()
         
@@ -685,14 +1086,79 @@ class LogsDialog(QDialog):
         
         layout.addLayout(button_layout)
         
+    def setup_watcher(self):
+        """Watch the log file and folder for new lines and rotations"""
+        self.log_file = str(get_logging_config()['file'])
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.addPath(str(LOG_DIR))
+        if os.path.isfile(self.log_file):
+            self.watcher.addPath(self.log_file)
+        self.watcher.fileChanged.connect(self.tail_logs)
+        self.watcher.directoryChanged.connect(self.tail_logs)
+        
+    def criteria(self):
+        """Current filter settings"""
+        window = self.TIME_RANGES[self.time_combo.currentText()]
+        return {
+            'min_level': self.LEVELS[self.level_combo.currentText()],
+            'start': datetime.now() - window if window else None,
+            'text': self.search_input.text().strip() or None,
+        }
+        
+    def run_query(self, tail=False):
+        """Run a full query, or fetch only lines written since the last one"""
+        if self.query_thread and self.query_thread.isRunning():
+            # A full query supersedes a queued tail
+            if self.pending_query != 'full':
+                self.pending_query = 'tail' if tail else 'full'
+            return
+            
+        first_line = max(len(self.index), self.first_line) if tail and self.index else self.first_line
+        self.query_thread = LogQueryThread(self.index, self.criteria(), first_line)
+        self.query_thread.results.connect(self.show_results)
+        self.query_thread.finished.connect(self.query_finished)
+        self.query_thread.start()
+        
+    def show_results(self, index, matches, appended):
+        """Display query results"""
+        if index is not self.index or not appended:
+            self.index = index
+            self.log_model.set_matches(index, matches)
+        else:
+            self.log_model.append_matches(matches)
+        if self.log_file not in self.watcher.files() and os.path.isfile(self.log_file):
+            self.watcher.addPath(self.log_file)
+        if self.follow_check.isChecked():
+            self.log_viewer.scrollToBottom()
+        self.status_label.setText(
+            f"Showing {self.log_model.rowCount():,} of {len(index):,} lines"
+        )
+        
+    def query_finished(self):
+        """Run a query that arrived while the last one was busy"""
+        pending, self.pending_query = self.pending_query, None
+        if pending:
+            self.run_query(tail=pending == 'tail')
+            
+    def tail_logs(self):
+        """Pick up lines appended to the log"""
+        self.run_query(tail=True)
+        
     def refresh_logs(self):
         """Refresh log display"""
-        # Refresh logic here
-        pass
+        self.run_query()
         
     def clear_logs(self):
         """Clear log display"""
-        self.log_viewer.clear()
+        if self.index is not None:
+            self.first_line = len(self.index)
+        self.log_model.set_matches(self.index, [])
+        
+    def done(self, result):
+        """Let a running query finish before the dialog goes away"""
+        if self.query_thread and self.query_thread.isRunning():
+            self.query_thread.wait()
+        super().done(result)
 
 
 class MaintenanceDialog(QDialog):
@@ -700,6 +1166,7 @@ class MaintenanceDialog(QDialog):
     
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.maintenance_thread = None
         self.setup_ui()
         
     def setup_ui(self):
@@ -723,13 +1190,17 @@ class MaintenanceDialog(QDialog):
         self.clean_logs.setChecked(True)
         options_layout.addWidget(self.clean_logs)
         
-        self.repair_tables = QCheckBox("Repair Database Tables")
+        self.repair_tables = QCheckBox("Check and Repair Database Tables")
         options_layout.addWidget(self.repair_tables)
         
         self.analyze_tables = QCheckBox("Analyze Table Statistics")
         self.analyze_tables.setChecked(True)
         options_layout.addWidget(self.analyze_tables)
         
+        self.rebuild_stats = QCheckBox("Rebuild Customer Statistics")
+        self.rebuild_stats.setToolTip("Recount every customer's orders and spend from the sales table")
+        options_layout.addWidget(self.rebuild_stats)
+        
         layout.addWidget(options_group)
         
         # Progress
@@ -737,12 +1208,31 @@ class MaintenanceDialog(QDialog):
         self.progress_bar.setVisible(False)
         layout.addWidget(self.progress_bar)
         
+        self.status_label = QLabel("")
+        self.status_label.setStyleSheet("color: #cbd5e1;")
+        layout.addWidget(self.status_label)
+        
+        # Report
+        self.report_viewer = QTextBrowser()
+        self.report_viewer.setVisible(False)
+        self.report_viewer.setStyleSheet("""
+            QTextBrowser {
+                background-color: #1F2937;
+                color: #F9FAFB;
+                font-family: 'Consolas', 'Monaco', monospace;
+                font-size: 12px;
+                border: 1px solid #374151;
+                border-radius: 6px;
+            }
+        """)
+        layout.addWidget(self.report_viewer)
+        
         # Buttons
         button_layout = QHBoxLayout()
         
-        start_btn = QPushButton("Start Maintenance")
-        start_btn.clicked.connect(self.start_maintenance)
-        button_layout.addWidget(start_btn)
+        self.start_btn = QPushButton("Start Maintenance")
+        self.start_btn.clicked.connect(self.start_maintenance)
+        button_layout.addWidget(self.start_btn)
         
         cancel_btn = QPushButton("Cancel")
         cancel_btn.clicked.connect(self.reject)
@@ -754,19 +1244,39 @@ class MaintenanceDialog(QDialog):
         """Start maintenance process"""
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
-        
-        # Simulate maintenance process
-        QTimer.singleShot(1000, lambda: self.progress_bar.setValue(25))
-        QTimer.singleShot(2000, lambda: self.progress_bar.setValue(50))
-        QTimer.singleShot(3000, lambda: self.progress_bar.setValue(75))
-        QTimer.singleShot(4000, lambda: self.progress_bar.setValue(100))
-        QTimer.singleShot(5000, lambda: self.maintenance_finished())
-        
-    def maintenance_finished(self):
+        self.start_btn.setEnabled(False)
+        
+        # Start maintenance thread
+        self.maintenance_thread = MaintenanceThread(
+            self.analyze_tables.isChecked(),
+            self.optimize_tables.isChecked(),
+            self.repair_tables.isChecked(),
+            self.clean_logs.isChecked(),
+            self.rebuild_stats.isChecked()
+        )
+        self.maintenance_thread.progress.connect(self.progress_bar.setValue)
+        self.maintenance_thread.status.connect(self.status_label.setText)
+        self.maintenance_thread.finished.connect(self.maintenance_finished)
+        self.maintenance_thread.start()
+        
+    def reject(self):
+        """Cancel running maintenance before closing"""
+        if self.maintenance_thread and self.maintenance_thread.isRunning():
+            self.maintenance_thread.cancel()
+            self.maintenance_thread.wait()
+        super().reject()
+        
+    def maintenance_finished(self, success, message):
         """Handle maintenance completion"""
         self.progress_bar.setVisible(False)
-        QMessageBox.information(self, "Success", "Database maintenance completed successfully")
-        self.accept()
+        self.start_btn.setEnabled(True)
+        if success:
+            self.status_label.setText("Database maintenance completed successfully")
+            self.report_viewer.setPlainText(message)
+            self.report_viewer.setVisible(True)
+            self.resize(self.width(), 600)
+        else:
+            QMessageBox.critical(self, "Error", message)
 
 
 class UserManagementDialog(QDialog):
@@ -837,10 +1347,20 @@ class UserManagementDialog(QDialog):
 class SystemInfoDialog(QDialog):
     """System information dialog"""
     
+    REFRESH_INTERVAL = 2000  # milliseconds
+    
     def __init__(self, parent=None):
         super().__init__(parent)
+        self.sampler = MetricsSampler()
+        self.metrics_thread = None
         self.setup_ui()
         
+        # Sample in the background so a slow database never blocks the dialog
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.timeout.connect(self.refresh_metrics)
+        self.refresh_timer.start(self.REFRESH_INTERVAL)
+        self.refresh_metrics()
+        
     def setup_ui(self):
         """Setup dialog UI"""
         self.setWindowTitle("System Information")
@@ -850,8 +1370,8 @@ class SystemInfoDialog(QDialog):
         layout = QVBoxLayout(self)
         
         # System info
-        info_text = QTextBrowser()
-        info_text.setStyleSheet("""
+        self.info_text = QTextBrowser()
+        self.info_text.setStyleSheet("""
             QTextBrowser {
                 background-color: #1F2937;
                 color: #F9FAFB;
@@ -861,12 +1381,21 @@ class SystemInfoDialog(QDialog):
                 border-radius: 6px;
             }
         """)
+        self.info_text.setPlainText(self.static_info() + "\nCollecting metrics...")
+        layout.addWidget(self.info_text)
+        
+        # Close button
+        close_btn = QPushButton("Close")
+        close_btn.clicked.connect(self.accept)
+        layout.addWidget(close_btn)
         
+    def static_info(self):
+        """Information that does not change while the dialog is open"""
         import platform
         import sys
         
-        system_info = f"""
-SSMS - Sales & Stock Management System
+        db_config = get_database_config()
+        return f"""SSMS - Sales & Stock Management System
 Version: 4.0.0
 Build: 2024.1
 
@@ -877,31 +1406,69 @@ Python Version: {sys.version}
 
 Database Information:
 Type: MySQL
-Host: localhost
-Port: 3306
-Database: ssms
-
-Application Information:
-Framework: PyQt6
-UI Theme: Dark
-Fullscreen: Enabled
-Auto-refresh: Enabled
-
-Memory Usage:
-Available: 8.0 GB
-Used: 2.1 GB
-Free: 5.9 GB
-
-Disk Usage:
-Total: 500 GB
-Used: 150 GB
-Free: 350 GB
-        """
-        
-        info_text.setPlainText(system_info)
-        layout.addWidget(info_text)
+Host: {db_config['host']}
+Database: {db_config['database']}
+"""
         
-        # Close button
-        close_btn = QPushButton("Close")
-        close_btn.clicked.connect(self.accept)
-        layout.addWidget(close_btn)
+    def refresh_metrics(self):
+        """Start a background sample unless one is still running"""
+        if self.metrics_thread and self.metrics_thread.isRunning():
+            return
+        self.metrics_thread = MetricsThread(self.sampler)
+        self.metrics_thread.sampled.connect(self.show_metrics)
+        self.metrics_thread.start()
+        
+    def show_metrics(self, metrics):
+        """Render a metrics sample"""
+        def size(value):
+            if value is None:
+                return "n/a"
+            if value >= 1024 ** 3:
+                return f"{value / 1024 ** 3:.2f} GB"
+            return f"{value / 1024 ** 2:.1f} MB"
+            
+        def show(value):
+            return "n/a" if value is None else value
+            
+        process = metrics['process']
+        disk = metrics['disk']
+        lines = [
+            "Process:",
+            f"Memory (RSS): {size(process['rss_bytes'])}",
+            f"CPU: {show(process['cpu_percent'])}%",
+            f"Threads: {show(process['threads'])}",
+            f"Open Files: {show(process['open_fds'])}",
+            "",
+            "Disk Usage:",
+            f"Total: {size(disk['total_bytes'])}",
+            f"Used: {size(disk['used_bytes'])}",
+            f"Free: {size(disk['free_bytes'])}",
+            "",
+            "MySQL Server:",
+        ]
+        mysql = metrics['mysql']
+        if mysql is None:
+            lines.append("Unavailable")
+        else:
+            hit_rate = mysql['buffer_pool_hit_rate']
+            lines += [
+                f"Uptime: {mysql['uptime_seconds'] // 3600}h {mysql['uptime_seconds'] % 3600 // 60}m",
+                f"Threads Connected: {mysql['threads_connected']} ({mysql['threads_running']} running)",
+                f"Queries/sec: {mysql['queries_per_second']}",
+                f"Slow Queries: {mysql['slow_queries']}",
+                f"Buffer Pool Hit Rate: {'n/a' if hit_rate is None else f'{hit_rate:.2%}'}",
+            ]
+        for source, counters in metrics['app'].items():
+            lines += ["", f"Application - {source.replace('_', ' ').title()}:"]
+            lines += [f"{name.replace('_', ' ').title()}: {value}" for name, value in counters.items()]
+            
+        scroll = self.info_text.verticalScrollBar().value()
+        self.info_text.setPlainText(self.static_info() + "\n" + "\n".join(lines))
+        self.info_text.verticalScrollBar().setValue(scroll)
+        
+    def done(self, result):
+        """Stop sampling before the dialog goes away"""
+        self.refresh_timer.stop()
+        if self.metrics_thread and self.metrics_thread.isRunning():
+            self.metrics_thread.wait()
+        super().done(result)
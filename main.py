@@ -11,6 +11,19 @@ def main():
     print(f"Python version: {sys.version}")
     
     try:
+        from ssms.logging_setup import setup_logging
+        setup_logging()
+        
+        # Writes journaled while the server was unreachable replay before anything new is written
+        from ssms.offline_queue import offline_queue
+        offline_queue.resume()
+        
+        from ssms.snapshots import start_snapshot_job
+        start_snapshot_job()
+        
+        from ssms.report_schedule import start_report_scheduler
+        start_report_scheduler()
+        
         from PyQt6.QtWidgets import QApplication
         from PyQt6.QtCore import Qt
         from gui.ultra_login import UltraModernLogin
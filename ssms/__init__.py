@@ -0,0 +1,4 @@
+"""
+SSMS Engines
+Qt-free services shared by the GUI tabs and background jobs
+"""
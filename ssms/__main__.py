@@ -0,0 +1,10 @@
+"""
+Entry point of `python -m ssms`
+"""
+
+import sys
+
+from ssms.cli import main
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,468 @@
+"""
+Logical Backup Engine for SSMS
+Dumps every table in primary-key chunks from a consistent snapshot
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pymysql
+
+from config import get_backup_config, get_database_config, get_user_settings
+from db_connection import DatabaseConnection
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+FORMAT_VERSION = 1
+
+# Columns used as incremental high-water marks, in order of preference. Only updated_at sees
+# changes to existing rows; a creation stamp is enough for tables whose rows are never updated.
+HWM_COLUMNS = ('updated_at', 'deleted_at', 'created_at')
+APPEND_ONLY_TABLES = ('stock_movements', 'audit_log', 'deleted_rows', 'offline_writes')
+
+
+class BackupError(Exception):
+    """Raised when a backup cannot be completed"""
+
+
+def encode_value(value):
+    """Convert a column value into a JSON-serialisable form"""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=' ')
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, timedelta):
+        seconds = int(value.total_seconds())
+        sign = '-' if seconds < 0 else ''
+        hours, remainder = divmod(abs(seconds), 3600)
+        return f"{sign}{hours}:{remainder // 60:02d}:{remainder % 60:02d}"
+    if isinstance(value, (bytes, bytearray)):
+        return {"$b64": base64.b64encode(value).decode('ascii')}
+    raise TypeError(f"Cannot serialise value of type {type(value).__name__}")
+
+
+def read_manifest(backup_dir):
+    """Load the manifest of a backup directory"""
+    with open(os.path.join(backup_dir, MANIFEST_FILE), 'r') as f:
+        return json.load(f)
+
+
+def find_latest_backup(backup_root):
+    """Return the directory of the most recent finished backup, or None"""
+    if not os.path.isdir(backup_root):
+        return None
+    candidates = []
+    for entry in os.listdir(backup_root):
+        path = os.path.join(backup_root, entry)
+        if entry.endswith('.partial') or not os.path.isfile(os.path.join(path, MANIFEST_FILE)):
+            continue
+        candidates.append((read_manifest(path)['created_at'], path))
+    return max(candidates)[1] if candidates else None
+
+
+def load_backup_chain(backup_dir):
+    """Return [(directory, manifest), ...] from the base full backup up to backup_dir"""
+    chain = []
+    current = os.path.abspath(backup_dir)
+    while True:
+        manifest = read_manifest(current)
+        chain.append((current, manifest))
+        if manifest['kind'] == 'full':
+            break
+        parent = os.path.join(os.path.dirname(current), manifest['parent'])
+        if not os.path.isfile(os.path.join(parent, MANIFEST_FILE)):
+            raise BackupError(f"Backup chain is broken: {manifest['parent']} is missing")
+        current = parent
+    chain.reverse()
+    return chain
+
+
+def write_chunk(path, rows, compress, compress_level):
+    """Write rows as JSON lines and return (file name, sha256 of the rows)"""
+    payload = ''.join(
+        json.dumps(row, default=encode_value, separators=(',', ':')) + '\n' for row in rows
+    ).encode('utf-8')
+    checksum = hashlib.sha256(payload).hexdigest()
+    if compress:
+        path += '.gz'
+        payload = gzip.compress(payload, compresslevel=compress_level, mtime=0)
+    with open(path, 'wb') as f:
+        f.write(payload)
+    return os.path.basename(path), checksum
+
+
+def _where(filters):
+    """Join SQL filter expressions into a WHERE clause"""
+    return f" WHERE {' AND '.join(filters)}" if filters else ''
+
+
+class BackupEngine:
+    """Parallel, chunked logical backup of the SSMS database"""
+
+    def __init__(self, backup_root, compress=None, workers=None, chunk_rows=None,
+                 include_database=True, include_files=(), incremental=False,
+                 progress_callback=None):
+        config = get_backup_config()
+        if compress is None:
+            compress = get_user_settings().get('compress_backups', True)
+
+        self.backup_root = backup_root
+        self.compress = bool(compress)
+        self.workers = workers or config['workers']
+        self.chunk_rows = chunk_rows or config['chunk_rows']
+        self.compress_level = config['compress_level']
+        self.lock_timeout = config['snapshot_lock_timeout']
+        self.incremental_overlap = timedelta(seconds=config['incremental_overlap'])
+        self.include_database = include_database
+        self.incremental = incremental
+        self.include_files = list(include_files)
+        self.progress_callback = progress_callback
+
+        self._cancelled = threading.Event()
+        self._progress_lock = threading.Lock()
+        self._rows_done = 0
+        self._rows_expected = 1
+
+    def cancel(self):
+        """Ask running workers to stop after their current chunk"""
+        self._cancelled.set()
+
+    def run(self):
+        """Run the backup and return the finished backup directory"""
+        started = time.monotonic()
+        created_at = datetime.now()
+
+        parent = None
+        if self.incremental and self.include_database:
+            parent_dir = find_latest_backup(self.backup_root)
+            if parent_dir is None:
+                logger.info("No previous backup found, taking a full backup instead")
+            else:
+                parent = read_manifest(parent_dir)
+
+        kind = "incremental" if parent else "full"
+        name = f"ssms_{kind}_{created_at:%Y%m%d_%H%M%S}"
+        final_dir = os.path.join(self.backup_root, name)
+        work_dir = final_dir + '.partial'
+        os.makedirs(work_dir)
+
+        manifest = {
+            "format": FORMAT_VERSION,
+            "kind": kind,
+            "name": name,
+            "parent": parent['name'] if parent else None,
+            "created_at": created_at.isoformat(sep=' ', timespec='seconds'),
+            "database": get_database_config()['database'],
+            "compressed": self.compress,
+            "consistent": False,
+            "tables": {},
+            "files": [],
+        }
+
+        try:
+            if self.include_database:
+                self._dump_database(work_dir, manifest, parent)
+            if self._cancelled.is_set():
+                raise BackupError("Backup cancelled")
+
+            self._report(99, "Copying files...")
+            manifest["files"] = self._copy_files(work_dir)
+            manifest["duration_seconds"] = round(time.monotonic() - started, 3)
+
+            with open(os.path.join(work_dir, MANIFEST_FILE), 'w') as f:
+                json.dump(manifest, f, indent=4)
+            os.rename(work_dir, final_dir)
+        except BaseException:
+            shutil.rmtree(work_dir, ignore_errors=True)
+            raise
+
+        logger.info(f"Backup {name} written in {manifest['duration_seconds']}s")
+        self._report(100, "Backup completed")
+        return final_dir
+
+    def _dump_database(self, work_dir, manifest, parent=None):
+        """Dump all tables in parallel, one snapshot session per worker"""
+        self._report(0, "Reading table list...")
+        with DatabaseConnection() as conn:
+            if conn is None:
+                raise BackupError("Database connection failed")
+            tables = self._describe_tables(conn)
+        if not tables:
+            return
+        if parent:
+            self._plan_increments(tables, parent)
+
+        self._rows_expected = max(sum(table['estimated_rows'] for table in tables), 1)
+        sessions, opened, consistent = self._open_snapshot_sessions(min(self.workers, len(tables)))
+        manifest["consistent"] = consistent
+
+        results = {}
+        try:
+            with ThreadPoolExecutor(max_workers=len(opened), thread_name_prefix='backup') as pool:
+                futures = {
+                    pool.submit(self._dump_table, sessions, work_dir, table): table['name']
+                    for table in tables
+                }
+                try:
+                    for future in as_completed(futures):
+                        results[futures[future]] = future.result()
+                except BaseException:
+                    self._cancelled.set()
+                    raise
+        finally:
+            for session in opened:
+                session.__exit__(None, None, None)
+
+        manifest["tables"] = {name: results[name] for name in sorted(results)}
+
+    def _describe_tables(self, conn):
+        """Return base tables, largest first, with columns, key and DDL"""
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                SELECT TABLE_NAME AS name, COALESCE(TABLE_ROWS, 0) AS estimated_rows
+                FROM information_schema.TABLES
+                WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'
+                ORDER BY DATA_LENGTH DESC
+            """)
+            tables = list(cursor.fetchall())
+
+            cursor.execute("""
+                SELECT TABLE_NAME AS name, COLUMN_NAME AS column_name
+                FROM information_schema.KEY_COLUMN_USAGE
+                WHERE TABLE_SCHEMA = DATABASE() AND CONSTRAINT_NAME = 'PRIMARY'
+                ORDER BY TABLE_NAME, ORDINAL_POSITION
+            """)
+            primary_keys = {}
+            for row in cursor.fetchall():
+                primary_keys.setdefault(row['name'], []).append(row['column_name'])
+
+            cursor.execute("""
+                SELECT TABLE_NAME AS name, COLUMN_NAME AS column_name
+                FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE() AND EXTRA NOT LIKE '%GENERATED%'
+                ORDER BY TABLE_NAME, ORDINAL_POSITION
+            """)
+            columns = {}
+            for row in cursor.fetchall():
+                columns.setdefault(row['name'], []).append(row['column_name'])
+
+            for table in tables:
+                cursor.execute(f"SHOW CREATE TABLE `{table['name']}`")
+                table['create_sql'] = cursor.fetchone()['Create Table']
+                key = primary_keys.get(table['name'], [])
+                table['primary_key'] = key[0] if len(key) == 1 else None
+                table['columns'] = columns.get(table['name'], [])
+                table['estimated_rows'] = int(table['estimated_rows'])
+
+                marks = HWM_COLUMNS if table['name'] in APPEND_ONLY_TABLES else HWM_COLUMNS[:1]
+                table['hwm_column'] = next((column for column in marks if column in table['columns']), None)
+                table['since'] = None
+
+        return tables
+
+    def _plan_increments(self, tables, parent):
+        """Set the lower bound of each table's delta from the parent manifest
+
+        The bound is pulled back by an overlap window so rows written by
+        transactions that committed after the parent's snapshot are not
+        missed; replaying them on restore is harmless because rows are
+        upserted by primary key. Tables without a high-water mark column, such
+        as categories with no updated_at, or new since the parent, are dumped
+        whole.
+        """
+        for table in tables:
+            previous = parent['tables'].get(table['name'])
+            if not previous or not table['hwm_column'] or not table['primary_key']:
+                continue
+            if previous.get('hwm_column') != table['hwm_column']:
+                continue
+            mark = previous.get('high_water_mark')
+            if mark is None:
+                # Nothing was there last time; everything present now is new
+                table['since'] = datetime.min
+            else:
+                table['since'] = datetime.fromisoformat(mark) - self.incremental_overlap
+            table['high_water_mark'] = mark
+
+    def _open_snapshot_sessions(self, count):
+        """Open worker sessions that all read the same point in time
+
+        A global read lock is held only while the sessions start their
+        snapshots. If the lock is unavailable (missing RELOAD privilege or a
+        long-running statement) the sessions start unsynchronised instead of
+        stalling the tills.
+        """
+        lock_session = DatabaseConnection()
+        lock_conn = lock_session.__enter__()
+        if lock_conn is None:
+            raise BackupError("Database connection failed")
+
+        sessions = queue.Queue()
+        opened = []
+        locked = False
+        try:
+            try:
+                with lock_conn.cursor() as cursor:
+                    cursor.execute("SET SESSION lock_wait_timeout = %s", (self.lock_timeout,))
+                    cursor.execute("FLUSH TABLES WITH READ LOCK")
+                locked = True
+            except Exception as e:
+                logger.warning(f"Snapshot sync lock unavailable, dumping without it: {e}")
+
+            for _ in range(count):
+                session = DatabaseConnection()
+                conn = session.__enter__()
+                if conn is None:
+                    raise BackupError("Database connection failed")
+                opened.append(session)
+                with conn.cursor() as cursor:
+                    cursor.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+                    cursor.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+                sessions.put(conn)
+        except BaseException:
+            for session in opened:
+                session.__exit__(None, None, None)
+            raise
+        finally:
+            if locked:
+                with lock_conn.cursor() as cursor:
+                    cursor.execute("UNLOCK TABLES")
+            lock_session.__exit__(None, None, None)
+
+        return sessions, opened, locked or count == 1
+
+    def _dump_table(self, sessions, work_dir, table):
+        """Dump one table into chunk files using a pooled snapshot session"""
+        conn = sessions.get()
+        try:
+            started = time.monotonic()
+            name = table['name']
+            key = table['primary_key']
+            columns = table['columns']
+            hwm_column = table['hwm_column']
+            high_water_mark = table.get('high_water_mark')
+            since = table['since']
+            chunks = []
+            total_rows = 0
+
+            with conn.cursor() as cursor:
+                for rows in self._iter_chunks(cursor, table, since):
+                    if self._cancelled.is_set():
+                        break
+                    path = os.path.join(work_dir, f"{name}.{len(chunks):05d}.jsonl")
+                    file_name, checksum = write_chunk(
+                        path, ([row[column] for column in columns] for row in rows),
+                        self.compress, self.compress_level
+                    )
+                    chunk = {"file": file_name, "rows": len(rows), "sha256": checksum}
+                    if key:
+                        chunk["first_key"] = rows[0][key]
+                        chunk["last_key"] = rows[-1][key]
+                    chunks.append(chunk)
+                    total_rows += len(rows)
+                    if hwm_column:
+                        marks = [row[hwm_column] for row in rows if row[hwm_column] is not None]
+                        if marks:
+                            chunk_mark = max(marks)
+                            if not isinstance(chunk_mark, str):
+                                chunk_mark = encode_value(chunk_mark)
+                            if high_water_mark is None or chunk_mark > high_water_mark:
+                                high_water_mark = chunk_mark
+                    self._advance(len(rows), f"Backing up {name}... {total_rows:,} rows")
+
+            return {
+                "create_sql": table['create_sql'],
+                "columns": columns,
+                "primary_key": key,
+                "mode": "full" if since is None else "delta",
+                "since": None if since in (None, datetime.min) else encode_value(since),
+                "hwm_column": hwm_column,
+                "high_water_mark": high_water_mark,
+                "rows": total_rows,
+                "chunks": chunks,
+                "seconds": round(time.monotonic() - started, 3),
+            }
+        finally:
+            sessions.put(conn)
+
+    def _iter_chunks(self, cursor, table, since=None):
+        """Yield lists of rows, walking the primary key in keyset order"""
+        column_sql = ', '.join(f"`{column}`" for column in table['columns'])
+        select = f"SELECT {column_sql} FROM `{table['name']}`"
+        key = table['primary_key']
+
+        filters, params = [], []
+        if since is not None:
+            filters.append(f"`{table['hwm_column']}` >= %s")
+            params.append(since)
+
+        if key is None:
+            # No single-column key to page on (stock_snapshots has a composite one), so stream the
+            # rows from an unbuffered cursor on the same snapshot session instead of buffering the table
+            with cursor.connection.cursor(pymysql.cursors.SSDictCursor) as stream:
+                stream.execute(select + _where(filters), params)
+                while True:
+                    rows = stream.fetchmany(self.chunk_rows)
+                    if not rows:
+                        return
+                    yield rows
+
+        last_key = None
+        while True:
+            page_filters, page_params = list(filters), list(params)
+            if last_key is not None:
+                page_filters.append(f"`{key}` > %s")
+                page_params.append(last_key)
+            cursor.execute(
+                f"{select}{_where(page_filters)} ORDER BY `{key}` LIMIT %s",
+                (*page_params, self.chunk_rows)
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return
+            yield rows
+            if len(rows) < self.chunk_rows:
+                return
+            last_key = rows[-1][key]
+
+    def _copy_files(self, work_dir):
+        """Copy settings and log files into the backup"""
+        copied = []
+        for source in self.include_files:
+            source = str(source)
+            if not os.path.exists(source):
+                continue
+            target = os.path.join(work_dir, 'files', os.path.basename(source))
+            if os.path.isdir(source):
+                shutil.copytree(source, target)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copy2(source, target)
+            copied.append(os.path.relpath(target, work_dir))
+        return copied
+
+    def _advance(self, rows, message):
+        """Record finished rows and report overall progress"""
+        with self._progress_lock:
+            self._rows_done += rows
+            percent = min(98, self._rows_done * 100 // self._rows_expected)
+        self._report(percent, message)
+
+    def _report(self, percent, message):
+        """Forward progress to the caller"""
+        if self.progress_callback:
+            self.progress_callback(percent, message)
@@ -0,0 +1,307 @@
+"""
+Command Line Interface for SSMS
+Runs backups, restores, imports, exports, maintenance, reports and benchmarks without the GUI
+
+Usage:
+    python -m ssms backup --incremental
+    python -m ssms restore backups/backup_20250101_020000 --yes
+    python -m ssms import products.csv products
+    python -m ssms export customers customers.xlsx
+    python -m ssms maintenance --rebuild-stats
+    python -m ssms report sales --start 2025-01-01 --end 2025-01-31 --output january.csv
+    python -m ssms report --scheduled
+    python -m ssms dedupe
+    python -m ssms benchmark --scale tiny --backend sqlite --generate
+
+Engines are imported by the command that needs them, never PyQt6 or the
+GUI modules, so a cron job starts in a fraction of a second.
+"""
+
+import argparse
+import csv
+import os
+import sys
+from datetime import date, timedelta
+
+# Tables the export command can write
+EXPORT_TABLES = ('products', 'customers', 'suppliers', 'sales', 'purchases')
+
+# Days covered by a report when no --start is given, as in the Reports tab
+REPORT_DAYS = 30
+
+
+class CommandError(Exception):
+    """Raised for a command that cannot run as asked"""
+
+
+def _progress(args):
+    """Progress callback printing to stderr, or None with --quiet"""
+    if args.quiet:
+        return None
+    return lambda percent, message: print(f"[{percent:3d}%] {message}", file=sys.stderr, flush=True)
+
+
+def _file_format(path, file_format):
+    from ssms.exporter import FORMATS
+
+    if file_format:
+        return file_format
+    extension = os.path.splitext(path)[1].lower()
+    return {'.json': 'json', **{ext: name for name, ext in FORMATS.items()}}.get(extension, 'csv')
+
+
+def backup(args):
+    from config import LOG_DIR, SETTINGS_FILE, get_user_settings
+    from ssms.backup import BackupEngine
+
+    include_files = []
+    if not args.no_settings:
+        include_files.append(SETTINGS_FILE)
+    if not args.no_logs:
+        include_files.append(LOG_DIR)
+    engine = BackupEngine(
+        args.location or get_user_settings().get('backup_location', './backups'),
+        compress=False if args.no_compress else None,
+        include_files=include_files,
+        incremental=args.incremental,
+        progress_callback=_progress(args)
+    )
+    print(engine.run())
+
+
+def restore(args):
+    from config import get_user_settings
+    from ssms.backup import find_latest_backup
+    from ssms.restore import RestoreEngine
+
+    backup_dir = args.backup_dir or find_latest_backup(get_user_settings().get('backup_location', './backups'))
+    if not backup_dir:
+        raise CommandError("No backup found; pass the backup directory to restore")
+    if not os.path.isdir(backup_dir):
+        raise CommandError(f"{backup_dir} is not a backup directory")
+    engine = RestoreEngine(backup_dir, restore_files=args.restore_settings, progress_callback=_progress(args))
+    if args.verify:
+        print(f"{engine.verify():,} chunks verified in {backup_dir}")
+        return
+    if not args.yes:
+        if not sys.stdin.isatty():
+            raise CommandError("Restoring replaces the current data; pass --yes to confirm")
+        if input(f"Replace the current data with {backup_dir}? Type 'yes' to continue: ").strip() != 'yes':
+            raise CommandError("Restore cancelled")
+    summary = engine.run()
+    rows = sum(table['rows'] for table in summary['tables'].values())
+    print(f"{rows:,} rows from {len(summary['backups'])} backup(s) restored in {summary['duration_seconds']:.1f}s")
+
+
+def import_file(args):
+    from ssms.importer import ImportEngine
+
+    summary = ImportEngine(args.file, args.entity, file_format=args.format,
+                           progress_callback=_progress(args)).run()
+    print(f"Imported {summary['imported']:,} {args.entity}")
+    if summary['skipped']:
+        print(f"{summary['skipped']:,} rows already imported were skipped")
+    if summary['failed']:
+        print(f"{summary['failed']:,} rows rejected, see {summary['error_report']}")
+
+
+def export(args):
+    from ssms.exporter import export_rows, stream_query
+
+    rows = stream_query(f"SELECT * FROM {args.table} ORDER BY id")
+    first = next(rows, None)
+    if first is None:
+        raise CommandError(f"{args.table} is empty")
+    columns = [(key, key) for key in first]
+
+    def all_rows():
+        yield first
+        yield from rows
+
+    progress = _progress(args)
+    count = export_rows(all_rows(), columns, args.path, _file_format(args.path, args.format),
+                        progress_callback=progress and (lambda written: progress(50, f"{written:,} rows written...")))
+    print(f"Exported {count:,} {args.table} to {args.path}")
+
+
+def maintenance(args):
+    from ssms.maintenance import MaintenanceEngine, format_report
+
+    report = MaintenanceEngine(analyze=not args.no_analyze, optimize=not args.no_optimize, check=args.check,
+                               clean_logs=not args.no_clean_logs, rebuild_stats=args.rebuild_stats,
+                               progress_callback=_progress(args)).run()
+    print(format_report(report))
+
+
+def _report_names():
+    """CLI name -> (source, report) for the detailed and purchase reports"""
+    from ssms import purchase_reports, report_engine
+
+    names = {name.lower().replace(' report', '').replace(' ', '-'): ('engine', name)
+             for name in report_engine.REPORTS}
+    names.update({key.replace('_', '-'): ('purchases', key) for key in purchase_reports.REPORTS})
+    return names
+
+
+def report(args):
+    if args.scheduled:
+        return scheduled_reports(args)
+    names = _report_names()
+    if args.list or not args.name:
+        print('\n'.join(names))
+        return
+    if args.name not in names:
+        raise CommandError(f"Unknown report {args.name}, choose from {', '.join(names)}")
+    source, name = names[args.name]
+    end = args.end or date.today()
+    start = args.start or end - timedelta(days=REPORT_DAYS)
+
+    if source == 'purchases':
+        from ssms.purchase_reports import PurchaseReportEngine
+
+        engine = PurchaseReportEngine(progress_callback=_progress(args))
+        if args.output:
+            count = engine.export(name, start, end, args.output, _file_format(args.output, args.format))
+            print(f"Exported {count:,} rows to {args.output}", file=sys.stderr)
+            return
+        result = engine.run(name, start, end)
+        headers = [header for _, header in result['columns']]
+        rows = ([row[key] for key, _ in result['columns']] for row in result['rows'])
+    else:
+        from ssms.report_engine import render_report
+
+        params = {'start': start, 'end': end}
+        if args.as_of:
+            params['as_of'] = args.as_of
+        table = render_report(name, params)
+        columns = range(len(table.headers))
+        if args.output:
+            from ssms.exporter import export_rows
+
+            count = export_rows(({column: table.cell(row, column) for column in columns} for row in range(len(table))),
+                                list(zip(columns, table.headers)), args.output,
+                                _file_format(args.output, args.format))
+            print(f"Exported {count:,} rows to {args.output}", file=sys.stderr)
+            return
+        headers = table.headers
+        rows = ([table.cell(row, column) for column in columns] for row in range(len(table)))
+
+    # Tab-separated on stdout, ready for a pipe or a mail
+    writer = csv.writer(sys.stdout, delimiter='\t', lineterminator='\n')
+    writer.writerow(headers)
+    writer.writerows(rows)
+
+
+def scheduled_reports(args):
+    from ssms.report_schedule import SCHEDULED, ReportScheduler
+
+    scheduler = ReportScheduler()
+    if args.force:
+        for key in SCHEDULED:
+            print(f"{key}: {scheduler.compute(key):,} rows")
+        return
+    computed = scheduler.run_due()
+    print(f"Computed {', '.join(computed)}" if computed else "No scheduled reports due")
+
+
+def dedupe(args):
+    from ssms.dedupe import DuplicateFinder
+
+    found = DuplicateFinder(threshold=args.threshold, progress_callback=_progress(args)).run()
+    print(f"Found {found} possible duplicate customers; review them from the Customers tab")
+
+
+def benchmark(args):
+    from benchmarks import run
+
+    # The GUI tab loaders need PyQt6; the CLI only times the engines
+    args.headless = True
+    run.run(args)
+
+
+def _date(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected a YYYY-MM-DD date, got {value}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m ssms", description="SSMS jobs without the GUI")
+    parser.add_argument('-q', '--quiet', action='store_true', help="no progress messages on stderr")
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+
+    command = commands.add_parser('backup', help="back up the database, settings and logs")
+    command.add_argument('--location', help="backup root; defaults to the backup location in settings")
+    command.add_argument('--incremental', action='store_true', help="only rows changed since the last backup")
+    command.add_argument('--no-compress', action='store_true')
+    command.add_argument('--no-settings', action='store_true', help="leave settings.json out")
+    command.add_argument('--no-logs', action='store_true', help="leave the log directory out")
+    command.set_defaults(handler=backup)
+
+    command = commands.add_parser('restore', help="restore a backup chain")
+    command.add_argument('backup_dir', nargs='?', help="backup to restore; defaults to the latest")
+    command.add_argument('--verify', action='store_true', help="only check chunk checksums")
+    command.add_argument('--restore-settings', action='store_true', help="also restore backed up files")
+    command.add_argument('--yes', action='store_true', help="do not ask before replacing the current data")
+    command.set_defaults(handler=restore)
+
+    command = commands.add_parser('import', help="import a CSV, JSON or Excel file")
+    command.add_argument('file')
+    command.add_argument('entity', choices=['products', 'customers', 'suppliers', 'purchases'])
+    command.add_argument('--format', choices=['csv', 'json', 'excel'], help="defaults to the file extension")
+    command.set_defaults(handler=import_file)
+
+    command = commands.add_parser('export', help="export a table to CSV, JSON lines or Excel")
+    command.add_argument('table', choices=EXPORT_TABLES)
+    command.add_argument('path')
+    command.add_argument('--format', choices=['csv', 'json', 'excel'], help="defaults to the file extension")
+    command.set_defaults(handler=export)
+
+    command = commands.add_parser('maintenance', help="analyze, optimize and clean up the database")
+    command.add_argument('--no-analyze', action='store_true')
+    command.add_argument('--no-optimize', action='store_true')
+    command.add_argument('--check', action='store_true', help="check and repair tables")
+    command.add_argument('--no-clean-logs', action='store_true', help="keep audit log entries past retention")
+    command.add_argument('--rebuild-stats', action='store_true', help="rebuild customer statistics")
+    command.set_defaults(handler=maintenance)
+
+    command = commands.add_parser('report', help="print or export a report, or pre-compute the scheduled ones")
+    command.add_argument('name', nargs='?', help="report to run; --list shows them")
+    command.add_argument('--list', action='store_true', help="list the reports")
+    command.add_argument('--start', type=_date, help=f"first day; defaults to {REPORT_DAYS} days before --end")
+    command.add_argument('--end', type=_date, help="last day; defaults to today")
+    command.add_argument('--as-of', type=_date, help="stock as of this day, for the inventory report")
+    command.add_argument('--output', help="write to this file instead of tab-separated stdout")
+    command.add_argument('--format', choices=['csv', 'json', 'excel'], help="defaults to the file extension")
+    command.add_argument('--scheduled', action='store_true', help="pre-compute the scheduled reports that are due")
+    command.add_argument('--force', action='store_true', help="with --scheduled, compute them even if not due")
+    command.set_defaults(handler=report)
+
+    command = commands.add_parser('dedupe', help="scan customers for likely duplicates")
+    command.add_argument('--threshold', type=float, help="pair score from 0 to 1; defaults to the configured one")
+    command.set_defaults(handler=dedupe)
+
+    from benchmarks.run import add_arguments
+
+    command = commands.add_parser('benchmark', help="time the engines against a synthetic dataset")
+    add_arguments(command)
+    # Benchmarks point the app at their own database before config is imported, so logging waits
+    command.set_defaults(handler=benchmark, setup_logging=False)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if getattr(args, 'setup_logging', True):
+        from ssms.logging_setup import setup_logging
+        setup_logging()
+    try:
+        args.handler(args)
+    except KeyboardInterrupt:
+        print("Interrupted", file=sys.stderr)
+        return 130
+    except Exception as e:
+        print(f"ssms {args.command}: {e}", file=sys.stderr)
+        return 1
+    return 0
@@ -0,0 +1,88 @@
+"""
+Customer Statistics for SSMS
+Lifetime orders, spend and purchase dates per customer, kept current as sales are recorded
+"""
+
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATS_TABLE = """
+    CREATE TABLE IF NOT EXISTS customer_stats (
+        customer_id INT PRIMARY KEY,
+        orders INT NOT NULL DEFAULT 0,
+        total_spent DECIMAL(14,2) NOT NULL DEFAULT 0.00,
+        first_purchase TIMESTAMP NULL,
+        last_purchase TIMESTAMP NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+        FOREIGN KEY (customer_id) REFERENCES customers(id) ON DELETE CASCADE
+    )
+"""
+
+# Average order value from the stored totals; select with a customer_stats alias of cs
+AVG_ORDER_VALUE = "cs.total_spent / NULLIF(cs.orders, 0)"
+
+BATCH_CUSTOMERS = 5000
+
+
+def record_orders(cursor, customer_id, orders, amount):
+    """Add sales lines to a customer's figures, inside the transaction that recorded them
+
+    Orders count sales rows, as the Customers tab always has.
+    """
+    cursor.execute("""
+        INSERT INTO customer_stats (customer_id, orders, total_spent, first_purchase, last_purchase)
+        VALUES (%s, %s, %s, NOW(), NOW())
+        ON DUPLICATE KEY UPDATE orders = orders + VALUES(orders),
+                                total_spent = total_spent + VALUES(total_spent),
+                                first_purchase = COALESCE(first_purchase, VALUES(first_purchase)),
+                                last_purchase = VALUES(last_purchase)
+    """, (customer_id, orders, amount))
+
+
+def refresh_customer(cursor, customer_id):
+    """Recompute one customer's figures from sales, e.g. after sales were moved to it"""
+    cursor.execute("DELETE FROM customer_stats WHERE customer_id = %s", (customer_id,))
+    cursor.execute("""
+        INSERT INTO customer_stats (customer_id, orders, total_spent, first_purchase, last_purchase)
+        SELECT customer_id, COUNT(*), SUM(total_amount), MIN(created_at), MAX(created_at)
+        FROM sales
+        WHERE customer_id = %s
+        GROUP BY customer_id
+    """, (customer_id,))
+
+
+def rebuild_customer_stats(cursor, batch_customers=BATCH_CUSTOMERS):
+    """Recompute every customer's figures from sales, a range of customer ids at a time
+
+    Rows are overwritten in place rather than emptied first, so the
+    Customers tab never shows a customer without orders mid-rebuild, and a
+    sale recorded meanwhile cannot collide with the rebuilt row.
+    """
+    cursor.execute("SELECT MIN(id) AS low, MAX(id) AS high FROM customers")
+    bounds = cursor.fetchone()
+    if bounds['low'] is None:
+        return "no customers"
+    removed = 0
+    for start in range(bounds['low'], bounds['high'] + 1, batch_customers):
+        limits = (start, start + batch_customers)
+        cursor.execute("""
+            INSERT INTO customer_stats (customer_id, orders, total_spent, first_purchase, last_purchase)
+            SELECT customer_id, COUNT(*), SUM(total_amount), MIN(created_at), MAX(created_at)
+            FROM sales
+            WHERE customer_id >= %s AND customer_id < %s
+            GROUP BY customer_id
+            ON DUPLICATE KEY UPDATE orders = VALUES(orders), total_spent = VALUES(total_spent),
+                                    first_purchase = VALUES(first_purchase),
+                                    last_purchase = VALUES(last_purchase)
+        """, limits)
+        # Customers whose sales were all deleted or moved to another customer
+        removed += cursor.execute("""
+            DELETE FROM customer_stats
+            WHERE customer_id >= %s AND customer_id < %s
+              AND NOT EXISTS (SELECT 1 FROM sales s WHERE s.customer_id = customer_stats.customer_id)
+        """, limits)
+    cursor.execute("SELECT COUNT(*) AS customers FROM customer_stats")
+    rebuilt = cursor.fetchone()['customers']
+    logger.info(f"Rebuilt statistics of {rebuilt} customers, removed {removed}")
+    return f"rebuilt statistics of {rebuilt} customers"
@@ -0,0 +1,314 @@
+"""
+Duplicate Customer Detection for SSMS
+Blocks customers by phone, email domain and name sound, scores pairs within blocks in worker processes
+"""
+
+import logging
+import multiprocessing
+import os
+import re
+import time
+import unicodedata
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from difflib import SequenceMatcher
+
+from config import get_dedupe_config
+from db_connection import DatabaseConnection
+from ssms.customer_stats import refresh_customer
+from ssms.exporter import stream_query
+
+logger = logging.getLogger(__name__)
+
+# What agreement on each field adds to a pair score, the name in proportion to its similarity.
+# A field that differs or is missing adds nothing: people change phones and keep several emails.
+WEIGHTS = {'name': 0.65, 'phone': 0.25, 'email': 0.25, 'city': 0.1}
+
+# Pairs with less alike names are family or colleagues sharing a phone, unless the email user is the same
+MIN_NAME_SIMILARITY = 0.8
+
+# Digits compared between phones, enough to ignore country codes and trunk prefixes
+PHONE_DIGITS = 10
+
+SOUNDEX_CODES = {
+    letter: code
+    for letters, code in (("bfpv", "1"), ("cgjkqsxz", "2"), ("dt", "3"), ("l", "4"), ("mn", "5"), ("r", "6"))
+    for letter in letters
+}
+
+
+class DedupeError(Exception):
+    """Raised when customers cannot be read or merged"""
+
+
+def normalize_name(name):
+    """Lower-case letters and single spaces, accents removed"""
+    text = unicodedata.normalize('NFKD', name or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).lower()
+    return ' '.join(re.sub(r"[^a-z ]", " ", text).split())
+
+
+def normalize_phone(phone):
+    """The last PHONE_DIGITS digits of a phone number"""
+    return re.sub(r"\D", "", phone or '')[-PHONE_DIGITS:]
+
+
+def normalize_email(email):
+    """(user, domain) with dots and +tags dropped from the user part"""
+    user, _, domain = (email or '').strip().lower().partition('@')
+    return user.split('+')[0].replace('.', ''), domain
+
+
+def soundex(word):
+    """American Soundex code of a word, '' when it has no letters"""
+    word = ''.join(char for char in normalize_name(word) if char.isalpha())
+    if not word:
+        return ''
+    code = word[0].upper()
+    last = SOUNDEX_CODES.get(word[0])
+    for char in word[1:]:
+        digit = SOUNDEX_CODES.get(char)
+        if digit and digit != last:
+            code += digit
+        # Vowels separate repeated codes, h and w do not
+        if char not in 'hw':
+            last = digit
+    return (code + '000')[:4]
+
+
+def _record(row, suffix_digits):
+    """Compact tuple of one customer's normalized fields and block keys"""
+    first, last = row['first_name'], row['last_name']
+    if not first and not last:
+        first, _, last = (row['name'] or '').strip().partition(' ')
+    name = normalize_name(f"{first} {last}")
+    phone = normalize_phone(row['phone'])
+    user, domain = normalize_email(row['email'])
+    first_sound, last_sound = soundex(first), soundex(last)
+    keys = []
+    if len(phone) >= suffix_digits:
+        keys.append(('phone', phone[-suffix_digits:]))
+    if domain and last_sound:
+        keys.append(('email', domain, last_sound))
+    if first_sound and last_sound:
+        keys.append(('name', first_sound, last_sound))
+    return (row['id'], name, phone, user, domain, normalize_name(row['city']), tuple(sorted(keys)))
+
+
+def _similarity(a, b):
+    return 1.0 if a == b else SequenceMatcher(None, a, b).ratio()
+
+
+def score_pair(a, b, threshold=0.0):
+    """(score, reasons) of two customer records, the score capped at 1
+
+    Returns (0.0, []) without fuzzy matching when even identical names
+    could not lift the pair to threshold.
+    """
+    exact = 0.0
+    reasons = []
+    if a[2] and a[2] == b[2]:
+        exact += WEIGHTS['phone']
+        reasons.append("same phone")
+    same_user = bool(a[3]) and a[3] == b[3]
+    if same_user:
+        exact += WEIGHTS['email']
+        reasons.append("same email" if a[4] == b[4] else "same email user")
+    if a[5] and a[5] == b[5]:
+        exact += WEIGHTS['city']
+    if exact + WEIGHTS['name'] < threshold:
+        return 0.0, []
+
+    swapped = ' '.join(reversed(b[1].split(' ', 1)))
+    name = max(_similarity(a[1], b[1]), _similarity(a[1], swapped)) if a[1] and b[1] else 0.0
+    if name < MIN_NAME_SIMILARITY and not same_user:
+        return 0.0, []
+    if name >= MIN_NAME_SIMILARITY:
+        reasons.insert(0, "same name" if name == 1 else "similar name")
+    return min(exact + WEIGHTS['name'] * name, 1.0), reasons
+
+
+def score_blocks(blocks, threshold, skipped=frozenset()):
+    """Pairs scoring at least threshold within each block, as (id, id, score, reasons)
+
+    Runs in a worker process. A pair sharing several blocks is only scored
+    in the first of them that was not skipped as too large, so no pair is
+    scored twice or lost with a skipped block.
+    """
+    pairs = []
+    for key, records in blocks:
+        for position, a in enumerate(records):
+            for b in records[position + 1:]:
+                if min(set(a[6]).intersection(b[6]).difference(skipped)) != key:
+                    continue
+                score, reasons = score_pair(a, b, threshold)
+                if score >= threshold:
+                    low, high = sorted((a[0], b[0]))
+                    pairs.append((low, high, round(score, 3), ', '.join(reasons)))
+    return pairs
+
+
+class DuplicateFinder:
+    """Lists customers that are probably the same person
+
+    Comparing every pair of 1M customers is 5e11 comparisons. Customers are
+    instead grouped into blocks sharing a phone suffix, an email domain and
+    last name sound, or first and last name sounds; only pairs within a
+    block are scored, spread over worker processes.
+    """
+
+    def __init__(self, threshold=None, workers=None, db=None, progress_callback=None):
+        config = get_dedupe_config()
+        self.threshold = threshold or config['threshold']
+        self.workers = workers or config['workers'] or os.cpu_count() or 1
+        self.suffix_digits = config['phone_suffix_digits']
+        self.max_block = config['max_block']
+        self.task_pairs = config['task_pairs']
+        self.db = db or DatabaseConnection()
+        self.progress_callback = progress_callback
+
+    def find(self):
+        """Merge candidates, best first: customer_id, duplicate_id, score and reasons"""
+        started = time.monotonic()
+        self._report(0, "Reading customers...")
+        records = [
+            _record(row, self.suffix_digits)
+            for row in stream_query("SELECT id, name, first_name, last_name, email, phone, city FROM customers",
+                                    db=self.db)
+        ]
+        self._report(20, f"Blocking {len(records):,} customers...")
+        blocks, skipped = self._blocks(records)
+        tasks = self._tasks(blocks)
+
+        pairs = []
+        if self.workers == 1 or len(tasks) <= 1:
+            for task in tasks:
+                pairs += score_blocks(task, self.threshold, skipped)
+        else:
+            # Spawned rather than forked: the GUI calls this from a thread of a multi-threaded process
+            with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+                futures = [pool.submit(score_blocks, task, self.threshold, skipped) for task in tasks]
+                for done, future in enumerate(as_completed(futures), 1):
+                    pairs += future.result()
+                    self._report(20 + done * 70 // len(futures), f"Scored {done} of {len(futures)} batches...")
+        pairs.sort(key=lambda pair: pair[2], reverse=True)
+        logger.info(f"Found {len(pairs)} duplicate candidates among {len(records)} customers "
+                    f"in {time.monotonic() - started:.1f}s")
+        return [
+            {"customer_id": low, "duplicate_id": high, "score": score, "reasons": reasons}
+            for low, high, score, reasons in pairs
+        ]
+
+    def _blocks(self, records):
+        """(blocks of more than one customer, keys of the blocks skipped as too large)"""
+        blocks = defaultdict(list)
+        for record in records:
+            for key in record[6]:
+                blocks[key].append(record)
+        kept = []
+        skipped = set()
+        for key, members in blocks.items():
+            if len(members) > self.max_block:
+                skipped.add(key)
+            elif len(members) > 1:
+                kept.append((key, members))
+        if skipped:
+            logger.warning(f"Skipped {len(skipped)} blocks of more than {self.max_block} customers")
+        return kept, frozenset(skipped)
+
+    def _tasks(self, blocks):
+        """Blocks grouped into worker tasks of about task_pairs pairs each"""
+        tasks = [[]]
+        pairs = 0
+        for block in blocks:
+            if pairs >= self.task_pairs:
+                tasks.append([])
+                pairs = 0
+            tasks[-1].append(block)
+            pairs += len(block[1]) * (len(block[1]) - 1) // 2
+        return [task for task in tasks if task]
+
+    def save(self, candidates):
+        """Store candidates for review; a pair already dismissed or merged keeps its status"""
+        if candidates:
+            with self.db.transaction() as cursor:
+                cursor.executemany("""
+                    INSERT INTO customer_merge_candidates (customer_id, duplicate_id, score, reasons)
+                    VALUES (%s, %s, %s, %s)
+                    ON DUPLICATE KEY UPDATE score = VALUES(score), reasons = VALUES(reasons)
+                """, [
+                    (candidate['customer_id'], candidate['duplicate_id'], candidate['score'],
+                     candidate['reasons'][:255])
+                    for candidate in candidates
+                ])
+        return len(candidates)
+
+    def run(self):
+        """Find and store candidates; returns how many were found"""
+        found = self.save(self.find())
+        self._report(100, f"Found {found} possible duplicates")
+        return found
+
+    def _report(self, percent, message):
+        if self.progress_callback:
+            self.progress_callback(percent, message)
+
+
+def merge_candidates(limit=500, db=None):
+    """Pending candidates whose customers both still exist, best first, with both customers' details"""
+    db = db or DatabaseConnection()
+    rows = db.execute_query("""
+        SELECT m.id, m.score, m.reasons,
+               a.id AS customer_id, CONCAT(a.first_name, ' ', a.last_name) AS customer_name,
+               a.email AS customer_email, a.phone AS customer_phone, COALESCE(sa.orders, 0) AS customer_orders,
+               b.id AS duplicate_id, CONCAT(b.first_name, ' ', b.last_name) AS duplicate_name,
+               b.email AS duplicate_email, b.phone AS duplicate_phone, COALESCE(sb.orders, 0) AS duplicate_orders
+        FROM customer_merge_candidates m
+        JOIN customers a ON a.id = m.customer_id
+        JOIN customers b ON b.id = m.duplicate_id
+        LEFT JOIN customer_stats sa ON sa.customer_id = a.id
+        LEFT JOIN customer_stats sb ON sb.customer_id = b.id
+        WHERE m.status = 'PENDING'
+        ORDER BY m.score DESC
+        LIMIT %s
+    """, (limit,))
+    if rows is None:
+        raise DedupeError("Could not read merge candidates")
+    return rows
+
+
+def dismiss_candidate(candidate_id, db=None):
+    """Mark a candidate as not a duplicate, so later runs do not list it again"""
+    db = db or DatabaseConnection()
+    db.execute_query("UPDATE customer_merge_candidates SET status = 'DISMISSED' WHERE id = %s", (candidate_id,))
+
+
+def merge_customers(keep_id, duplicate_id, db=None):
+    """Move the duplicate's sales to keep_id, fill keep_id's missing contact details and delete the duplicate"""
+    if keep_id == duplicate_id:
+        raise DedupeError("A customer cannot be merged into itself")
+    db = db or DatabaseConnection()
+    with db.transaction() as cursor:
+        cursor.execute("SELECT * FROM customers WHERE id IN (%s, %s) FOR UPDATE", (keep_id, duplicate_id))
+        customers = {row['id']: row for row in cursor.fetchall()}
+        if len(customers) != 2:
+            raise DedupeError("One of the customers no longer exists")
+        keep, duplicate = customers[keep_id], customers[duplicate_id]
+        cursor.execute("UPDATE sales SET customer_id = %s, customer_name = %s WHERE customer_id = %s",
+                       (keep_id, keep['name'], duplicate_id))
+        moved = cursor.rowcount
+        cursor.execute("DELETE FROM customers WHERE id = %s", (duplicate_id,))
+        # The duplicate's email is free to take over once it is deleted
+        cursor.execute("""
+            UPDATE customers
+            SET email = COALESCE(email, %s), phone = COALESCE(phone, %s), address = COALESCE(address, %s),
+                city = COALESCE(city, %s)
+            WHERE id = %s
+        """, (duplicate['email'], duplicate['phone'], duplicate['address'], duplicate['city'], keep_id))
+        refresh_customer(cursor, keep_id)
+        cursor.execute("""
+            UPDATE customer_merge_candidates SET status = 'MERGED'
+            WHERE customer_id IN (%s, %s) AND duplicate_id IN (%s, %s)
+        """, (keep_id, duplicate_id, keep_id, duplicate_id))
+    logger.info(f"Merged customer {duplicate_id} into {keep_id}, {moved} sales moved")
+    return moved
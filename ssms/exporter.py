@@ -0,0 +1,112 @@
+"""
+Streaming Exporter for SSMS
+Writes query results or row iterables to CSV, Excel or JSON Lines a batch at a time
+"""
+
+import csv
+import json
+import logging
+from datetime import date, datetime
+from decimal import Decimal
+
+import pymysql
+
+from db_connection import DatabaseConnection
+
+logger = logging.getLogger(__name__)
+
+# Format name -> file extension
+FORMATS = {'csv': '.csv', 'excel': '.xlsx', 'json': '.jsonl'}
+
+BATCH_ROWS = 2000
+
+
+class ExportFailed(Exception):
+    """Raised when an export cannot be written"""
+
+
+def _cell(value):
+    """Plain value for a cell: Decimal as float, dates as ISO text"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(' ') if isinstance(value, datetime) else value.isoformat()
+    return value
+
+
+def stream_query(query, params=None, db=None, batch_rows=BATCH_ROWS):
+    """Yield the rows of a SELECT without loading the result set into memory
+
+    MySQL rows come from an unbuffered server-side cursor, so the
+    connection stays busy until the generator is exhausted or closed.
+    """
+    db = db or DatabaseConnection()
+    with db as conn:
+        if conn is None:
+            raise ExportFailed("Database connection failed")
+        cursor = conn.cursor(pymysql.cursors.SSDictCursor) if db.backend == 'mysql' else conn.cursor()
+        with cursor:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_rows)
+                if not rows:
+                    break
+                yield from rows
+
+
+def export_rows(rows, columns, path, file_format='csv', progress_callback=None):
+    """Write rows (dicts) to path; columns is a list of (key, header). Returns the rows written"""
+    if file_format not in FORMATS:
+        raise ExportFailed(f"Unknown export format {file_format}, choose from {', '.join(FORMATS)}")
+    writer = {'csv': _write_csv, 'excel': _write_excel, 'json': _write_json}[file_format]
+    try:
+        count = writer(rows, columns, str(path), progress_callback)
+    except OSError as e:
+        raise ExportFailed(f"Could not write {path}: {e}") from e
+    logger.info(f"Exported {count} rows to {path}")
+    return count
+
+
+def _progress(count, progress_callback):
+    if progress_callback and count % BATCH_ROWS == 0:
+        progress_callback(count)
+
+
+def _write_csv(rows, columns, path, progress_callback):
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow([header for _, header in columns])
+        for row in rows:
+            writer.writerow([_cell(row[key]) for key, _ in columns])
+            count += 1
+            _progress(count, progress_callback)
+    return count
+
+
+def _write_json(rows, columns, path, progress_callback):
+    count = 0
+    with open(path, 'w', encoding='utf-8') as f:
+        for row in rows:
+            f.write(json.dumps({key: _cell(row[key]) for key, _ in columns}, default=str) + "\n")
+            count += 1
+            _progress(count, progress_callback)
+    return count
+
+
+def _write_excel(rows, columns, path, progress_callback):
+    try:
+        from openpyxl import Workbook
+    except ImportError as e:
+        raise ExportFailed("Excel export requires the openpyxl package") from e
+    # Write-only workbooks stream rows to disk instead of building every cell in memory
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet()
+    sheet.append([header for _, header in columns])
+    count = 0
+    for row in rows:
+        sheet.append([_cell(row[key]) for key, _ in columns])
+        count += 1
+        _progress(count, progress_callback)
+    workbook.save(path)
+    return count
@@ -0,0 +1,572 @@
+"""
+Data Import Engine for SSMS
+Streams CSV, Excel and JSON files into the database in validated, upserted batches
+"""
+
+import csv
+import io
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+import pymysql
+
+from config import REPORTS_DIR, get_import_config
+from db_connection import DatabaseConnection
+from ssms.stock import StockError, StockLedger
+
+logger = logging.getLogger(__name__)
+
+DATE_FORMATS = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%Y/%m/%d')
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 'active'}
+FALSE_VALUES = {'0', 'false', 'no', 'n', 'inactive'}
+
+# Column specs are (converter, argument); argument is a max length or allowed values.
+# insert_only columns are set for new rows but never overwritten on upsert.
+ENTITIES = {
+    'products': {
+        'table': 'products',
+        'required': ('name',),
+        'columns': {
+            'name': ('text', 100),
+            'sku': ('text', 50),
+            'category': ('text', 50),
+            'description': ('text', None),
+            'purchase_price': ('decimal', None),
+            'selling_price': ('decimal', None),
+            'stock_quantity': ('integer', None),
+            'min_stock_level': ('integer', None),
+            'unit': ('text', 20),
+            'supplier': ('text', 100),
+            'barcode': ('text', 50),
+            'is_active': ('boolean', None),
+        },
+        'aliases': {
+            'product': 'name', 'product_name': 'name', 'cost': 'purchase_price',
+            'price': 'selling_price', 'stock': 'stock_quantity',
+        },
+        # Stock of existing products only changes through the stock ledger
+        'insert_only': ('stock_quantity',),
+    },
+    'customers': {
+        'table': 'customers',
+        'required': ('name',),
+        'columns': {
+            'name': ('text', 100),
+            'email': ('text', 100),
+            'phone': ('text', 20),
+            'address': ('text', None),
+            'city': ('text', 50),
+            'state': ('text', 50),
+            'pincode': ('text', 10),
+            'customer_type': ('choice', ('Individual', 'Business', 'Wholesale', 'Retail')),
+            'credit_limit': ('decimal', None),
+            'notes': ('text', None),
+            'is_active': ('boolean', None),
+        },
+        'aliases': {'customer': 'name', 'customer_name': 'name', 'type': 'customer_type'},
+    },
+    'suppliers': {
+        'table': 'suppliers',
+        'required': ('name',),
+        'columns': {
+            'name': ('text', 100),
+            'contact_person': ('text', 50),
+            'email': ('text', 100),
+            'phone': ('text', 20),
+            'address': ('text', None),
+            'city': ('text', 50),
+            'state': ('text', 50),
+            'pincode': ('text', 10),
+            'payment_terms': ('text', 100),
+            'notes': ('text', None),
+            'is_active': ('boolean', None),
+        },
+        'aliases': {'supplier': 'name', 'supplier_name': 'name', 'contact': 'contact_person'},
+    },
+    'purchases': {
+        'table': 'purchases',
+        'required': ('supplier_name', 'quantity', 'unit_price', 'purchase_date'),
+        'columns': {
+            'supplier_name': ('text', 100),
+            'product_name': ('text', 100),
+            'sku': ('text', 50),
+            'batch_number': ('text', 50),
+            'quantity': ('integer', None),
+            'unit_price': ('decimal', None),
+            'total_amount': ('decimal', None),
+            'purchase_date': ('date', None),
+            'payment_method': ('choice', ('Cash', 'Card', 'Bank Transfer', 'Cheque')),
+            'payment_status': ('choice', ('Pending', 'Paid', 'Partially Paid')),
+            'notes': ('text', None),
+        },
+        'aliases': {
+            'supplier': 'supplier_name', 'product': 'product_name', 'price': 'unit_price',
+            'total': 'total_amount', 'date': 'purchase_date', 'batch': 'batch_number',
+        },
+    },
+}
+
+
+class ImportFailed(Exception):
+    """Raised when an import file cannot be read at all"""
+
+
+def purchase_key(supplier_name, product_id, purchase_date, batch_number):
+    """What makes a purchase row the same purchase when a file is imported again"""
+    return (str(supplier_name or '').strip().lower(), product_id,
+            date.fromisoformat(str(purchase_date)[:10]), str(batch_number or '').strip())
+
+
+def normalize_header(header):
+    """Turn a column heading like 'Selling Price' into 'selling_price'"""
+    return '_'.join(str(header or '').strip().lower().replace('-', ' ').split())
+
+
+def convert_value(value, converter, argument):
+    """Convert one raw cell; raises ValueError with a readable message"""
+    if converter == 'text':
+        value = str(value).strip()
+        if isinstance(argument, int) and len(value) > argument:
+            raise ValueError(f"longer than {argument} characters")
+        return value
+    if converter == 'integer':
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        try:
+            return int(str(value).strip().replace(',', ''))
+        except ValueError:
+            raise ValueError(f"'{value}' is not a whole number")
+    if converter == 'decimal':
+        try:
+            return Decimal(str(value).strip().replace(',', '')).quantize(Decimal('0.01'))
+        except InvalidOperation:
+            raise ValueError(f"'{value}' is not a number")
+    if converter == 'boolean':
+        if isinstance(value, (bool, int, float)):
+            return bool(value)
+        text = str(value).strip().lower()
+        if text in TRUE_VALUES:
+            return True
+        if text in FALSE_VALUES:
+            return False
+        raise ValueError(f"'{value}' is not yes/no")
+    if converter == 'date':
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        for fmt in DATE_FORMATS:
+            try:
+                return datetime.strptime(str(value).strip(), fmt).date()
+            except ValueError:
+                pass
+        raise ValueError(f"'{value}' is not a date")
+    if converter == 'choice':
+        for choice in argument:
+            if str(value).strip().lower() == choice.lower():
+                return choice
+        raise ValueError(f"must be one of {', '.join(argument)}")
+    raise ValueError(f"unknown converter {converter}")
+
+
+def normalize_chunk(entity, records):
+    """Validate and normalize a chunk of (line, record) pairs
+
+    Runs in a worker process. Only columns with a value are kept so that
+    blank cells never overwrite existing data on upsert.
+    """
+    spec = ENTITIES[entity]
+    rows, errors = [], []
+    for line, record in records:
+        row = {}
+        problems = []
+        for header, value in record.items():
+            column = normalize_header(header)
+            column = spec['aliases'].get(column, column)
+            if column not in spec['columns'] or value is None or str(value).strip() == '':
+                continue
+            converter, argument = spec['columns'][column]
+            try:
+                row[column] = convert_value(value, converter, argument)
+            except (TypeError, ValueError) as e:
+                problems.append(f"{column}: {e}")
+        missing = [column for column in spec['required'] if column not in row]
+        if missing:
+            problems.append(f"missing {', '.join(missing)}")
+        if entity == 'purchases' and not problems:
+            if row['quantity'] <= 0:
+                problems.append("quantity: must be positive")
+            row.setdefault('total_amount', row['unit_price'] * row['quantity'])
+        if problems:
+            errors.append((line, '; '.join(problems), record))
+        else:
+            rows.append((line, row))
+    return rows, errors
+
+
+def read_csv(path):
+    """Yield (line, record, fraction read) from a CSV file"""
+    size = max(os.path.getsize(path), 1)
+    with open(path, 'rb') as raw:
+        reader = csv.DictReader(io.TextIOWrapper(raw, encoding='utf-8-sig', newline=''))
+        for record in reader:
+            yield reader.line_num, record, raw.tell() / size
+
+
+def iter_json_array(f, read_size=1 << 16):
+    """Yield (record, characters consumed) from a JSON array one element at a time
+
+    Only the element being decoded is held in memory, so a large export
+    streams like JSON lines do.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, consumed, eof = '', 0, 0, False
+
+    def fill():
+        nonlocal buffer, position, eof
+        data = f.read(read_size)
+        eof = not data
+        buffer = buffer[position:] + data
+        position = 0
+
+    started = False
+    while True:
+        while position < len(buffer) and (buffer[position].isspace() or (started and buffer[position] == ',')):
+            position += 1
+        if position == len(buffer):
+            if eof:
+                raise ValueError("unexpected end of JSON array")
+            fill()
+            continue
+        if not started:
+            if buffer[position] != '[':
+                raise ValueError("expected a JSON array")
+            position += 1
+            started = True
+            continue
+        if buffer[position] == ']':
+            return
+        try:
+            record, end = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            fill()
+            continue
+        if end == len(buffer) and not eof:
+            # A number may continue in the next read
+            fill()
+            continue
+        consumed += end - position
+        position = end
+        yield record, consumed
+
+
+def read_json(path):
+    """Yield (line, record, fraction read) from a JSON array or JSON-lines file"""
+    size = max(os.path.getsize(path), 1)
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        f.seek(0)
+        if first == '[':
+            for index, (record, consumed) in enumerate(iter_json_array(f), start=1):
+                yield index, record, min(consumed / size, 1.0)
+            return
+        position = 0
+        for line, text in enumerate(f, start=1):
+            position += len(text.encode('utf-8'))
+            if text.strip():
+                yield line, json.loads(text), position / size
+
+
+def read_excel(path):
+    """Yield (row, record, fraction read) from the first sheet of a workbook"""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ImportFailed("Excel import requires the openpyxl package")
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        sheet = workbook.worksheets[0]
+        total = max(sheet.max_row or 1, 1)
+        values = sheet.iter_rows(values_only=True)
+        headers = next(values, None)
+        if headers is None:
+            return
+        for index, cells in enumerate(values, start=2):
+            if any(cell is not None for cell in cells):
+                yield index, dict(zip(headers, cells)), index / total
+    finally:
+        workbook.close()
+
+
+READERS = {'csv': read_csv, 'json': read_json, 'excel': read_excel}
+EXTENSIONS = {'.csv': 'csv', '.txt': 'csv', '.json': 'json', '.jsonl': 'json',
+              '.xlsx': 'excel', '.xlsm': 'excel'}
+
+
+class ImportEngine:
+    """Streaming import of one file into one entity table"""
+
+    def __init__(self, file_path, entity, file_format=None, workers=None, chunk_rows=None,
+                 batch_rows=None, progress_callback=None):
+        if entity not in ENTITIES:
+            raise ImportFailed(f"Unknown import type: {entity}")
+        config = get_import_config()
+        self.file_path = file_path
+        self.entity = entity
+        self.file_format = file_format or EXTENSIONS.get(os.path.splitext(file_path)[1].lower(), 'csv')
+        self.workers = workers or config['workers']
+        self.chunk_rows = chunk_rows or config['chunk_rows']
+        self.batch_rows = batch_rows or config['batch_rows']
+        self.progress_callback = progress_callback
+
+        self.lookups = {}
+        self.ledger = StockLedger() if entity == 'purchases' else None
+        self._cancelled = False
+        self._fraction = 0.0
+
+    def cancel(self):
+        """Stop after the batch currently being written"""
+        self._cancelled = True
+
+    def run(self):
+        """Import the file and return a summary of what happened"""
+        started = time.monotonic()
+        summary = {"entity": self.entity, "imported": 0, "skipped": 0, "failed": 0, "error_report": None}
+        errors = []
+
+        with DatabaseConnection() as conn:
+            if conn is None:
+                raise ImportFailed("Database connection failed")
+            with conn.cursor() as cursor:
+                self._build_lookups(cursor)
+
+                self._report(0, f"Importing {self.entity}...")
+                # Spawned, not forked: the import runs from a thread of the Qt process
+                with ProcessPoolExecutor(max_workers=self.workers,
+                                         mp_context=multiprocessing.get_context('spawn')) as pool:
+                    in_flight = deque()
+                    for chunk in self._read_chunks():
+                        in_flight.append(pool.submit(normalize_chunk, self.entity, chunk))
+                        # Keep a bounded number of chunks queued so memory stays flat
+                        if len(in_flight) >= self.workers * 2:
+                            self._write(cursor, in_flight.popleft().result(), summary, errors)
+                        if self._cancelled:
+                            break
+                    while in_flight and not self._cancelled:
+                        self._write(cursor, in_flight.popleft().result(), summary, errors)
+                    for future in in_flight:
+                        future.cancel()
+
+        if errors:
+            summary["error_report"] = self._write_error_report(errors)
+        summary["cancelled"] = self._cancelled
+        summary["duration_seconds"] = round(time.monotonic() - started, 3)
+        logger.info(
+            f"Imported {summary['imported']} {self.entity} from {self.file_path}, "
+            f"{summary['failed']} rejected in {summary['duration_seconds']}s"
+        )
+        self._report(100, "Import completed")
+        return summary
+
+    def _read_chunks(self):
+        """Group parsed records into chunks for the validation workers"""
+        try:
+            records = READERS[self.file_format](self.file_path)
+        except KeyError:
+            raise ImportFailed(f"Unsupported file format: {self.file_format}")
+        chunk = []
+        try:
+            for line, record, fraction in records:
+                if not isinstance(record, dict):
+                    record = {'value': record}
+                chunk.append((line, record))
+                self._fraction = fraction
+                if len(chunk) >= self.chunk_rows:
+                    yield chunk
+                    chunk = []
+        except (OSError, UnicodeDecodeError, ValueError, csv.Error) as e:
+            raise ImportFailed(f"Could not read {os.path.basename(self.file_path)}: {e}")
+        if chunk:
+            yield chunk
+
+    def _build_lookups(self, cursor):
+        """Load the natural-key to id maps needed to resolve foreign keys"""
+        if self.entity == 'purchases':
+            cursor.execute("SELECT id, name, sku FROM products")
+            products = cursor.fetchall()
+            self.lookups['product_name'] = {row['name'].lower(): row['id'] for row in products}
+            self.lookups['sku'] = {row['sku'].lower(): row['id'] for row in products if row['sku']}
+            self.lookups['purchased'] = set()
+        elif self.entity == 'suppliers':
+            # suppliers.name is not unique, so existing rows are matched by id
+            cursor.execute("SELECT id, name FROM suppliers")
+            self.lookups['name'] = {row['name'].lower(): row['id'] for row in cursor.fetchall()}
+
+    def _resolve(self, row):
+        """Fill in foreign keys and natural-key matches from the lookup maps"""
+        if self.entity == 'purchases':
+            sku = row.pop('sku', None)
+            product_id = None
+            if sku:
+                product_id = self.lookups['sku'].get(sku.lower())
+            if product_id is None and row.get('product_name'):
+                product_id = self.lookups['product_name'].get(row['product_name'].lower())
+            if product_id is None and not (sku or row.get('product_name')):
+                raise ValueError("missing product_name or sku")
+            if product_id is None:
+                raise ValueError(f"unknown product {sku or row['product_name']}")
+            row['product_id'] = product_id
+        elif self.entity == 'suppliers':
+            supplier_id = self.lookups['name'].get(row['name'].lower())
+            if supplier_id is not None:
+                row['id'] = supplier_id
+        return row
+
+    def _write(self, cursor, result, summary, errors):
+        """Upsert one validated chunk in batches"""
+        rows, rejected = result
+        errors.extend(rejected)
+
+        resolved = []
+        for line, row in rows:
+            try:
+                resolved.append((line, self._resolve(row)))
+            except ValueError as e:
+                errors.append((line, str(e), row))
+
+        for start in range(0, len(resolved), self.batch_rows):
+            batch = resolved[start:start + self.batch_rows]
+            if self.entity == 'purchases':
+                self._record_purchases(cursor, batch, summary, errors)
+                continue
+            # Rows with blank cells carry fewer columns; each shape gets its own statement
+            groups = {}
+            for line, row in batch:
+                groups.setdefault(tuple(row), []).append((line, row))
+            for columns, group in groups.items():
+                summary["imported"] += self._upsert(cursor, columns, group, errors)
+            if self.entity == 'suppliers':
+                self._refresh_supplier_ids(cursor, batch)
+
+        summary["failed"] = len(errors)
+        self._report(min(99, int(self._fraction * 100)),
+                     f"Importing {self.entity}... {summary['imported']:,} rows")
+
+    def _upsert(self, cursor, columns, group, errors):
+        """Run one multi-row upsert, falling back to row by row to isolate bad rows"""
+        spec = ENTITIES[self.entity]
+        table = spec['table']
+        column_sql = ', '.join(f"`{column}`" for column in columns)
+        placeholders = ', '.join(['%s'] * len(columns))
+        kept = ('id',) + spec.get('insert_only', ())
+        updates = ', '.join(f"`{column}` = VALUES(`{column}`)" for column in columns if column not in kept)
+        updates = updates or f"`{columns[0]}` = `{columns[0]}`"
+        sql = (
+            f"INSERT INTO `{table}` ({column_sql}) VALUES ({placeholders}) "
+            f"ON DUPLICATE KEY UPDATE {updates}"
+        )
+        values = [tuple(row[column] for column in columns) for _, row in group]
+        try:
+            cursor.executemany(sql, values)
+            return len(values)
+        except pymysql.Error:
+            pass
+
+        imported = 0
+        for (line, row), params in zip(group, values):
+            try:
+                cursor.execute(sql, params)
+                imported += 1
+            except pymysql.Error as e:
+                errors.append((line, e.args[-1] if e.args else str(e), row))
+        return imported
+
+    def _record_purchases(self, cursor, batch, summary, errors):
+        """Receive a batch of purchase rows through the stock ledger, skipping rows imported before
+
+        Rows are grouped into one order per supplier, date and payment, so
+        stock, movements and open demands change together as when a
+        purchase is entered by hand.
+        """
+        self._load_purchase_keys(cursor, batch)
+        orders = {}
+        for line, row in batch:
+            key = purchase_key(row['supplier_name'], row['product_id'], row['purchase_date'],
+                               row.get('batch_number'))
+            if key in self.lookups['purchased']:
+                summary["skipped"] += 1
+                continue
+            self.lookups['purchased'].add(key)
+            order = (row['supplier_name'], row['purchase_date'], row.get('payment_method', 'Bank Transfer'),
+                     row.get('payment_status', 'Pending'), row.get('notes'))
+            orders.setdefault(order, []).append((line, row))
+        for order, group in orders.items():
+            summary["imported"] += self._receive(order, group, errors)
+
+    def _receive(self, order, group, errors):
+        """Record one order, falling back to line by line to isolate bad rows"""
+        lines = [{'product_id': row['product_id'], 'quantity': row['quantity'], 'unit_price': row['unit_price'],
+                  'batch_number': row.get('batch_number')} for _, row in group]
+        try:
+            self.ledger.record_purchase(lines, *order)
+            return len(lines)
+        except (StockError, pymysql.Error) as e:
+            if len(group) == 1:
+                line, row = group[0]
+                errors.append((line, e.args[-1] if isinstance(e, pymysql.Error) and e.args else str(e), row))
+                return 0
+        return sum(self._receive(order, [item], errors) for item in group)
+
+    def _load_purchase_keys(self, cursor, batch):
+        """Add the keys of purchases already in the database for the batch's products and dates"""
+        product_ids = sorted({row['product_id'] for _, row in batch})
+        dates = [row['purchase_date'] for _, row in batch]
+        cursor.execute(f"""
+            SELECT supplier_name, product_id, purchase_date, batch_number FROM purchases
+            WHERE product_id IN ({', '.join(['%s'] * len(product_ids))}) AND purchase_date BETWEEN %s AND %s
+        """, product_ids + [min(dates), max(dates)])
+        self.lookups['purchased'].update(
+            purchase_key(row['supplier_name'], row['product_id'], row['purchase_date'], row['batch_number'])
+            for row in cursor.fetchall()
+        )
+
+    def _refresh_supplier_ids(self, cursor, batch):
+        """Record ids of newly inserted suppliers so repeats later in the file update them"""
+        new_names = {row['name'] for _, row in batch if 'id' not in row}
+        if not new_names:
+            return
+        names = sorted(new_names)
+        cursor.execute(
+            f"SELECT id, name FROM suppliers WHERE name IN ({', '.join(['%s'] * len(names))})",
+            names
+        )
+        for row in cursor.fetchall():
+            self.lookups['name'].setdefault(row['name'].lower(), row['id'])
+
+    def _write_error_report(self, errors):
+        """Write rejected rows to a CSV next to the other reports"""
+        name = os.path.splitext(os.path.basename(self.file_path))[0]
+        path = REPORTS_DIR / f"import_errors_{name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(['line', 'error', 'data'])
+            for line, message, record in sorted(errors, key=lambda error: error[0]):
+                writer.writerow([line, message, json.dumps(record, default=str)])
+        return str(path)
+
+    def _report(self, percent, message):
+        """Forward progress to the caller"""
+        if self.progress_callback:
+            self.progress_callback(percent, message)
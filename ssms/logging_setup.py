@@ -0,0 +1,144 @@
+"""
+Logging Setup for SSMS
+Queue-based logging so callers never wait on file or console I/O
+"""
+
+import atexit
+import logging
+import queue
+import sys
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+from config import get_logging_config
+
+_listener = None
+
+
+class BatchingRotatingFileHandler(RotatingFileHandler):
+    """Size-rotating file handler that writes records in batches
+
+    Records are buffered and written together once batch_size is reached,
+    when an error is logged, or when the listener goes idle.
+    """
+
+    def __init__(self, filename, batch_size=200, **kwargs):
+        super().__init__(filename, **kwargs)
+        self.batch_size = batch_size
+        self._buffer = []
+        self._pending = 0
+
+    def emit(self, record):
+        try:
+            message = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self.stream.tell() + self._pending + len(message) >= self.maxBytes:
+                self.flush()
+                self.doRollover()
+            self._buffer.append(message)
+            self._pending += len(message)
+            if len(self._buffer) >= self.batch_size or record.levelno >= logging.ERROR:
+                self.flush()
+        except Exception:
+            self.handleError(record)
+
+    def flush(self):
+        self.acquire()
+        try:
+            if self._buffer and self.stream:
+                self.stream.write(''.join(self._buffer))
+                self._buffer = []
+                self._pending = 0
+            super().flush()
+        finally:
+            self.release()
+
+    def close(self):
+        self.flush()
+        super().close()
+
+
+class FlushingQueueListener(QueueListener):
+    """Queue listener that flushes its handlers whenever the queue goes idle"""
+
+    def __init__(self, log_queue, *handlers, flush_interval=1.0):
+        super().__init__(log_queue, *handlers, respect_handler_level=True)
+        self.flush_interval = flush_interval
+
+    def dequeue(self, block):
+        while True:
+            try:
+                return self.queue.get(block, timeout=self.flush_interval)
+            except queue.Empty:
+                for handler in self.handlers:
+                    handler.flush()
+
+
+class SamplingFilter(logging.Filter):
+    """Pass one in every `rate` records below INFO; INFO and above always pass"""
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = max(int(rate), 1)
+        self._count = 0
+
+    def filter(self, record):
+        if record.levelno >= logging.INFO:
+            return True
+        self._count += 1
+        return (self._count - 1) % self.rate == 0
+
+
+def setup_logging():
+    """Route all logging through a queue to the console and rotating log file
+
+    Safe to call more than once; later calls do nothing.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    config = get_logging_config()
+    formatter = logging.Formatter(config['format'])
+
+    file_handler = BatchingRotatingFileHandler(
+        config['file'],
+        batch_size=config['batch_size'],
+        maxBytes=config['max_size'],
+        backupCount=config['backup_count'],
+        encoding='utf-8'
+    )
+    file_handler.setFormatter(formatter)
+
+    console_handler = logging.StreamHandler(sys.stderr)
+    console_handler.setLevel(config['console_level'])
+    console_handler.setFormatter(formatter)
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(QueueHandler(log_queue))
+    root.setLevel(config['level'])
+
+    for name, level in config['levels'].items():
+        logging.getLogger(name).setLevel(level)
+    for name, rate in config['sampling'].items():
+        logging.getLogger(name).addFilter(SamplingFilter(rate))
+
+    _listener = FlushingQueueListener(
+        log_queue, file_handler, console_handler, flush_interval=config['flush_interval']
+    )
+    _listener.start()
+    # Registered after logging's own exit hook, so it runs first and drains the queue
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Drain the queue and flush the log file"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.flush()
+        _listener = None
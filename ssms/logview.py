@@ -0,0 +1,188 @@
+"""
+Log Index for SSMS
+Line-offset, level and time index over the current and rotated log files
+"""
+
+import logging
+import mmap
+import os
+import re
+import threading
+from array import array
+from bisect import bisect_right
+from contextlib import contextmanager
+
+from config import get_logging_config
+
+logger = logging.getLogger(__name__)
+
+LEVELS = {b'DEBUG': 10, b'INFO': 20, b'WARNING': 30, b'ERROR': 40, b'CRITICAL': 50}
+
+# Matches one line; the header groups only match lines in LOGGING_CONFIG['format']
+LINE_PATTERN = re.compile(
+    rb'(?:(\d{4}-\d\d-\d\d \d\d:\d\d:\d\d)[^\n]*? - (DEBUG|INFO|WARNING|ERROR|CRITICAL) - )?[^\n]*\n'
+)
+
+
+def time_key(value):
+    """Turn a datetime or 'YYYY-MM-DD HH:MM:SS' into a sortable YYYYMMDDhhmmss integer"""
+    if not isinstance(value, (str, bytes)):
+        value = value.strftime('%Y-%m-%d %H:%M:%S')
+    if isinstance(value, str):
+        value = value.encode('ascii')
+    return int(value[:19].translate(None, b'-: '))
+
+
+class LogFile:
+    """Index of one log file
+
+    Files are memory-mapped only while scanning or reading and closed
+    straight after, so the rotating handler can always rename them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.offsets = array('Q')
+        self.levels = array('B')
+        self.times = array('Q')
+        self.size = 0
+        self.head = b''
+
+    def __len__(self):
+        return len(self.levels)
+
+    @contextmanager
+    def mapped(self):
+        """Map the file read-only for the duration of the block"""
+        with open(self.path, 'rb') as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b''
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                yield mm
+
+    def update(self):
+        """Index lines appended since the last call
+
+        Returns False when the file was truncated or replaced, in which case
+        the caller must rebuild the whole index.
+        """
+        try:
+            size = os.path.getsize(self.path)
+        except OSError:
+            return False
+        if size < self.size:
+            return False
+        if size == self.size:
+            return True
+
+        with self.mapped() as mm:
+            if self.head and mm[:len(self.head)] != self.head:
+                return False
+            self.head = bytes(mm[:64])
+            level, stamp = (self.levels[-1], self.times[-1]) if self.levels else (0, 0)
+            position = self.size
+            for match in LINE_PATTERN.finditer(mm, self.size):
+                if match.group(1):
+                    stamp = time_key(match.group(1))
+                    level = LEVELS[match.group(2)]
+                # Continuation lines such as tracebacks inherit their record's level and time
+                self.offsets.append(match.start())
+                self.levels.append(level)
+                self.times.append(stamp)
+                position = match.end()
+            self.size = position
+        return True
+
+    def read(self, indexes):
+        """Return the text of the given local line numbers"""
+        last = len(self.offsets) - 1
+        with self.mapped() as mm:
+            return [
+                mm[self.offsets[i]:self.offsets[i + 1] if i < last else self.size]
+                .decode('utf-8', errors='replace').rstrip('\r\n')
+                for i in indexes
+            ]
+
+    def search(self, text):
+        """Return the set of local line numbers containing text, case-insensitively"""
+        pattern = re.compile(re.escape(text.encode('utf-8')), re.IGNORECASE)
+        found = set()
+        with self.mapped() as mm:
+            for match in pattern.finditer(mm, 0, self.size):
+                found.add(bisect_right(self.offsets, match.start()) - 1)
+        return found
+
+
+class LogIndex:
+    """Combined index over ssms.log and its rotated backups, oldest first"""
+
+    def __init__(self, log_file=None):
+        config = get_logging_config()
+        self.log_file = str(log_file or config['file'])
+        self.backup_count = config['backup_count']
+        self.files = []
+        self.bases = []
+        self._lock = threading.Lock()
+        self.rebuild()
+
+    def __len__(self):
+        return sum(len(log) for log in self.files)
+
+    def rebuild(self):
+        """Index every log file from scratch"""
+        paths = [f"{self.log_file}.{n}" for n in range(self.backup_count, 0, -1)] + [self.log_file]
+        files = [LogFile(path) for path in paths if os.path.isfile(path)]
+        bases = []
+        total = 0
+        for log in files:
+            log.update()
+            bases.append(total)
+            total += len(log)
+        with self._lock:
+            self.files, self.bases = files, bases
+
+    def refresh(self):
+        """Pick up new lines; returns True if the index had to be rebuilt after a rotation"""
+        if not self.files or self.files[-1].path != self.log_file:
+            if os.path.isfile(self.log_file):
+                self.rebuild()
+                return True
+            return False
+        with self._lock:
+            updated = self.files[-1].update()
+        if updated:
+            return False
+        logger.debug(f"{self.log_file} rotated, rebuilding log index")
+        self.rebuild()
+        return True
+
+    def filter(self, min_level=0, start=None, end=None, text=None, first_line=0):
+        """Return global line numbers matching all of the given conditions"""
+        start_key = time_key(start) if start else 0
+        end_key = time_key(end) if end else 99999999999999
+        matches = array('L')
+        for base, log in zip(self.bases, self.files):
+            if base + len(log) <= first_line:
+                continue
+            skip = max(first_line - base, 0)
+            levels, times = log.levels, log.times
+            candidates = sorted(log.search(text)) if text else range(skip, len(log))
+            for i in candidates:
+                if i >= skip and levels[i] >= min_level and start_key <= times[i] <= end_key:
+                    matches.append(base + i)
+        return matches
+
+    def lines(self, line_numbers):
+        """Return (level, text) for each of the given ascending global line numbers"""
+        with self._lock:
+            by_file = {}
+            for number in line_numbers:
+                file_index = bisect_right(self.bases, number) - 1
+                by_file.setdefault(file_index, []).append(number - self.bases[file_index])
+            result = []
+            for file_index in sorted(by_file):
+                log = self.files[file_index]
+                local = by_file[file_index]
+                result.extend(zip((log.levels[i] for i in local), log.read(local)))
+            return result
@@ -0,0 +1,255 @@
+"""
+Database Maintenance Engine for SSMS
+Refreshes optimizer statistics, defragments tables and reports on index health
+"""
+
+import logging
+import time
+
+import pymysql
+
+from config import get_maintenance_config, get_user_settings
+from db_connection import DatabaseConnection
+from ssms.customer_stats import rebuild_customer_stats
+from ssms.snapshots import MOVEMENT_DELTA
+
+logger = logging.getLogger(__name__)
+
+
+class MaintenanceError(Exception):
+    """Raised when maintenance cannot run"""
+
+
+class MaintenanceEngine:
+    """Runs the selected maintenance jobs table by table on one connection"""
+
+    def __init__(self, analyze=True, optimize=True, check=False, clean_logs=True, rebuild_stats=False,
+                 progress_callback=None):
+        config = get_maintenance_config()
+        self.analyze = analyze
+        self.optimize = optimize
+        self.check = check
+        self.clean_logs = clean_logs
+        self.rebuild_stats = rebuild_stats
+        self.fragmentation_ratio = config['fragmentation_ratio']
+        self.fragmentation_min_bytes = config['fragmentation_min_bytes']
+        self.delete_batch_rows = config['delete_batch_rows']
+        self.progress_callback = progress_callback
+        self._cancelled = False
+
+    def cancel(self):
+        """Stop after the current table"""
+        self._cancelled = True
+
+    def run(self):
+        """Run maintenance and return a report of what was done"""
+        started = time.monotonic()
+        report = {"tables": {}, "fragmentation": [], "indexes": [], "orphans_removed": 0,
+                  "orphans_kept": 0, "audit_rows_removed": 0, "customer_stats": None}
+
+        with DatabaseConnection() as conn:
+            if conn is None:
+                raise MaintenanceError("Database connection failed")
+            with conn.cursor() as cursor:
+                tables = self._table_status(cursor)
+                report["fragmentation"] = [table for table in tables if table['fragmented']]
+
+                steps = len(tables) + 3
+                for step, table in enumerate(tables):
+                    if self._cancelled:
+                        break
+                    self._report(step * 100 // steps, f"Maintaining {table['name']}...")
+                    report["tables"][table['name']] = self._maintain_table(cursor, table)
+
+                if not self._cancelled:
+                    self._report((steps - 3) * 100 // steps, "Removing orphaned stock movements...")
+                    report["orphans_removed"], report["orphans_kept"] = self._clean_orphans(cursor)
+                if self.clean_logs and not self._cancelled:
+                    self._report((steps - 2) * 100 // steps, "Cleaning old audit log entries...")
+                    report["audit_rows_removed"] = self._clean_audit_log(cursor)
+                if self.rebuild_stats and not self._cancelled:
+                    self._report((steps - 1) * 100 // steps, "Rebuilding customer statistics...")
+                    report["customer_stats"] = rebuild_customer_stats(cursor)
+                if not self._cancelled:
+                    self._report((steps - 1) * 100 // steps, "Collecting index usage...")
+                    report["indexes"] = self._index_usage(cursor)
+
+        report["cancelled"] = self._cancelled
+        report["duration_seconds"] = round(time.monotonic() - started, 3)
+        logger.info(f"Database maintenance finished in {report['duration_seconds']}s")
+        self._report(100, "Maintenance completed")
+        return report
+
+    def _table_status(self, cursor):
+        """Size and free space of every base table in the current database"""
+        cursor.execute("""
+            SELECT TABLE_NAME AS name, ENGINE AS engine, TABLE_ROWS AS estimated_rows,
+                   DATA_LENGTH AS data_bytes, INDEX_LENGTH AS index_bytes, DATA_FREE AS free_bytes
+            FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'
+            ORDER BY TABLE_NAME
+        """)
+        tables = cursor.fetchall()
+        for table in tables:
+            used = (table['data_bytes'] or 0) + (table['index_bytes'] or 0)
+            free = table['free_bytes'] or 0
+            table['fragmentation'] = round(free / (used + free), 3) if used + free else 0.0
+            table['fragmented'] = (
+                free >= self.fragmentation_min_bytes and table['fragmentation'] >= self.fragmentation_ratio
+            )
+        return tables
+
+    def _maintain_table(self, cursor, table):
+        """Run the selected jobs on one table and time each of them"""
+        name = table['name']
+        result = {}
+        if self.check:
+            result['check'], result['check_seconds'] = self._admin(cursor, "CHECK TABLE", name)
+            if result['check'] != 'OK' and table['engine'] != 'InnoDB':
+                result['repair'], result['repair_seconds'] = self._admin(cursor, "REPAIR TABLE", name)
+        if self.optimize and table['fragmented']:
+            # InnoDB rebuilds the table and refreshes its statistics as part of OPTIMIZE
+            result['optimize'], result['optimize_seconds'] = self._admin(cursor, "OPTIMIZE TABLE", name)
+        elif self.analyze:
+            result['analyze'], result['analyze_seconds'] = self._admin(cursor, "ANALYZE TABLE", name)
+        return result
+
+    def _admin(self, cursor, statement, name):
+        """Run a table maintenance statement, returning (final message, seconds)"""
+        started = time.monotonic()
+        try:
+            cursor.execute(f"{statement} `{name}`")
+            rows = cursor.fetchall()
+            message = rows[-1]['Msg_text'] if rows else 'OK'
+        except pymysql.Error as e:
+            logger.error(f"{statement} {name} failed: {e}")
+            message = str(e)
+        return message, round(time.monotonic() - started, 3)
+
+    def _clean_orphans(self, cursor):
+        """Delete orphaned stock movements that do not change stock; returns (removed, kept)
+
+        Movements of deleted products go. Movements of a deleted sale or
+        purchase are only deleted per product when they net to zero, such as
+        a purchase and the adjustment that took it back out; the others still
+        account for stock and snapshots, so they are kept and counted.
+        """
+        removed = self._delete_in_batches(cursor, "stock_movements", "product_id NOT IN (SELECT id FROM products)")
+        kept = 0
+        for reference_type, table in (('SALE', 'sales'), ('PURCHASE', 'purchases')):
+            cursor.execute(f"""
+                SELECT reference_id, product_id, {MOVEMENT_DELTA} = 0 AS balanced
+                FROM stock_movements
+                WHERE reference_type = %s AND reference_id IS NOT NULL
+                  AND reference_id NOT IN (SELECT id FROM {table})
+                GROUP BY reference_id, product_id
+            """, (reference_type,))
+            groups = cursor.fetchall()
+            balanced = [(group['reference_id'], group['product_id']) for group in groups if group['balanced']]
+            kept += len(groups) - len(balanced)
+            for start in range(0, len(balanced), self.delete_batch_rows):
+                if self._cancelled:
+                    break
+                batch = balanced[start:start + self.delete_batch_rows]
+                cursor.execute(f"""
+                    DELETE FROM stock_movements
+                    WHERE reference_type = %s AND (reference_id, product_id) IN ({', '.join(['(%s, %s)'] * len(batch))})
+                """, (reference_type, *(value for group in batch for value in group)))
+                removed += cursor.rowcount
+        if removed:
+            logger.info(f"Removed {removed} orphaned stock movements")
+        if kept:
+            logger.warning(f"Kept the movements of {kept} deleted sale or purchase lines that still change stock")
+        return removed, kept
+
+    def _clean_audit_log(self, cursor):
+        """Delete audit log entries older than the configured retention"""
+        retention_days = int(get_user_settings().get('log_retention_days', 365))
+        return self._delete_in_batches(
+            cursor, "audit_log", "created_at < NOW() - INTERVAL %s DAY", (retention_days,)
+        )
+
+    def _delete_in_batches(self, cursor, table, condition, params=()):
+        """Delete matching rows in small batches so locks are held only briefly"""
+        removed = 0
+        while not self._cancelled:
+            cursor.execute(f"DELETE FROM {table} WHERE {condition} LIMIT {self.delete_batch_rows}", params)
+            removed += cursor.rowcount
+            if cursor.rowcount < self.delete_batch_rows:
+                break
+        return removed
+
+    def _index_usage(self, cursor):
+        """Secondary indexes with their cardinality and reads since server start
+
+        Reads come from performance_schema and are None when it is disabled.
+        """
+        cursor.execute("""
+            SELECT TABLE_NAME AS table_name, INDEX_NAME AS index_name,
+                   GROUP_CONCAT(COLUMN_NAME ORDER BY SEQ_IN_INDEX) AS columns,
+                   MAX(CARDINALITY) AS cardinality, MIN(NON_UNIQUE) = 0 AS is_unique
+            FROM information_schema.STATISTICS
+            WHERE TABLE_SCHEMA = DATABASE() AND INDEX_NAME <> 'PRIMARY'
+            GROUP BY TABLE_NAME, INDEX_NAME
+            ORDER BY TABLE_NAME, INDEX_NAME
+        """)
+        indexes = cursor.fetchall()
+
+        reads = {}
+        try:
+            cursor.execute("""
+                SELECT OBJECT_NAME AS table_name, INDEX_NAME AS index_name, COUNT_READ AS read_count
+                FROM performance_schema.table_io_waits_summary_by_index_usage
+                WHERE OBJECT_SCHEMA = DATABASE() AND INDEX_NAME IS NOT NULL
+            """)
+            reads = {(row['table_name'], row['index_name']): row['read_count'] for row in cursor.fetchall()}
+        except pymysql.Error as e:
+            logger.info(f"Index usage statistics unavailable: {e}")
+
+        for index in indexes:
+            index['reads'] = reads.get((index['table_name'], index['index_name'])) if reads else None
+        return indexes
+
+    def _report(self, percent, message):
+        """Forward progress to the caller"""
+        if self.progress_callback:
+            self.progress_callback(percent, message)
+
+
+def format_report(report):
+    """Render a maintenance report as plain text"""
+    lines = ["Tables:"]
+    for name, jobs in report['tables'].items():
+        done = [
+            f"{job} {jobs[job]} ({jobs[job + '_seconds']:.2f}s)"
+            for job in ('check', 'repair', 'optimize', 'analyze') if job in jobs
+        ]
+        lines.append(f"  {name}: {', '.join(done) or 'skipped'}")
+
+    lines.append("")
+    lines.append("Fragmented tables:")
+    for table in report['fragmentation']:
+        lines.append(f"  {table['name']}: {table['fragmentation']:.0%} free "
+                     f"({(table['free_bytes'] or 0) / 1024 / 1024:.1f} MB)")
+    if not report['fragmentation']:
+        lines.append("  none")
+
+    lines.append("")
+    lines.append("Indexes (reads since server start):")
+    for index in report['indexes']:
+        reads = "n/a" if index['reads'] is None else f"{index['reads']:,}"
+        unused = "  <- unused" if index['reads'] == 0 and not index['is_unique'] else ""
+        lines.append(f"  {index['table_name']}.{index['index_name']} ({index['columns']}): "
+                     f"cardinality {index['cardinality']}, reads {reads}{unused}")
+
+    lines.append("")
+    lines.append(f"Orphaned stock movements removed: {report['orphans_removed']}")
+    if report['orphans_kept']:
+        lines.append(f"Deleted sale or purchase lines whose movements still change stock (kept): "
+                     f"{report['orphans_kept']}")
+    lines.append(f"Old audit log entries removed: {report['audit_rows_removed']}")
+    if report['customer_stats']:
+        lines.append(f"Customer statistics: {report['customer_stats']}")
+    lines.append(f"Completed in {report['duration_seconds']:.1f}s"
+                 + (" (cancelled)" if report['cancelled'] else ""))
+    return '\n'.join(lines)
@@ -0,0 +1,143 @@
+"""
+Runtime Metrics for SSMS
+Process, MySQL server and application counters for the System Information dialog
+"""
+
+import logging
+import os
+import shutil
+import threading
+import time
+
+import pymysql
+
+from config import BASE_DIR
+from db_connection import DatabaseConnection
+from ssms.offline_queue import offline_queue
+from ssms.query_stats import query_stats
+from ssms.stock import ledger_stats
+
+logger = logging.getLogger(__name__)
+
+MYSQL_STATUS_VARIABLES = (
+    'Uptime', 'Threads_connected', 'Threads_running', 'Questions', 'Slow_queries',
+    'Innodb_buffer_pool_read_requests', 'Innodb_buffer_pool_reads', 'Aborted_connects',
+)
+
+_sources = {}
+_sources_lock = threading.Lock()
+
+
+def register_source(name, callback):
+    """Publish application counters; callback() must return a flat dict"""
+    with _sources_lock:
+        _sources[name] = callback
+
+
+def app_metrics():
+    """Collect counters from every registered source"""
+    with _sources_lock:
+        sources = dict(_sources)
+    metrics = {}
+    for name, callback in sources.items():
+        try:
+            metrics[name] = callback()
+        except Exception as e:
+            logger.warning(f"Metrics source {name} failed: {e}")
+    return metrics
+
+
+register_source('connections', DatabaseConnection.connection_stats)
+register_source('queries', query_stats.summary)
+register_source('offline_queue', offline_queue.stats)
+register_source('stock_ledger', ledger_stats)
+
+
+class MetricsSampler:
+    """Samples process and server metrics; rates are computed between samples"""
+
+    def __init__(self):
+        self._last_cpu = None
+        self._last_status = None
+        self._page_size = os.sysconf('SC_PAGE_SIZE') if hasattr(os, 'sysconf') else 4096
+
+    def sample(self):
+        """Return a snapshot of all metrics"""
+        return {
+            "process": self.process_metrics(),
+            "disk": self.disk_metrics(),
+            "mysql": self.mysql_metrics(),
+            "app": app_metrics(),
+        }
+
+    def process_metrics(self):
+        """RSS, CPU share and open descriptors of this process
+
+        Read from /proc where available; elsewhere only CPU is reported.
+        """
+        metrics = {"rss_bytes": None, "cpu_percent": None, "open_fds": None, "threads": None}
+        try:
+            with open('/proc/self/statm') as f:
+                metrics["rss_bytes"] = int(f.read().split()[1]) * self._page_size
+            metrics["open_fds"] = len(os.listdir('/proc/self/fd'))
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('Threads:'):
+                        metrics["threads"] = int(line.split()[1])
+        except OSError:
+            metrics["threads"] = threading.active_count()
+
+        times = os.times()
+        now, cpu = time.monotonic(), times.user + times.system
+        if self._last_cpu:
+            elapsed = now - self._last_cpu[0]
+            if elapsed > 0:
+                metrics["cpu_percent"] = round((cpu - self._last_cpu[1]) * 100 / elapsed, 1)
+        self._last_cpu = (now, cpu)
+        return metrics
+
+    def disk_metrics(self):
+        """Usage of the disk holding the application"""
+        usage = shutil.disk_usage(BASE_DIR)
+        return {"total_bytes": usage.total, "used_bytes": usage.used, "free_bytes": usage.free}
+
+    def mysql_metrics(self):
+        """Selected SHOW GLOBAL STATUS values plus derived rates"""
+        try:
+            with DatabaseConnection() as conn:
+                if conn is None:
+                    return None
+                with conn.cursor() as cursor:
+                    cursor.execute(
+                        "SHOW GLOBAL STATUS WHERE Variable_name IN "
+                        f"({', '.join(['%s'] * len(MYSQL_STATUS_VARIABLES))})",
+                        MYSQL_STATUS_VARIABLES
+                    )
+                    status = {row['Variable_name']: int(row['Value']) for row in cursor.fetchall()}
+        except pymysql.Error as e:
+            logger.warning(f"Could not read MySQL status: {e}")
+            return None
+
+        now = time.monotonic()
+        previous = self._last_status
+        self._last_status = (now, status)
+        metrics = {
+            "uptime_seconds": status.get('Uptime', 0),
+            "threads_connected": status.get('Threads_connected', 0),
+            "threads_running": status.get('Threads_running', 0),
+            "slow_queries": status.get('Slow_queries', 0),
+            "aborted_connects": status.get('Aborted_connects', 0),
+        }
+
+        # Rates since the previous sample, or averaged over the server uptime on the first one
+        if previous:
+            elapsed = max(now - previous[0], 1e-6)
+            delta = {name: status.get(name, 0) - previous[1].get(name, 0) for name in status}
+        else:
+            elapsed = max(status.get('Uptime', 1), 1)
+            delta = status
+        metrics["queries_per_second"] = round(delta.get('Questions', 0) / elapsed, 1)
+        requests = delta.get('Innodb_buffer_pool_read_requests', 0)
+        disk_reads = delta.get('Innodb_buffer_pool_reads', 0)
+        metrics["buffer_pool_hit_rate"] = round(1 - disk_reads / requests, 4) if requests else None
+        return metrics
@@ -0,0 +1,360 @@
+"""
+Schema Migrations for SSMS
+Ordered, versioned schema changes for databases created by earlier releases
+"""
+
+import logging
+import time
+
+import pymysql
+
+from db_connection import DatabaseConnection
+from ssms.customer_stats import STATS_TABLE, rebuild_customer_stats
+from ssms.report_schedule import RESULTS_TABLE
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_TABLE = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INT PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        duration_ms INT,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+"""
+
+# Online DDL tried in order on MySQL; None is the server default (may copy the table and block writes)
+COLUMN_ALGORITHMS = ["ALGORITHM=INSTANT", "ALGORITHM=INPLACE, LOCK=NONE", None]
+INDEX_ALGORITHMS = ["ALGORITHM=INPLACE, LOCK=NONE", None]
+# InnoDB builds a FULLTEXT index in place but blocks writes meanwhile
+FULLTEXT_ALGORITHMS = ["ALGORITHM=INPLACE, LOCK=SHARED", None]
+
+# Unknown algorithm, and algorithm or lock level not supported for this change
+UNSUPPORTED_ALGORITHM_ERRORS = (1800, 1845, 1846)
+
+# Serializes runners on MySQL so two tills starting at once do not both migrate
+LOCK_NAME = 'ssms_schema_migrations'
+LOCK_TIMEOUT = 60
+
+BATCH_ROWS = 5000
+
+# (table, id column, name column, referenced table): rows whose id is resolved from the name
+REFERENCE_BACKFILLS = [
+    ('sales', 'product_id', 'product_name', 'products'),
+    ('sales', 'customer_id', 'customer_name', 'customers'),
+    ('purchases', 'product_id', 'product_name', 'products'),
+]
+
+
+class MigrationError(Exception):
+    """Raised when a migration step fails; earlier versions stay applied"""
+
+
+def _id_batches(cursor, table, statement, batch_rows=BATCH_ROWS):
+    """Run statement, which ends in an "id >= %s AND id < %s" filter, over table in id ranges
+
+    Short statements keep row locks brief on a live database. Returns the rows changed.
+    """
+    cursor.execute(f"SELECT MIN(id) AS low, MAX(id) AS high FROM {table}")
+    bounds = cursor.fetchone()
+    if bounds['low'] is None:
+        return 0
+    changed = 0
+    for start in range(bounds['low'], bounds['high'] + 1, batch_rows):
+        changed += cursor.execute(statement, (start, start + batch_rows))
+    return changed
+
+
+def backfill_reference_ids(cursor):
+    """Fill product_id/customer_id on rows saved with only a name
+
+    Names are matched once here; reports and write paths use the ids.
+    """
+    messages = []
+    for table, id_column, name_column, referenced in REFERENCE_BACKFILLS:
+        updated = _id_batches(cursor, table, f"""
+            UPDATE {table}
+            SET {id_column} = (
+                SELECT r.id FROM {referenced} r WHERE r.name = {table}.{name_column}
+                ORDER BY r.id LIMIT 1
+            )
+            WHERE {id_column} IS NULL AND {name_column} IS NOT NULL
+              AND id >= %s AND id < %s
+        """)
+        messages.append(f"linked {updated} {table}.{id_column}")
+    return ", ".join(messages)
+
+
+def backfill_sale_dates(cursor):
+    """Date existing sales by when they were recorded instead of when the column was added"""
+    updated = _id_batches(cursor, 'sales', """
+        UPDATE sales SET sale_date = created_at, updated_at = updated_at
+        WHERE id >= %s AND id < %s
+    """)
+    return f"dated {updated} sales"
+
+
+def split_customer_names(cursor):
+    """Fill first_name/last_name from name: the first word, then the rest"""
+    cursor.execute("SELECT MIN(id) AS low, MAX(id) AS high FROM customers")
+    bounds = cursor.fetchone()
+    if bounds['low'] is None:
+        return "no customers"
+    updated = 0
+    for start in range(bounds['low'], bounds['high'] + 1, BATCH_ROWS):
+        cursor.execute("""
+            SELECT id, name FROM customers
+            WHERE first_name IS NULL AND id >= %s AND id < %s
+        """, (start, start + BATCH_ROWS))
+        rows = []
+        for row in cursor.fetchall():
+            first, _, last = (row['name'] or '').strip().partition(' ')
+            rows.append((first, last.strip(), row['id']))
+        if rows:
+            cursor.executemany("UPDATE customers SET first_name = %s, last_name = %s WHERE id = %s", rows)
+            updated += len(rows)
+    return f"split {updated} customer names"
+
+
+# (version, name, steps), applied in version order; never edit or renumber a released migration.
+# Steps: ('add_index', table, index, columns), ('add_fulltext', table, index, columns),
+# ('add_column', table, column, definition), ('create_table', sql) and ('run', function(cursor) -> summary).
+# Each step checks or tolerates what already exists, so a migration interrupted between DDL statements
+# can simply run again.
+MIGRATIONS = [
+    (1, "Name and report indexes", [
+        ('add_index', 'products', 'idx_name', 'name'),
+        ('add_index', 'customers', 'idx_name', 'name'),
+        ('add_index', 'sales', 'idx_created_product', 'created_at, product_id'),
+    ]),
+    (2, "Link sales and purchases to product and customer ids", [
+        ('run', backfill_reference_ids),
+    ]),
+    (3, "Sale dates", [
+        ('add_column', 'sales', 'sale_date', "TIMESTAMP NULL DEFAULT CURRENT_TIMESTAMP"),
+        ('run', backfill_sale_dates),
+        ('add_index', 'sales', 'idx_sale_date', 'sale_date'),
+    ]),
+    (4, "Purchase batch numbers", [
+        ('add_column', 'purchases', 'batch_number', "VARCHAR(50)"),
+    ]),
+    (5, "Customer first and last names", [
+        ('add_column', 'customers', 'first_name', "VARCHAR(50)"),
+        ('add_column', 'customers', 'last_name', "VARCHAR(50)"),
+        ('run', split_customer_names),
+        ('add_index', 'customers', 'idx_first_last', 'first_name, last_name'),
+    ]),
+    (6, "Purchase demands", [
+        ('create_table', """
+            CREATE TABLE IF NOT EXISTS purchase_demands (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                product_id INT NOT NULL,
+                quantity_demanded INT NOT NULL,
+                priority ENUM('LOW', 'MEDIUM', 'HIGH', 'URGENT') DEFAULT 'MEDIUM',
+                status ENUM('PENDING', 'ORDERED', 'RECEIVED', 'CANCELLED') DEFAULT 'PENDING',
+                reason TEXT,
+                requested_by INT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                INDEX idx_status_product (status, product_id),
+                INDEX idx_updated_at (updated_at),
+                FOREIGN KEY (product_id) REFERENCES products(id) ON DELETE CASCADE,
+                FOREIGN KEY (requested_by) REFERENCES users(id) ON DELETE SET NULL
+            )
+        """),
+    ]),
+    (7, "Supplier purchase index", [
+        ('add_index', 'purchases', 'idx_supplier_date', 'supplier_name, purchase_date'),
+    ]),
+    (8, "Purchase date index", [
+        ('add_index', 'purchases', 'idx_purchase_date', 'purchase_date'),
+    ]),
+    (9, "Customer statistics", [
+        ('add_index', 'sales', 'idx_customer_created', 'customer_id, created_at'),
+        ('create_table', STATS_TABLE),
+        ('run', rebuild_customer_stats),
+    ]),
+    (10, "Product and customer search", [
+        ('add_fulltext', 'products', 'ft_name_description', 'name, description'),
+        ('add_fulltext', 'customers', 'ft_name_email', 'first_name, last_name, email'),
+    ]),
+    (11, "Customer merge candidates", [
+        ('create_table', """
+            CREATE TABLE IF NOT EXISTS customer_merge_candidates (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                customer_id INT NOT NULL,
+                duplicate_id INT NOT NULL,
+                score DECIMAL(4,3) NOT NULL,
+                reasons VARCHAR(255),
+                status ENUM('PENDING', 'MERGED', 'DISMISSED') DEFAULT 'PENDING',
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+                UNIQUE KEY uq_pair (customer_id, duplicate_id),
+                INDEX idx_status_score (status, score)
+            )
+        """),
+    ]),
+    (12, "Scheduled report results", [
+        ('create_table', RESULTS_TABLE),
+    ]),
+    (13, "Incremental backup and snapshot indexes", [
+        ('add_index', 'users', 'idx_updated_at', 'updated_at'),
+        ('add_index', 'customers', 'idx_updated_at', 'updated_at'),
+        ('add_index', 'products', 'idx_updated_at', 'updated_at'),
+        ('add_index', 'sales', 'idx_updated_at', 'updated_at'),
+        ('add_index', 'purchases', 'idx_updated_at', 'updated_at'),
+        ('add_index', 'suppliers', 'idx_updated_at', 'updated_at'),
+        ('add_index', 'settings', 'idx_updated_at', 'updated_at'),
+        ('add_index', 'stock_movements', 'idx_created_at', 'created_at'),
+        ('add_index', 'audit_log', 'idx_created_at', 'created_at'),
+    ]),
+]
+
+
+class MigrationRunner:
+    """Brings a database up to the latest schema version
+
+    Applied versions are recorded in schema_migrations. Columns and indexes
+    are added with online DDL where the server supports it, so tills can keep
+    selling while a large table is altered.
+    """
+
+    def __init__(self, db=None, progress=None, migrations=None):
+        self.db = db or DatabaseConnection()
+        self.progress = progress
+        self.migrations = sorted(migrations or MIGRATIONS, key=lambda migration: migration[0])
+
+    def applied(self):
+        """Applied versions with their name, duration_ms and applied_at"""
+        with self.db as conn:
+            if conn is None:
+                raise MigrationError("Database connection failed")
+            with conn.cursor() as cursor:
+                cursor.execute(MIGRATIONS_TABLE)
+                cursor.execute("SELECT version, name, duration_ms, applied_at FROM schema_migrations")
+                return {row['version']: row for row in cursor.fetchall()}
+
+    def pending(self):
+        """Migrations not yet applied, in the order they will run"""
+        applied = self.applied()
+        return [migration for migration in self.migrations if migration[0] not in applied]
+
+    def current_version(self):
+        return max(self.applied(), default=0)
+
+    def run(self):
+        """Apply every pending migration in order; returns the versions applied"""
+        with self.db as conn:
+            if conn is None:
+                raise MigrationError("Database connection failed")
+            with conn.cursor() as cursor:
+                cursor.execute(MIGRATIONS_TABLE)
+                locked = self._lock(cursor)
+                done = []
+                try:
+                    cursor.execute("SELECT version FROM schema_migrations")
+                    applied = {row['version'] for row in cursor.fetchall()}
+                    for version, name, steps in self.migrations:
+                        if version in applied:
+                            continue
+                        self._apply(cursor, version, name, steps)
+                        done.append(version)
+                finally:
+                    if locked:
+                        cursor.execute("SELECT RELEASE_LOCK(%s)", (LOCK_NAME,))
+                        cursor.fetchall()
+        if not done:
+            self._report("Schema is up to date")
+        return done
+
+    def _lock(self, cursor):
+        if self.db.backend != 'mysql':
+            return False
+        cursor.execute("SELECT GET_LOCK(%s, %s) AS acquired", (LOCK_NAME, LOCK_TIMEOUT))
+        if not cursor.fetchone()['acquired']:
+            raise MigrationError("Another process is migrating the schema; try again shortly")
+        return True
+
+    def _apply(self, cursor, version, name, steps):
+        self._report(f"Migration {version}: {name}")
+        started = time.monotonic()
+        for step in steps:
+            step_started = time.monotonic()
+            try:
+                summary = getattr(self, f"_{step[0]}")(cursor, *step[1:])
+            except pymysql.Error as e:
+                raise MigrationError(f"Migration {version} ({name}) failed at {step[0]} {step[1:3]}: {e}") from e
+            self._report(f"  {summary} in {time.monotonic() - step_started:.2f}s")
+        duration_ms = int((time.monotonic() - started) * 1000)
+        cursor.execute(
+            "INSERT INTO schema_migrations (version, name, duration_ms) VALUES (%s, %s, %s)",
+            (version, name, duration_ms)
+        )
+        self._report(f"Migration {version} applied in {duration_ms / 1000:.2f}s")
+
+    def _columns(self, cursor, table):
+        if self.db.backend == 'sqlite':
+            cursor.execute(f"PRAGMA table_info({table})")
+            return {row['name'] for row in cursor.fetchall()}
+        cursor.execute(f"SHOW COLUMNS FROM {table}")
+        return {row['Field'] for row in cursor.fetchall()}
+
+    def _indexes(self, cursor, table):
+        if self.db.backend == 'sqlite':
+            cursor.execute(f"PRAGMA index_list({table})")
+            # SQLite index names are prefixed with their table, see sqlite_backend.translate
+            return {row['name'][len(table) + 1:] for row in cursor.fetchall()}
+        cursor.execute(f"SHOW INDEX FROM {table}")
+        return {row['Key_name'] for row in cursor.fetchall()}
+
+    def _online_alter(self, cursor, statement, algorithms):
+        """Run an ALTER TABLE with the first algorithm the server accepts; returns how it ran"""
+        if self.db.backend != 'mysql':
+            cursor.execute(statement)
+            return self.db.backend
+        for algorithm in algorithms:
+            if algorithm is None:
+                logger.warning(f"Online DDL unavailable, table locked during: {' '.join(statement.split())}")
+                cursor.execute(statement)
+                return "table copy"
+            try:
+                cursor.execute(f"{statement}, {algorithm}")
+                return algorithm
+            except pymysql.err.MySQLError as e:
+                if e.args[0] not in UNSUPPORTED_ALGORITHM_ERRORS:
+                    raise
+                logger.info(f"{algorithm} not supported here: {e.args[-1]}")
+
+    def _add_column(self, cursor, table, column, definition):
+        if column in self._columns(cursor, table):
+            return f"{table}.{column} already present"
+        how = self._online_alter(cursor, f"ALTER TABLE {table} ADD COLUMN {column} {definition}",
+                                 COLUMN_ALGORITHMS)
+        return f"{table}.{column} added ({how})"
+
+    def _add_index(self, cursor, table, name, columns):
+        if name in self._indexes(cursor, table):
+            return f"{table}.{name} already present"
+        how = self._online_alter(cursor, f"ALTER TABLE {table} ADD INDEX {name} ({columns})", INDEX_ALGORITHMS)
+        return f"{table}.{name} indexed ({how})"
+
+    def _add_fulltext(self, cursor, table, name, columns):
+        if self.db.backend != 'mysql':
+            return f"{table}.{name} skipped, {self.db.backend} searches by scanning"
+        if name in self._indexes(cursor, table):
+            return f"{table}.{name} already present"
+        how = self._online_alter(cursor, f"ALTER TABLE {table} ADD FULLTEXT INDEX {name} ({columns})",
+                                 FULLTEXT_ALGORITHMS)
+        return f"{table}.{name} indexed ({how})"
+
+    def _create_table(self, cursor, sql):
+        cursor.execute(sql)
+        return f"table {sql.split('(')[0].split()[-1]} ready"
+
+    def _run(self, cursor, function):
+        return function(cursor)
+
+    def _report(self, message):
+        logger.info(message)
+        if self.progress:
+            self.progress(message)
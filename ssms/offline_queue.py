@@ -0,0 +1,337 @@
+"""
+Offline Write Queue for SSMS
+Durable local journal for writes made while the database server is unreachable
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+import pymysql
+
+from config import get_offline_config
+from db_connection import DatabaseConnection
+
+logger = logging.getLogger(__name__)
+
+# Returned by DatabaseConnection.execute_write when a write was journaled instead of applied
+QUEUED = 'queued'
+
+# Lock wait timeout and deadlock; 2000+ are client-side connection errors
+RETRYABLE_ERRORS = (1205, 1213)
+
+JOURNAL_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS journal (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        idempotency_key TEXT NOT NULL UNIQUE,
+        query TEXT NOT NULL,
+        params TEXT,
+        statements TEXT,
+        entity TEXT,
+        payload TEXT,
+        queued_at REAL NOT NULL,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        failed INTEGER NOT NULL DEFAULT 0,
+        last_error TEXT
+    )
+"""
+
+
+# Same definition as in database_schema; created on first replay for databases set up before it existed
+OFFLINE_WRITES_TABLE = """
+    CREATE TABLE IF NOT EXISTS offline_writes (
+        idempotency_key VARCHAR(36) PRIMARY KEY,
+        applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_applied_at (applied_at)
+    )
+"""
+
+
+def _encode(value):
+    """JSON encoder for the parameter types the tabs pass to pymysql"""
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat(' ') if isinstance(value, datetime) else value.isoformat()
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    raise TypeError(f"Cannot journal parameter of type {type(value).__name__}")
+
+
+def _is_retryable(error):
+    """True for errors that say nothing about the write itself, only the link to the server"""
+    if isinstance(error, pymysql.err.InterfaceError):
+        return True
+    code = error.args[0] if error.args and isinstance(error.args[0], int) else 0
+    return isinstance(error, pymysql.err.OperationalError) and (code in RETRYABLE_ERRORS or code >= 2000)
+
+
+def _load_params(text):
+    if text is None:
+        return None
+    params = json.loads(text)
+    return tuple(params) if isinstance(params, list) else params
+
+
+class OfflineQueue:
+    """Append-only journal of writes, replayed in order once the server is back
+
+    Every entry carries an idempotency key. Replay records the key in the
+    server's offline_writes table in the same transaction as the write, so an
+    entry that was applied but not yet removed from the journal (a crash
+    between the two) is skipped rather than applied twice.
+    """
+
+    def __init__(self, path=None, flush_batch=None, retry_interval=None):
+        config = get_offline_config()
+        self.path = str(path or config['journal_path'])
+        self.flush_batch = flush_batch or config['flush_batch']
+        self.retry_interval = retry_interval or config['retry_interval']
+        self._journal = None
+        self._lock = threading.RLock()
+        self._flush_lock = threading.Lock()
+        self._replayer = None
+        self._table_ready = False
+        self._wake = threading.Event()
+        self._stats = {'queued': 0, 'replayed': 0, 'duplicates': 0, 'failed': 0, 'last_flush': None}
+
+    def _connection(self):
+        """Open the journal lazily so importing the module never touches disk"""
+        if self._journal is None:
+            self._journal = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._journal.execute("PRAGMA journal_mode = WAL")
+            self._journal.execute("PRAGMA synchronous = FULL")  # an acknowledged sale must survive a power cut
+            self._journal.execute(JOURNAL_SCHEMA)
+            columns = {row[1] for row in self._journal.execute("PRAGMA table_info(journal)")}
+            if 'statements' not in columns:
+                self._journal.execute("ALTER TABLE journal ADD COLUMN statements TEXT")
+        return self._journal
+
+    def _opened(self):
+        """True once the journal is open; a journal left on disk by an earlier run is opened here"""
+        if self._journal is None and not os.path.exists(self.path):
+            return False
+        with self._lock:
+            self._connection()
+        return True
+
+    def resume(self):
+        """Pick up writes journaled before a restart: open the journal and replay what is pending
+
+        Called at startup before any tab can write, so new writes queue behind
+        the old ones instead of overtaking them.
+        """
+        pending = self.pending_count()
+        if pending:
+            logger.warning(f"{pending} offline writes from an earlier session waiting to be replayed")
+            self.start()
+        return pending
+
+    def enqueue(self, query, params=None, entity=None, payload=None, key=None):
+        """Durably journal a write and start the replayer; returns its idempotency key
+
+        query may also be a list of (query, params) pairs that must replay
+        together in one transaction; params is then ignored.
+        """
+        key = key or str(uuid.uuid4())
+        statements = None
+        if isinstance(query, list):
+            statements = json.dumps(query, default=_encode)
+            query, params = query[0][0], None
+        with self._lock:
+            self._connection().execute(
+                "INSERT OR IGNORE INTO journal (idempotency_key, query, params, statements, entity, payload, "
+                "queued_at) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, query, None if params is None else json.dumps(params, default=_encode), statements,
+                 entity, None if payload is None else json.dumps(payload, default=_encode), time.time())
+            )
+            self._stats['queued'] += 1
+        logger.warning(f"Write journaled offline ({entity or 'write'} {key})")
+        self.start()
+        return key
+
+    def pending_count(self):
+        """Entries still waiting to be replayed"""
+        if not self._opened():
+            return 0
+        with self._lock:
+            return self._connection().execute("SELECT COUNT(*) FROM journal WHERE failed = 0").fetchone()[0]
+
+    def has_pending(self):
+        """True while writes are waiting; new writes must queue behind them to keep order"""
+        return self.pending_count() > 0
+
+    def pending(self, entity=None):
+        """Payloads of unreplayed writes, oldest first, for optimistic display"""
+        if not self._opened():
+            return []
+        sql = "SELECT idempotency_key, entity, payload, queued_at FROM journal WHERE failed = 0"
+        args = ()
+        if entity:
+            sql += " AND entity = ?"
+            args = (entity,)
+        with self._lock:
+            rows = self._connection().execute(sql + " ORDER BY seq", args).fetchall()
+        return [
+            {"key": key, "entity": row_entity, "queued_at": datetime.fromtimestamp(queued_at),
+             **(json.loads(payload) if payload else {})}
+            for key, row_entity, payload, queued_at in rows
+        ]
+
+    def failed(self):
+        """Entries the server rejected; kept for inspection instead of blocking the queue"""
+        with self._lock:
+            return [
+                {"key": key, "entity": entity, "query": query, "last_error": error}
+                for key, entity, query, error in self._connection().execute(
+                    "SELECT idempotency_key, entity, query, last_error FROM journal WHERE failed = 1 ORDER BY seq"
+                )
+            ]
+
+    def stats(self):
+        """Counters for the System Information dialog"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats['pending'] = self.pending_count()
+        return stats
+
+    def flush(self):
+        """Replay journaled writes in order, one transaction per batch
+
+        Returns the number of entries applied. Stops quietly while the server
+        is still unreachable; an entry the server rejects is marked failed so
+        it cannot hold up the writes queued behind it.
+        """
+        if not self._opened():
+            return 0
+        with self._flush_lock:
+            applied = 0
+            while True:
+                with self._lock:
+                    batch = self._connection().execute(
+                        "SELECT seq, idempotency_key, query, params, statements, queued_at FROM journal "
+                        "WHERE failed = 0 ORDER BY seq LIMIT ?", (self.flush_batch,)
+                    ).fetchall()
+                if not batch:
+                    break
+                db = DatabaseConnection()
+                with db as conn:
+                    if conn is None:
+                        break
+                    try:
+                        if not self._table_ready:
+                            with conn.cursor() as cursor:
+                                cursor.execute(OFFLINE_WRITES_TABLE)
+                            self._table_ready = True
+                        done = self._apply_batch(db, conn, batch)
+                    except pymysql.Error as e:
+                        logger.warning(f"Offline replay interrupted: {e}")
+                        break
+                applied += done
+            self._stats['last_flush'] = datetime.now().isoformat(timespec='seconds')
+            if applied:
+                logger.info(f"Replayed {applied} offline writes")
+            return applied
+
+    def _apply_batch(self, db, conn, batch):
+        """Apply a batch in one transaction, falling back to one entry at a time on a rejected write"""
+        try:
+            conn.begin()
+            with conn.cursor() as cursor:
+                duplicates = sum(not self._apply(db, cursor, entry) for entry in batch)
+            conn.commit()
+        except pymysql.Error as e:
+            conn.rollback()
+            if _is_retryable(e):
+                raise
+            logger.debug(f"Offline batch rejected, replaying entries singly: {e}")
+            return self._apply_singly(db, conn, batch)
+        self._forget([entry[0] for entry in batch])
+        with self._lock:
+            self._stats['replayed'] += len(batch) - duplicates
+            self._stats['duplicates'] += duplicates
+        return len(batch)
+
+    def _apply_singly(self, db, conn, batch):
+        done = 0
+        for entry in batch:
+            try:
+                conn.begin()
+                with conn.cursor() as cursor:
+                    fresh = self._apply(db, cursor, entry)
+                conn.commit()
+            except pymysql.Error as e:
+                conn.rollback()
+                if _is_retryable(e):
+                    raise
+                self._mark_failed(entry[0], e)
+                continue
+            self._forget([entry[0]])
+            with self._lock:
+                self._stats['replayed' if fresh else 'duplicates'] += 1
+            done += 1
+        return done
+
+    def _apply(self, db, cursor, entry):
+        """Run one journaled write unless its key was already applied; returns False for a duplicate"""
+        seq, key, query, params, statements, queued_at = entry
+        cursor.execute("INSERT IGNORE INTO offline_writes (idempotency_key) VALUES (%s)", (key,))
+        if cursor.rowcount == 0:
+            return False
+        if db.backend == 'mysql':
+            # NOW() in the replayed statement reports when the till took the write
+            cursor.execute("SET TIMESTAMP = %s", (queued_at,))
+        if statements:
+            for statement, statement_params in json.loads(statements):
+                cursor.execute(statement, None if statement_params is None else tuple(statement_params))
+        else:
+            cursor.execute(query, _load_params(params))
+        if db.backend == 'mysql':
+            cursor.execute("SET TIMESTAMP = DEFAULT")
+        return True
+
+    def _forget(self, seqs):
+        with self._lock:
+            self._connection().executemany("DELETE FROM journal WHERE seq = ?", [(seq,) for seq in seqs])
+
+    def _mark_failed(self, seq, error):
+        logger.error(f"Offline write {seq} rejected by the server: {error}")
+        with self._lock:
+            self._connection().execute(
+                "UPDATE journal SET failed = 1, attempts = attempts + 1, last_error = ? WHERE seq = ?",
+                (str(error), seq)
+            )
+            self._stats['failed'] += 1
+
+    def start(self):
+        """Start the background replayer if it is not already running"""
+        with self._lock:
+            if self._replayer is not None:
+                self._wake.set()
+                return
+            self._replayer = threading.Thread(target=self._replay_loop, name="ssms-offline-replay", daemon=True)
+            self._replayer.start()
+
+    def _replay_loop(self):
+        """Retry until the journal is empty, then exit"""
+        while True:
+            self._wake.wait(self.retry_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Offline replay failed: {e}")
+            # Decide under the lock so a write queued meanwhile cannot be stranded
+            with self._lock:
+                if not self.has_pending():
+                    self._replayer = None
+                    return
+
+
+offline_queue = OfflineQueue()
@@ -0,0 +1,223 @@
+"""
+Purchase Reports for SSMS
+Spend, payables aging and price variance reports with a result cache and streaming export
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from db_connection import DatabaseConnection
+from ssms.exporter import export_rows, stream_query
+
+logger = logging.getLogger(__name__)
+
+# Report key -> title
+REPORTS = {
+    'supplier_spend': "Spend by Supplier",
+    'product_spend': "Spend by Product",
+    'payables_aging': "Payables Aging",
+    'price_variance': "Price Variance",
+}
+
+# Aging buckets of unpaid purchases, in days since purchase_date
+AGING_DAYS = (30, 60, 90)
+
+CACHE_SIZE = 32
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+class ReportError(Exception):
+    """Raised for an unknown report or when its query fails"""
+
+
+def _range(start, end):
+    """purchase_date filter for [start, end] that can use idx_purchase_date"""
+    return "purchase_date >= %s AND purchase_date < %s", (start, end + timedelta(days=1))
+
+
+def _supplier_spend(start, end):
+    where, params = _range(start, end)
+    return f"""
+        SELECT supplier_name, COUNT(*) AS orders, SUM(quantity) AS units, SUM(total_amount) AS spend,
+               SUM(unit_price * quantity) * 1.0 / NULLIF(SUM(quantity), 0) AS avg_unit_price,
+               SUM(CASE WHEN payment_status <> 'Paid' THEN total_amount ELSE 0 END) AS outstanding
+        FROM purchases
+        WHERE {where}
+        GROUP BY supplier_name
+        ORDER BY spend DESC
+    """, params, [
+        ('supplier_name', "Supplier"), ('orders', "Orders"), ('units', "Units"), ('spend', "Spend"),
+        ('avg_unit_price', "Avg Unit Price"), ('outstanding', "Outstanding"),
+    ]
+
+
+def _product_spend(start, end):
+    where, params = _range(start, end)
+    return f"""
+        SELECT p.name AS product_name, p.category, t.orders, t.units, t.spend, t.avg_unit_price, t.suppliers
+        FROM (
+            SELECT product_id, COUNT(*) AS orders, SUM(quantity) AS units, SUM(total_amount) AS spend,
+                   SUM(unit_price * quantity) * 1.0 / NULLIF(SUM(quantity), 0) AS avg_unit_price,
+                   COUNT(DISTINCT supplier_name) AS suppliers
+            FROM purchases
+            WHERE {where} AND product_id IS NOT NULL
+            GROUP BY product_id
+        ) t
+        JOIN products p ON p.id = t.product_id
+        ORDER BY t.spend DESC
+    """, params, [
+        ('product_name', "Product"), ('category', "Category"), ('orders', "Orders"), ('units', "Units"),
+        ('spend', "Spend"), ('avg_unit_price', "Avg Unit Price"), ('suppliers', "Suppliers"),
+    ]
+
+
+def _payables_aging(start, end):
+    """Purchases unpaid as of end, by supplier and age; start is ignored and partial payments count in full"""
+    bounds = [end - timedelta(days=days) for days in AGING_DAYS]
+    buckets = ["SUM(CASE WHEN purchase_date > %s THEN total_amount ELSE 0 END)"]
+    params = [bounds[0]]
+    for newer, older in zip(bounds, bounds[1:]):
+        buckets.append("SUM(CASE WHEN purchase_date > %s AND purchase_date <= %s THEN total_amount ELSE 0 END)")
+        params += [older, newer]
+    buckets.append("SUM(CASE WHEN purchase_date <= %s THEN total_amount ELSE 0 END)")
+    params.append(bounds[-1])
+    keys = [f"due_{days}" for days in AGING_DAYS] + [f"due_over_{AGING_DAYS[-1]}"]
+    headers = [f"{low}-{high} Days" for low, high in zip((0,) + tuple(d + 1 for d in AGING_DAYS), AGING_DAYS)]
+    return f"""
+        SELECT supplier_name, COUNT(*) AS orders, SUM(total_amount) AS outstanding,
+               {', '.join(f"{bucket} AS {key}" for bucket, key in zip(buckets, keys))},
+               MIN(purchase_date) AS oldest
+        FROM purchases
+        WHERE purchase_date < %s AND payment_status <> 'Paid'
+        GROUP BY supplier_name
+        ORDER BY outstanding DESC
+    """, (*params, end + timedelta(days=1)), [
+        ('supplier_name', "Supplier"), ('orders', "Unpaid Orders"), ('outstanding', "Outstanding"),
+        *zip(keys, headers + [f"Over {AGING_DAYS[-1]} Days"]), ('oldest', "Oldest"),
+    ]
+
+
+def _price_variance(start, end):
+    """Each product's monthly unit price against its average over the whole range"""
+    where, params = _range(start, end)
+    average = "SUM(unit_price * quantity) * 1.0 / NULLIF(SUM(quantity), 0)"
+    return f"""
+        SELECT p.name AS product_name, m.purchase_year, m.purchase_month, m.units, m.avg_unit_price,
+               a.avg_unit_price AS range_avg_price,
+               (m.avg_unit_price - a.avg_unit_price) * 100.0 / NULLIF(a.avg_unit_price, 0) AS variance_pct
+        FROM (
+            SELECT product_id, YEAR(purchase_date) AS purchase_year, MONTH(purchase_date) AS purchase_month,
+                   SUM(quantity) AS units, {average} AS avg_unit_price
+            FROM purchases
+            WHERE {where} AND product_id IS NOT NULL
+            GROUP BY product_id, YEAR(purchase_date), MONTH(purchase_date)
+        ) m
+        JOIN (
+            SELECT product_id, {average} AS avg_unit_price
+            FROM purchases
+            WHERE {where} AND product_id IS NOT NULL
+            GROUP BY product_id
+        ) a ON a.product_id = m.product_id
+        JOIN products p ON p.id = m.product_id
+        ORDER BY p.name, m.purchase_year, m.purchase_month
+    """, params * 2, [
+        ('product_name', "Product"), ('purchase_year', "Year"), ('purchase_month', "Month"),
+        ('units', "Units"), ('avg_unit_price', "Avg Unit Price"), ('range_avg_price', "Range Avg Price"),
+        ('variance_pct', "Variance %"),
+    ]
+
+
+QUERIES = {
+    'supplier_spend': _supplier_spend,
+    'product_spend': _product_spend,
+    'payables_aging': _payables_aging,
+    'price_variance': _price_variance,
+}
+
+
+class PurchaseReportEngine:
+    """Runs purchase reports over a purchase_date range
+
+    Results are cached per report and range until purchases change: a new,
+    edited or deleted purchase moves the cheap COUNT/MAX fingerprint read
+    before each run, so a repeated month-end report is served from memory.
+    """
+
+    def __init__(self, db=None, progress_callback=None):
+        self.db = db or DatabaseConnection()
+        self.progress_callback = progress_callback
+
+    def query(self, report, start, end):
+        """(sql, params, columns) of a report"""
+        if report not in QUERIES:
+            raise ReportError(f"Unknown report {report}, choose from {', '.join(QUERIES)}")
+        if start > end:
+            raise ReportError("The report period ends before it starts")
+        return QUERIES[report](start, end)
+
+    def run(self, report, start, end):
+        """Report result: title, columns, rows, cached and seconds"""
+        started = time.monotonic()
+        sql, params, columns = self.query(report, start, end)
+        key = (report, start, end, self._fingerprint())
+        with _cache_lock:
+            rows = _cache.get(key)
+            if rows is not None:
+                _cache.move_to_end(key)
+        cached = rows is not None
+        if not cached:
+            self._report(10, f"Running {REPORTS[report]}...")
+            rows = self.db.execute_query(sql, params)
+            if rows is None:
+                raise ReportError(f"{REPORTS[report]} query failed")
+            with _cache_lock:
+                _cache[key] = rows
+                while len(_cache) > CACHE_SIZE:
+                    _cache.popitem(last=False)
+        seconds = time.monotonic() - started
+        logger.info(f"{REPORTS[report]} {start}..{end}: {len(rows)} rows in {seconds:.2f}s"
+                    f"{' (cached)' if cached else ''}")
+        self._report(100, f"{REPORTS[report]} ready")
+        return {"title": REPORTS[report], "columns": columns, "rows": rows, "cached": cached,
+                "seconds": seconds}
+
+    def export(self, report, start, end, path, file_format='csv'):
+        """Write a report to path; returns the rows written
+
+        A cached result is written from memory, otherwise rows are streamed
+        straight from the server into the file.
+        """
+        sql, params, columns = self.query(report, start, end)
+        key = (report, start, end, self._fingerprint())
+        with _cache_lock:
+            rows = _cache.get(key)
+        if rows is None:
+            rows = stream_query(sql, params, db=self.db)
+        self._report(0, f"Exporting {REPORTS[report]}...")
+        count = export_rows(rows, columns, path, file_format,
+                            progress_callback=lambda written: self._report(50, f"{written:,} rows written..."))
+        self._report(100, f"Exported {count:,} rows")
+        return count
+
+    def _fingerprint(self):
+        rows = self.db.execute_query(
+            "SELECT COUNT(*) AS row_count, MAX(id) AS last_id, MAX(updated_at) AS last_update FROM purchases"
+        )
+        if rows is None:
+            raise ReportError("Could not read purchases")
+        return tuple(str(value) for value in rows[0].values())
+
+    def _report(self, percent, message):
+        if self.progress_callback:
+            self.progress_callback(percent, message)
+
+
+def clear_cache():
+    """Drop every cached report result"""
+    with _cache_lock:
+        _cache.clear()
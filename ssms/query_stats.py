@@ -0,0 +1,197 @@
+"""
+Query Statistics for SSMS
+Per-fingerprint latency, row and error counters with a slow-query log
+"""
+
+import json
+import logging
+import re
+import sys
+import threading
+from bisect import bisect_left
+from collections import OrderedDict
+
+from config import get_query_config
+
+slow_logger = logging.getLogger('ssms.slow_query')
+
+# Histogram bucket upper bounds in milliseconds; the last bucket is unbounded
+BUCKETS_MS = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+
+_COMMENTS = re.compile(r'/\*.*?\*/|--[^\n]*', re.S)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"")
+_NUMBERS = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDERS = re.compile(r'%s|%\(\w+\)s')
+_LISTS = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def fingerprint(sql):
+    """Reduce a statement to its shape: literals and placeholders become ?, lists collapse"""
+    text = _COMMENTS.sub(' ', sql)
+    text = _STRINGS.sub('?', text)
+    text = _PLACEHOLDERS.sub('?', text)
+    text = _NUMBERS.sub('?', text)
+    text = _LISTS.sub('(?+)', text)
+    return _SPACES.sub(' ', text).strip()
+
+
+def params_shape(params):
+    """Describe parameters by type only, so values never reach the log"""
+    if params is None:
+        return None
+    if isinstance(params, dict):
+        return {key: type(value).__name__ for key, value in params.items()}
+    if isinstance(params, (list, tuple)):
+        return [type(value).__name__ for value in params]
+    return type(params).__name__
+
+
+def calling_tab():
+    """Name the tab method that issued the query, e.g. 'SalesTab.load_sales_data'"""
+    frame = sys._getframe(1)
+    while frame:
+        module = frame.f_globals.get('__name__', '')
+        # BaseTab.execute_query is only the wrapper every tab goes through
+        if module.startswith('gui.') and module != 'gui.tabs.base_tab':
+            owner = frame.f_locals.get('self')
+            name = frame.f_code.co_name
+            return f"{type(owner).__name__}.{name}" if owner is not None else f"{module}.{name}"
+        frame = frame.f_back
+    return None
+
+
+class StatementStats:
+    """Counters for one statement fingerprint"""
+
+    __slots__ = ('count', 'errors', 'rows', 'total_ms', 'max_ms', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def percentile(self, fraction):
+        """Approximate a latency percentile as the upper bound of its bucket"""
+        target = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= target:
+                return BUCKETS_MS[index] if index < len(BUCKETS_MS) else self.max_ms
+        return 0.0
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "rows": self.rows,
+            "total_ms": round(self.total_ms, 3),
+            "mean_ms": round(self.total_ms / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max_ms, 3),
+            "p50_ms": self.percentile(0.50),
+            "p95_ms": self.percentile(0.95),
+            "p99_ms": self.percentile(0.99),
+            "histogram": dict(zip([f"<={bound}ms" for bound in BUCKETS_MS] + ["slower"], self.buckets)),
+        }
+
+
+class QueryStats:
+    """Process-wide query statistics keyed by fingerprint"""
+
+    def __init__(self):
+        config = get_query_config()
+        self.slow_query_ms = config['slow_query_ms']
+        self.explain_slow_queries = config['explain_slow_queries']
+        self.max_fingerprints = config['max_fingerprints']
+        self._lock = threading.Lock()
+        self._statements = OrderedDict()
+        self._fingerprints = OrderedDict()
+
+    def fingerprint(self, sql):
+        """Fingerprint with a small cache; most callers reuse the same SQL strings"""
+        with self._lock:
+            cached = self._fingerprints.get(sql)
+            if cached is not None:
+                self._fingerprints.move_to_end(sql)
+                return cached
+        cached = fingerprint(sql)
+        with self._lock:
+            self._fingerprints[sql] = cached
+            if len(self._fingerprints) > self.max_fingerprints:
+                self._fingerprints.popitem(last=False)
+        return cached
+
+    def record(self, sql, elapsed_ms, rows=0, error=False):
+        """Record one execution and return its fingerprint"""
+        key = self.fingerprint(sql)
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = StatementStats()
+                if len(self._statements) > self.max_fingerprints:
+                    self._statements.popitem(last=False)
+            stats.count += 1
+            stats.rows += rows
+            stats.total_ms += elapsed_ms
+            stats.max_ms = max(stats.max_ms, elapsed_ms)
+            stats.buckets[bisect_left(BUCKETS_MS, elapsed_ms)] += 1
+            if error:
+                stats.errors += 1
+        return key
+
+    def is_slow(self, elapsed_ms):
+        return self.slow_query_ms is not None and elapsed_ms >= self.slow_query_ms
+
+    def log_slow(self, sql, params, elapsed_ms, cursor=None):
+        """Log a slow statement with its caller and, if enabled, its EXPLAIN plan"""
+        slow_logger.warning(
+            f"Slow query ({elapsed_ms:.1f} ms) from {calling_tab() or 'unknown caller'}: "
+            f"{_SPACES.sub(' ', sql).strip()[:1000]} params={params_shape(params)}"
+        )
+        if self.explain_slow_queries and cursor is not None and sql.lstrip().upper().startswith('SELECT'):
+            try:
+                cursor.execute(f"EXPLAIN {sql}", params)
+                for row in cursor.fetchall():
+                    slow_logger.warning(f"  plan: {row}")
+            except Exception as e:
+                slow_logger.warning(f"  EXPLAIN failed: {e}")
+
+    def snapshot(self):
+        """Per-fingerprint statistics, heaviest total time first"""
+        with self._lock:
+            items = [(key, stats.as_dict()) for key, stats in self._statements.items()]
+        items.sort(key=lambda item: item[1]['total_ms'], reverse=True)
+        return [dict(fingerprint=key, **stats) for key, stats in items]
+
+    def summary(self):
+        """Totals across all statements, for the metrics dialog"""
+        with self._lock:
+            overall = StatementStats()
+            for stats in self._statements.values():
+                overall.count += stats.count
+                overall.errors += stats.errors
+                overall.rows += stats.rows
+                overall.total_ms += stats.total_ms
+                overall.max_ms = max(overall.max_ms, stats.max_ms)
+                overall.buckets = [a + b for a, b in zip(overall.buckets, stats.buckets)]
+            fingerprints = len(self._statements)
+        summary = overall.as_dict()
+        summary["statements"] = fingerprints
+        return summary
+
+    def dump(self, path):
+        """Write the per-fingerprint statistics to a JSON file"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, indent=2)
+        return path
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+
+
+query_stats = QueryStats()
@@ -0,0 +1,256 @@
+"""
+Report Engine for SSMS
+Runs heavy reports - query, post-processing and formatting - in worker processes
+"""
+
+import logging
+import multiprocessing
+import threading
+import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from itertools import accumulate
+
+from config import get_report_config
+from ssms.customer_stats import AVG_ORDER_VALUE
+from ssms.exporter import stream_query
+from ssms.snapshots import SnapshotEngine
+
+logger = logging.getLogger(__name__)
+
+# Row styles a view can colour the status column by
+STYLE_NONE, STYLE_GOOD, STYLE_WARNING, STYLE_BAD, STYLE_CRITICAL, STYLE_MUTED = range(6)
+
+
+class ReportError(Exception):
+    """Raised for an unknown report or when a worker cannot render it"""
+
+
+class PackedColumn:
+    """Display strings of one column joined into a single str, with an array of where each ends
+
+    A million cells cost one string and 8 bytes each instead of a million
+    str objects, and cross the process boundary as two buffers.
+    """
+    __slots__ = ('text', 'ends')
+
+    def __init__(self, values):
+        self.text = ''.join(values)
+        self.ends = array('Q', accumulate(map(len, values)))
+
+    def __len__(self):
+        return len(self.ends)
+
+    def __getitem__(self, row):
+        return self.text[self.ends[row - 1] if row else 0:self.ends[row]]
+
+
+class ReportTable:
+    """A rendered report: headers, one PackedColumn per header and a style code per row"""
+    __slots__ = ('title', 'headers', 'columns', 'styles', 'style_column', 'seconds')
+
+    def __init__(self, title, headers, columns, styles, style_column, seconds):
+        self.title = title
+        self.headers = headers
+        self.columns = columns
+        self.styles = styles
+        self.style_column = style_column
+        self.seconds = seconds
+
+    def __len__(self):
+        return len(self.styles)
+
+    def cell(self, row, column):
+        return self.columns[column][row]
+
+
+def _money(value):
+    return f"PKR {float(value or 0):,.2f}"
+
+
+def _text(value):
+    return "N/A" if value is None or value == '' else str(value)
+
+
+def _sales(start, end, **_):
+    rows = stream_query("""
+        SELECT DATE(created_at) AS sale_day, customer_name, product_name,
+               quantity, total_amount, payment_method
+        FROM sales
+        WHERE created_at >= %s AND created_at < %s
+        ORDER BY created_at DESC
+    """, (start, end + timedelta(days=1)))
+    for sale in rows:
+        yield (str(sale['sale_day']), _text(sale['customer_name']), _text(sale['product_name']),
+               str(sale['quantity']), _money(sale['total_amount']), _text(sale['payment_method'])), STYLE_NONE
+
+
+def _inventory(as_of=None, **_):
+    if as_of:
+        rows = SnapshotEngine().stock_as_of(as_of)
+    else:
+        rows = stream_query("""
+            SELECT name, category, stock_quantity, min_stock_level,
+                   selling_price, (stock_quantity * selling_price) as total_value
+            FROM products
+            ORDER BY name ASC
+        """)
+    for product in rows:
+        stock, min_level = product['stock_quantity'] or 0, product['min_stock_level'] or 0
+        if stock <= 0:
+            status, style = "Out of Stock", STYLE_CRITICAL
+        elif stock <= min_level:
+            status, style = "Low Stock", STYLE_BAD
+        else:
+            status, style = "In Stock", STYLE_GOOD
+        yield (_text(product['name']), _text(product['category']), str(stock), str(min_level),
+               _money(product['selling_price']), _money(product['total_value']), status), style
+
+
+def _customers(**_):
+    rows = stream_query(f"""
+        SELECT CONCAT(c.first_name, ' ', c.last_name) as name, c.email, c.phone, c.customer_type,
+               COALESCE(cs.orders, 0) as total_orders, COALESCE(cs.total_spent, 0) as total_spent,
+               {AVG_ORDER_VALUE} as avg_order_value, cs.last_purchase
+        FROM customers c
+        LEFT JOIN customer_stats cs ON cs.customer_id = c.id
+        ORDER BY total_spent DESC
+    """)
+    for customer in rows:
+        average = customer['avg_order_value']
+        yield (_text(customer['name']), _text(customer['email']), _text(customer['phone']),
+               _text(customer['customer_type']), str(customer['total_orders']), _money(customer['total_spent']),
+               _money(average) if average is not None else "-",
+               str(customer['last_purchase'] or "-")), STYLE_NONE
+
+
+def _product_performance(start, end, **_):
+    # Aggregate on the integer product_id, then look up the names of the result rows
+    rows = stream_query("""
+        SELECT p.name AS product_name, t.units_sold, t.revenue, t.avg_price
+        FROM (
+            SELECT product_id, SUM(quantity) as units_sold,
+                   SUM(total_amount) as revenue, AVG(total_amount/quantity) as avg_price
+            FROM sales
+            WHERE created_at >= %s AND created_at < %s
+            GROUP BY product_id
+        ) t
+        JOIN products p ON p.id = t.product_id
+        ORDER BY t.units_sold DESC
+    """, (start, end + timedelta(days=1)))
+    for rank, product in enumerate(rows, 1):
+        if rank <= 3:
+            performance, style = "Excellent", STYLE_GOOD
+        elif rank <= 6:
+            performance, style = "Good", STYLE_WARNING
+        else:
+            performance, style = "Average", STYLE_MUTED
+        yield (_text(product['product_name']), str(product['units_sold']), _money(product['revenue']),
+               _money(product['avg_price']), f"#{rank}", performance), style
+
+
+def _financials(start, end, **_):
+    rows = stream_query("""
+        SELECT DATE(s.created_at) AS sale_day, COUNT(*) AS sales, SUM(s.total_amount) AS revenue,
+               SUM(s.quantity * p.purchase_price) AS cost
+        FROM sales s
+        JOIN products p ON p.id = s.product_id
+        WHERE s.created_at >= %s AND s.created_at < %s
+        GROUP BY DATE(s.created_at)
+        ORDER BY sale_day DESC
+    """, (start, end + timedelta(days=1)))
+    days = list(rows)
+    totals = {'sale_day': "Total", 'sales': sum(day['sales'] for day in days),
+              'revenue': sum(float(day['revenue'] or 0) for day in days),
+              'cost': sum(float(day['cost'] or 0) for day in days)}
+    for day in [totals] + days:
+        revenue, cost = float(day['revenue'] or 0), float(day['cost'] or 0)
+        margin = (revenue - cost) / revenue * 100 if revenue > 0 else 0
+        yield (str(day['sale_day']), str(day['sales']), _money(revenue), _money(cost), _money(revenue - cost),
+               f"{margin:.1f}%"), STYLE_BAD if revenue < cost else STYLE_NONE
+
+
+def _low_stock(**_):
+    rows = stream_query("""
+        SELECT name, category, stock_quantity, min_stock_level, selling_price
+        FROM products
+        WHERE stock_quantity <= min_stock_level
+        ORDER BY stock_quantity ASC, name ASC
+    """)
+    for product in rows:
+        stock, min_level = product['stock_quantity'] or 0, product['min_stock_level'] or 0
+        status, style = ("Out of Stock", STYLE_CRITICAL) if stock <= 0 else ("Low Stock", STYLE_BAD)
+        yield (_text(product['name']), _text(product['category']), str(stock), str(min_level),
+               str(max(min_level - stock, 0)), _money(product['selling_price']), status), style
+
+
+# Report name -> (renderer(**params) yielding (cells, style), headers, index of the styled column or None)
+REPORTS = {
+    "Sales Report": (_sales, ["Date", "Customer", "Product", "Quantity", "Amount", "Payment"], None),
+    "Inventory Report": (_inventory, ["Product", "Category", "Stock", "Min Level", "Price", "Value", "Status"], 6),
+    "Customer Report": (_customers, ["Customer", "Email", "Phone", "Type", "Total Orders", "Total Spent",
+                                     "Avg Order", "Last Purchase"], None),
+    "Product Performance": (_product_performance, ["Product", "Units Sold", "Revenue", "Avg Price", "Rank",
+                                                   "Performance"], 5),
+    "Financial Summary": (_financials, ["Date", "Sales", "Revenue", "Cost", "Profit", "Margin"], 5),
+    "Low Stock Report": (_low_stock, ["Product", "Category", "Stock", "Min Level", "Shortfall", "Price",
+                                      "Status"], 6),
+}
+
+
+def render_report(report, params):
+    """Run, post-process and format a report into a ReportTable; runs in a worker process"""
+    started = time.monotonic()
+    renderer, headers, style_column = REPORTS[report]
+    columns = [[] for _ in headers]
+    styles = array('B')
+    for cells, style in renderer(**params):
+        for column, cell in zip(columns, cells):
+            column.append(cell)
+        styles.append(style)
+    seconds = time.monotonic() - started
+    logger.info(f"{report}: {len(styles)} rows rendered in {seconds:.2f}s")
+    return ReportTable(report, headers, [PackedColumn(column) for column in columns], styles, style_column,
+                       seconds)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _executor(reset=False):
+    global _pool
+    with _pool_lock:
+        if reset and _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        if _pool is None:
+            # Spawned rather than forked: the GUI submits from a multi-threaded process
+            _pool = ProcessPoolExecutor(max_workers=get_report_config()['workers'],
+                                        mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+
+def submit(report, **params):
+    """Render a report in a worker process; returns a Future of its ReportTable
+
+    Workers are started on first use and kept for later reports.
+    """
+    if report not in REPORTS:
+        raise ReportError(f"Unknown report {report}, choose from {', '.join(REPORTS)}")
+    try:
+        return _executor().submit(render_report, report, params)
+    except BrokenProcessPool:
+        logger.warning("Report workers died, starting new ones")
+        return _executor(reset=True).submit(render_report, report, params)
+
+
+def shutdown():
+    """Stop the report workers"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
@@ -0,0 +1,232 @@
+"""
+Scheduled Reports for SSMS
+Pre-computes the morning reports off-peak into report_results, shared by every terminal
+"""
+
+import json
+import logging
+import threading
+import time
+import zlib
+from array import array
+from datetime import date, datetime, timedelta
+
+from config import get_report_config, get_user_settings
+from db_connection import DatabaseConnection
+from ssms.report_engine import PackedColumn, ReportTable, submit
+
+logger = logging.getLogger(__name__)
+
+RESULTS_TABLE = """
+    CREATE TABLE IF NOT EXISTS report_results (
+        report_key VARCHAR(64) PRIMARY KEY,
+        title VARCHAR(100) NOT NULL,
+        period VARCHAR(100),
+        payload LONGBLOB,
+        row_count INT NOT NULL DEFAULT 0,
+        seconds DECIMAL(8,2),
+        computed_at TIMESTAMP NULL,
+        claimed_at TIMESTAMP NULL,
+        updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+"""
+
+# Same choices as the backup frequency in the Settings tab
+FREQUENCIES = ("Hourly", "Daily", "Weekly", "Monthly")
+
+
+def _yesterday(today):
+    day = today - timedelta(days=1)
+    return {'start': day, 'end': day}
+
+
+def _month_to_date(today):
+    return {'start': today.replace(day=1), 'end': today}
+
+
+# Report key -> (title, report_engine report, params for a given day or None)
+SCHEDULED = {
+    'yesterday_sales': ("Yesterday's Sales", "Sales Report", _yesterday),
+    'month_to_date_financials': ("Month-to-Date Financials", "Financial Summary", _month_to_date),
+    'low_stock': ("Low Stock", "Low Stock Report", None),
+}
+
+
+class ScheduleError(Exception):
+    """Raised for an unknown scheduled report or when its result cannot be read or stored"""
+
+
+def schedule_settings():
+    """(enabled, frequency, hour) from the Settings tab"""
+    settings = get_user_settings()
+    frequency = settings.get('report_frequency', "Daily")
+    if frequency not in FREQUENCIES:
+        frequency = "Daily"
+    return bool(settings.get('auto_reports', True)), frequency, int(settings.get('report_hour', 5))
+
+
+def last_due(now, frequency, hour):
+    """The latest scheduled run at or before now"""
+    if frequency == "Hourly":
+        return now.replace(minute=0, second=0, microsecond=0)
+    due = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if frequency == "Weekly":
+        due -= timedelta(days=due.weekday())
+        if due > now:
+            due -= timedelta(days=7)
+    elif frequency == "Monthly":
+        due = due.replace(day=1)
+        if due > now:
+            due = (due - timedelta(days=1)).replace(day=1)
+    elif due > now:
+        due -= timedelta(days=1)
+    return due
+
+
+def _as_datetime(value):
+    if value is None or isinstance(value, datetime):
+        return value
+    return datetime.fromisoformat(str(value))
+
+
+def _pack(table):
+    """A ReportTable as compressed JSON for the payload column"""
+    data = {
+        'headers': table.headers,
+        'columns': [[column[row] for row in range(len(column))] for column in table.columns],
+        'styles': list(table.styles),
+        'style_column': table.style_column,
+    }
+    return zlib.compress(json.dumps(data, separators=(',', ':')).encode('utf-8'))
+
+
+def _unpack(title, payload, seconds):
+    data = json.loads(zlib.decompress(payload).decode('utf-8'))
+    return ReportTable(title, data['headers'], [PackedColumn(column) for column in data['columns']],
+                       array('B', data['styles']), data['style_column'], seconds)
+
+
+class ReportScheduler:
+    """Keeps the scheduled reports in report_results current
+
+    Every terminal runs the scheduler, but a report is claimed with a
+    conditional UPDATE before it is computed, so only one terminal renders
+    it per run and the others read the stored result.
+    """
+
+    def __init__(self, db=None):
+        self.db = db or DatabaseConnection()
+        self.claim_timeout = get_report_config()['claim_timeout']
+
+    def compute(self, key, today=None):
+        """Render a scheduled report now and store it; returns its row count"""
+        title, report, period = self._spec(key)
+        today = today or date.today()
+        params = period(today) if period else {}
+        self._ensure_row(key, title)
+        try:
+            table = submit(report, **params).result()
+            stored = self.db.execute_query("""
+                UPDATE report_results
+                SET title = %s, period = %s, payload = %s, row_count = %s, seconds = %s, computed_at = %s,
+                    claimed_at = NULL
+                WHERE report_key = %s
+            """, (title, self._describe(params), _pack(table), len(table), round(table.seconds, 2),
+                  datetime.now(), key))
+            if stored is None:
+                raise ScheduleError(f"Could not store {title}")
+        except Exception:
+            # Let the next check, here or on another terminal, try again
+            self._release(key)
+            raise
+        logger.info(f"Pre-computed {title}: {len(table)} rows in {table.seconds:.2f}s")
+        return len(table)
+
+    def run_due(self, now=None):
+        """Compute every report whose last result predates the latest scheduled run; returns the keys computed"""
+        now = now or datetime.now()
+        enabled, frequency, hour = schedule_settings()
+        if not enabled:
+            return []
+        due = last_due(now, frequency, hour)
+        computed = []
+        for key in SCHEDULED:
+            if self._claim(key, now, due):
+                try:
+                    self.compute(key, now.date())
+                    computed.append(key)
+                except Exception as e:
+                    logger.error(f"Scheduled report {key} failed: {e}")
+        return computed
+
+    def load(self, key, now=None):
+        """(ReportTable, info) of a stored result, or (None, info) before its first run
+
+        info holds period, computed_at, stale (computed before the latest
+        scheduled run) and due, the time of that run.
+        """
+        title, _, _ = self._spec(key)
+        rows = self.db.execute_query("""
+            SELECT period, payload, seconds, computed_at FROM report_results WHERE report_key = %s
+        """, (key,))
+        if rows is None:
+            raise ScheduleError(f"Could not read {title}")
+        now = now or datetime.now()
+        _, frequency, hour = schedule_settings()
+        due = last_due(now, frequency, hour)
+        if not rows or rows[0]['payload'] is None:
+            return None, {'period': None, 'computed_at': None, 'stale': True, 'due': due}
+        row = rows[0]
+        computed_at = _as_datetime(row['computed_at'])
+        table = _unpack(title, bytes(row['payload']), float(row['seconds'] or 0))
+        return table, {'period': row['period'], 'computed_at': computed_at, 'stale': computed_at < due,
+                       'due': due}
+
+    def _claim(self, key, now, due):
+        self._ensure_row(key, self._spec(key)[0])
+        claimed = self.db.execute_query("""
+            UPDATE report_results SET claimed_at = %s
+            WHERE report_key = %s AND (computed_at IS NULL OR computed_at < %s)
+              AND (claimed_at IS NULL OR claimed_at < %s)
+        """, (now, key, due, now - timedelta(seconds=self.claim_timeout)))
+        return claimed == 1
+
+    def _release(self, key):
+        self.db.execute_query("UPDATE report_results SET claimed_at = NULL WHERE report_key = %s", (key,))
+
+    def _ensure_row(self, key, title):
+        self.db.execute_query("""
+            INSERT INTO report_results (report_key, title) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE title = VALUES(title)
+        """, (key, title))
+
+    @staticmethod
+    def _spec(key):
+        if key not in SCHEDULED:
+            raise ScheduleError(f"Unknown scheduled report {key}, choose from {', '.join(SCHEDULED)}")
+        return SCHEDULED[key]
+
+    @staticmethod
+    def _describe(params):
+        if not params:
+            return "Current stock"
+        if params['start'] == params['end']:
+            return str(params['start'])
+        return f"{params['start']} to {params['end']}"
+
+
+def start_report_scheduler():
+    """Pre-compute due reports from a background thread for the life of the process"""
+    interval = get_report_config()['schedule_interval']
+
+    def loop():
+        while True:
+            try:
+                ReportScheduler().run_due()
+            except Exception as e:
+                logger.error(f"Report scheduler failed: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="ssms-report-scheduler", daemon=True)
+    thread.start()
+    return thread
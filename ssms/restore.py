@@ -0,0 +1,417 @@
+"""
+Bulk Restore Engine for SSMS
+Reloads chunked backups in parallel, in foreign-key dependency order, into staging tables
+that replace the live ones only once everything has loaded
+"""
+
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from config import SETTINGS_FILE, get_backup_config
+from database_schema import create_tombstone_triggers
+from db_connection import DatabaseConnection
+from ssms.backup import load_backup_chain
+
+logger = logging.getLogger(__name__)
+
+REFERENCE_PATTERN = re.compile(r"REFERENCES `([^`]+)`")
+SECONDARY_KEY_PATTERN = re.compile(r"^(?:UNIQUE |FULLTEXT |SPATIAL )?KEY ")
+CONSTRAINT_NAME_PATTERN = re.compile(r"CONSTRAINT `[^`]+` ")
+
+# Tables are loaded as STAGING_PREFIX + name and the live ones renamed to RETIRED_PREFIX + name in the swap
+STAGING_PREFIX = "_restore_"
+RETIRED_PREFIX = "_retired_"
+
+
+class RestoreError(Exception):
+    """Raised when a restore cannot be completed"""
+
+
+def split_create_sql(create_sql):
+    """Split SHOW CREATE TABLE output into (DDL without secondary keys, deferred keys)
+
+    Foreign key constraints stay in the DDL; InnoDB gives them an implicit
+    index that is dropped again once the deferred key covering the same
+    columns is added.
+    """
+    lines = create_sql.strip().split('\n')
+    head, body, tail = lines[0], lines[1:-1], lines[-1]
+    kept, deferred = [], []
+    for line in body:
+        definition = line.strip().rstrip(',')
+        if SECONDARY_KEY_PATTERN.match(definition):
+            deferred.append(definition)
+        else:
+            kept.append(f"  {definition}")
+    return '\n'.join([head, ',\n'.join(kept), tail]), deferred
+
+
+def staging_sql(create_sql, names):
+    """Point a CREATE TABLE at the staging copy of the table, and its foreign keys at staged parents
+
+    Constraint names are unique per schema, so they are dropped and InnoDB
+    generates them from the staging table name; renaming the table in the
+    swap renames them with it.
+    """
+    create_sql = re.sub(r"^CREATE TABLE `([^`]+)`", lambda m: f"CREATE TABLE `{STAGING_PREFIX}{m.group(1)}`",
+                        create_sql.strip())
+    create_sql = CONSTRAINT_NAME_PATTERN.sub("", create_sql)
+    return REFERENCE_PATTERN.sub(
+        lambda m: f"REFERENCES `{STAGING_PREFIX + m.group(1) if m.group(1) in names else m.group(1)}`",
+        create_sql
+    )
+
+
+def decode_row(row):
+    """Reverse the JSON encoding applied by the backup engine"""
+    return [
+        base64.b64decode(value['$b64']) if isinstance(value, dict) else value
+        for value in row
+    ]
+
+
+class RestoreEngine:
+    """Parallel bulk restore of a backup chain
+
+    The chain is loaded into staging tables next to the live ones, which
+    needs room for a second copy of the data. The live tables are swapped
+    out in one RENAME TABLE at the end, so a cancelled or failed restore
+    leaves the current data untouched.
+    """
+
+    def __init__(self, backup_dir, workers=None, batch_rows=1000, restore_files=False,
+                 progress_callback=None):
+        self.backup_dir = backup_dir
+        self.workers = workers or get_backup_config()['workers']
+        self.batch_rows = batch_rows
+        self.restore_files = restore_files
+        self.progress_callback = progress_callback
+
+        self._cancelled = threading.Event()
+        self._progress_lock = threading.Lock()
+        self._rows_done = 0
+        self._rows_expected = 1
+        self._staged = set()
+
+    def cancel(self):
+        """Ask running workers to stop after their current chunk"""
+        self._cancelled.set()
+
+    def verify(self):
+        """Check every chunk in the chain against its manifest checksum without loading"""
+        chain = load_backup_chain(self.backup_dir)
+        checked = 0
+        for backup_dir, manifest in chain:
+            for entry in manifest['tables'].values():
+                for chunk in entry['chunks']:
+                    for _ in self._read_chunk(backup_dir, chunk):
+                        pass
+                    checked += 1
+        return checked
+
+    def run(self):
+        """Restore the backup chain and return a summary of what was loaded"""
+        started = time.monotonic()
+        chain = load_backup_chain(self.backup_dir)
+        base_dir, base = chain[0]
+        self._rows_expected = max(
+            sum(entry['rows'] for _, manifest in chain for entry in manifest['tables'].values()), 1
+        )
+
+        summary = {"backups": [manifest['name'] for _, manifest in chain], "tables": {}}
+        tables = base['tables']
+        self._staged = set(tables).union(*(manifest['tables'] for _, manifest in chain[1:]))
+        deferred_keys = self._recreate_tables(tables)
+
+        try:
+            self._report(0, f"Loading {base['name']}...")
+            self._run_in_dependency_order(
+                tables,
+                lambda name: self._load_table(base_dir, name, tables[name], summary)
+            )
+
+            self._report(self._percent(), "Building indexes...")
+            self._run_in_dependency_order(
+                {name: tables[name] for name in deferred_keys if deferred_keys[name]},
+                lambda name: self._add_keys(name, deferred_keys[name], summary)
+            )
+
+            for backup_dir, manifest in chain[1:]:
+                self._apply_increment(backup_dir, manifest, summary)
+
+            if len(chain) == 1:
+                self._check_row_counts(tables)
+            if self._cancelled.is_set():
+                raise RestoreError("Restore cancelled")
+        except BaseException:
+            self._drop_tables(STAGING_PREFIX)
+            raise
+
+        # Past this point the restore is no longer cancellable
+        self._swap_tables()
+        if 'deleted_rows' in tables:
+            if not create_tombstone_triggers(DatabaseConnection()):
+                raise RestoreError("Data restored, but the tombstone triggers could not be recreated, so incremental "
+                                   "backups would miss deletions; see the log and run database_schema.py")
+        if self.restore_files:
+            self._restore_settings(chain[-1][0])
+
+        summary["duration_seconds"] = round(time.monotonic() - started, 3)
+        logger.info(f"Restored {summary['backups'][-1]} in {summary['duration_seconds']}s")
+        self._report(100, "Restore completed")
+        return summary
+
+    def _recreate_tables(self, tables):
+        """Create empty staging tables without their secondary keys, clearing any left by an earlier run"""
+        self._report(0, "Creating staging tables...")
+        self._drop_tables(STAGING_PREFIX)
+        self._drop_tables(RETIRED_PREFIX)
+        deferred_keys = {}
+        with DatabaseConnection() as conn:
+            if conn is None:
+                raise RestoreError("Database connection failed")
+            with conn.cursor() as cursor:
+                cursor.execute("SET SESSION foreign_key_checks = 0")
+                for name, entry in tables.items():
+                    create_sql, keys = split_create_sql(entry['create_sql'])
+                    cursor.execute(staging_sql(create_sql, self._staged))
+                    deferred_keys[name] = keys
+        return deferred_keys
+
+    def _swap_tables(self):
+        """Replace the live tables with the staged ones in a single RENAME TABLE, then drop the old ones"""
+        self._report(99, "Replacing the current data...")
+        with DatabaseConnection() as conn:
+            if conn is None:
+                raise RestoreError("Database connection failed")
+            with conn.cursor() as cursor:
+                cursor.execute("SET SESSION foreign_key_checks = 0")
+                live = self._existing_tables(cursor, self._staged)
+                renames = [f"`{name}` TO `{RETIRED_PREFIX}{name}`" for name in sorted(live)]
+                renames += [f"`{STAGING_PREFIX}{name}` TO `{name}`" for name in sorted(self._staged)]
+                cursor.execute(f"RENAME TABLE {', '.join(renames)}")
+        self._drop_tables(RETIRED_PREFIX)
+
+    def _drop_tables(self, prefix):
+        """Drop the staging or retired copy of every restored table"""
+        with DatabaseConnection() as conn:
+            if conn is None:
+                raise RestoreError("Database connection failed")
+            with conn.cursor() as cursor:
+                cursor.execute("SET SESSION foreign_key_checks = 0")
+                for name in self._existing_tables(cursor, [prefix + name for name in self._staged]):
+                    cursor.execute(f"DROP TABLE IF EXISTS `{name}`")
+
+    @staticmethod
+    def _existing_tables(cursor, names):
+        cursor.execute("""
+            SELECT TABLE_NAME AS name FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE'
+        """)
+        return set(names) & {row['name'] for row in cursor.fetchall()}
+
+    def _run_in_dependency_order(self, tables, task):
+        """Run task(name) for each table in parallel, parents before children"""
+        names = set(tables)
+        pending = {
+            name: set(REFERENCE_PATTERN.findall(entry['create_sql'])) & names - {name}
+            for name, entry in tables.items()
+        }
+        done = set()
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='restore') as pool:
+            try:
+                while pending or running:
+                    ready = [name for name, parents in pending.items() if parents <= done]
+                    if not ready and not running:
+                        # Circular references: checks are off, so order no longer matters
+                        ready = list(pending)
+                    for name in ready:
+                        del pending[name]
+                        running[pool.submit(task, name)] = name
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        name = running.pop(future)
+                        future.result()
+                        done.add(name)
+            except BaseException:
+                self._cancelled.set()
+                raise
+
+    def _load_table(self, backup_dir, name, entry, summary, upsert=False):
+        """Load every chunk of one table, one transaction per chunk"""
+        started = time.monotonic()
+        columns = entry['columns']
+        column_sql = ', '.join(f"`{column}`" for column in columns)
+        placeholders = ', '.join(['%s'] * len(columns))
+        sql = f"INSERT INTO `{STAGING_PREFIX}{name}` ({column_sql}) VALUES ({placeholders})"
+        if upsert:
+            updates = ', '.join(
+                f"`{column}` = VALUES(`{column}`)" for column in columns
+                if column != entry['primary_key']
+            )
+            sql += f" ON DUPLICATE KEY UPDATE {updates or f'`{columns[0]}` = `{columns[0]}`'}"
+
+        loaded = 0
+        with DatabaseConnection() as conn:
+            if conn is None:
+                raise RestoreError("Database connection failed")
+            self._prepare_session(conn, unique_checks=upsert)
+            with conn.cursor() as cursor:
+                if entry.get('mode') == 'full' and upsert:
+                    cursor.execute(f"DELETE FROM `{STAGING_PREFIX}{name}`")
+                for chunk in entry['chunks']:
+                    if self._cancelled.is_set():
+                        raise RestoreError("Restore cancelled")
+                    conn.begin()
+                    try:
+                        for rows in self._read_chunk(backup_dir, chunk):
+                            # executemany folds these into multi-row INSERT statements
+                            cursor.executemany(sql, rows)
+                        conn.commit()
+                    except BaseException:
+                        conn.rollback()
+                        raise
+                    loaded += chunk['rows']
+                    self._advance(chunk['rows'], f"Restoring {name}... {loaded:,} rows")
+
+        result = summary["tables"].setdefault(name, {"rows": 0, "chunks": 0, "seconds": 0.0})
+        result["rows"] += loaded
+        result["chunks"] += len(entry['chunks'])
+        result["seconds"] = round(result["seconds"] + time.monotonic() - started, 3)
+
+    def _read_chunk(self, backup_dir, chunk):
+        """Stream a chunk file in batches, verifying its checksum at the end"""
+        path = os.path.join(backup_dir, chunk['file'])
+        opener = gzip.open if path.endswith('.gz') else open
+        digest = hashlib.sha256()
+        count = 0
+        batch = []
+        with opener(path, 'rb') as f:
+            for line in f:
+                digest.update(line)
+                batch.append(decode_row(json.loads(line)))
+                if len(batch) >= self.batch_rows:
+                    count += len(batch)
+                    yield batch
+                    batch = []
+        if batch:
+            count += len(batch)
+            yield batch
+        if digest.hexdigest() != chunk['sha256'] or count != chunk['rows']:
+            raise RestoreError(f"Checksum mismatch in {chunk['file']}, backup is corrupt")
+
+    def _add_keys(self, name, keys, summary):
+        """Build all deferred secondary keys of a table in one ALTER"""
+        started = time.monotonic()
+        self._report(self._percent(), f"Building indexes for {name}...")
+        with DatabaseConnection() as conn:
+            if conn is None:
+                raise RestoreError("Database connection failed")
+            with conn.cursor() as cursor:
+                cursor.execute(f"ALTER TABLE `{STAGING_PREFIX}{name}` {', '.join('ADD ' + key for key in keys)}")
+        result = summary["tables"].setdefault(name, {"rows": 0, "chunks": 0, "seconds": 0.0})
+        result["index_seconds"] = round(time.monotonic() - started, 3)
+
+    def _apply_increment(self, backup_dir, manifest, summary):
+        """Upsert changed rows from an incremental backup, then replay its deletions"""
+        self._report(self._percent(), f"Applying {manifest['name']}...")
+        tables = manifest['tables']
+        with DatabaseConnection() as conn:
+            if conn is None:
+                raise RestoreError("Database connection failed")
+            with conn.cursor() as cursor:
+                cursor.execute("SET SESSION foreign_key_checks = 0")
+                for name, entry in tables.items():
+                    create_sql = staging_sql(entry['create_sql'], self._staged)
+                    cursor.execute(f"CREATE TABLE IF NOT EXISTS {create_sql.split(' ', 2)[2]}")
+
+        self._run_in_dependency_order(
+            tables,
+            lambda name: self._load_table(backup_dir, name, tables[name], summary, upsert=True)
+        )
+
+        tombstones = tables.get('deleted_rows')
+        if not tombstones:
+            return
+        deletes = {}
+        table_index = tombstones['columns'].index('table_name')
+        row_index = tombstones['columns'].index('row_id')
+        for chunk in tombstones['chunks']:
+            for rows in self._read_chunk(backup_dir, chunk):
+                for row in rows:
+                    deletes.setdefault(row[table_index], set()).add(row[row_index])
+
+        # Foreign key checks stay on so cascades match the live database
+        with DatabaseConnection() as conn:
+            if conn is None:
+                raise RestoreError("Database connection failed")
+            with conn.cursor() as cursor:
+                for name, row_ids in deletes.items():
+                    if name not in self._staged:
+                        continue
+                    row_ids = sorted(row_ids)
+                    for start in range(0, len(row_ids), self.batch_rows):
+                        batch = row_ids[start:start + self.batch_rows]
+                        cursor.execute(
+                            f"DELETE FROM `{STAGING_PREFIX}{name}` WHERE id IN ({', '.join(['%s'] * len(batch))})",
+                            batch
+                        )
+
+    def _check_row_counts(self, tables):
+        """Compare loaded row counts against the manifest"""
+        self._report(99, "Verifying row counts...")
+        with DatabaseConnection() as conn:
+            if conn is None:
+                raise RestoreError("Database connection failed")
+            with conn.cursor() as cursor:
+                for name, entry in tables.items():
+                    cursor.execute(f"SELECT COUNT(*) AS row_count FROM `{STAGING_PREFIX}{name}`")
+                    count = cursor.fetchone()['row_count']
+                    if count != entry['rows']:
+                        raise RestoreError(
+                            f"Row count mismatch in {name}: expected {entry['rows']}, found {count}"
+                        )
+
+    def _restore_settings(self, backup_dir):
+        """Put the backed-up settings file back in place"""
+        source = os.path.join(backup_dir, 'files', os.path.basename(SETTINGS_FILE))
+        if os.path.isfile(source):
+            shutil.copy2(source, SETTINGS_FILE)
+
+    def _prepare_session(self, conn, unique_checks=False):
+        """Defer constraint checking for bulk loading
+
+        Unique checks are only skipped when loading into freshly created
+        tables; upserts rely on them to find the rows they replace.
+        """
+        with conn.cursor() as cursor:
+            cursor.execute("SET SESSION foreign_key_checks = 0")
+            if not unique_checks:
+                cursor.execute("SET SESSION unique_checks = 0")
+
+    def _percent(self):
+        """Overall progress, leaving room for the final verification"""
+        return min(98, self._rows_done * 100 // self._rows_expected)
+
+    def _advance(self, rows, message):
+        """Record finished rows and report overall progress"""
+        with self._progress_lock:
+            self._rows_done += rows
+            percent = self._percent()
+        self._report(percent, message)
+
+    def _report(self, percent, message):
+        """Forward progress to the caller"""
+        if self.progress_callback:
+            self.progress_callback(percent, message)
@@ -0,0 +1,232 @@
+"""
+Product and Customer Search for SSMS
+FULLTEXT search on the server and an in-memory prefix index for as-you-type suggestions
+"""
+
+import heapq
+import logging
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from config import get_search_config
+from db_connection import DatabaseConnection
+
+logger = logging.getLogger(__name__)
+
+# Entity -> label expression, columns tokenized into the prefix index and FULLTEXT columns (migration 10)
+ENTITIES = {
+    'products': {
+        'label': "name",
+        'tokens': ('name', 'sku', 'category'),
+        'fulltext': ('name', 'description'),
+    },
+    'customers': {
+        'label': "CONCAT(first_name, ' ', last_name)",
+        'tokens': ('first_name', 'last_name', 'email', 'phone'),
+        'fulltext': ('first_name', 'last_name', 'email'),
+    },
+}
+
+# Changes above this share of the index re-sort it instead of inserting pair by pair
+RESORT_RATIO = 0.1
+
+_WORD = re.compile(r"[^\W_]+")
+
+
+class SearchError(Exception):
+    """Raised for an unknown entity or when rows cannot be read"""
+
+
+def _spec(entity):
+    if entity not in ENTITIES:
+        raise SearchError(f"Unknown search entity {entity}, choose from {', '.join(ENTITIES)}")
+    return ENTITIES[entity]
+
+
+def tokenize(row, columns):
+    """Lower-case words of each column, plus whole values such as emails, SKUs and phone digits"""
+    tokens = set()
+    for column in columns:
+        value = str(row[column] or '').lower().strip()
+        if not value:
+            continue
+        tokens.update(_WORD.findall(value))
+        tokens.add(''.join(value.split()))
+        digits = re.sub(r"\D", "", value)
+        if len(digits) >= 4:
+            tokens.add(digits)
+    tokens.discard('')
+    return tokens
+
+
+class PrefixIndex:
+    """Sorted (token, id) pairs of one table; every prefix lookup is a bisect
+
+    The first refresh reads the whole table. Later ones read only rows whose
+    updated_at moved and the deletions tombstoned in deleted_rows since, so
+    keeping 100k products current costs a couple of indexed queries.
+    """
+
+    def __init__(self, entity, db=None):
+        self.entity = entity
+        self.spec = _spec(entity)
+        self.db = db or DatabaseConnection()
+        self.loaded = False
+        self.refreshed_at = None
+        self._pairs = []
+        self._tokens = {}
+        self._labels = {}
+        self._since = None
+        self._last_tombstone = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._labels)
+
+    def refresh(self):
+        """Pick up rows changed or deleted since the last refresh; returns the rows applied"""
+        started = time.monotonic()
+        tombstones = self.db.execute_query(
+            "SELECT id, row_id FROM deleted_rows WHERE table_name = %s AND id > %s ORDER BY id",
+            (self.entity, self._last_tombstone)
+        )
+        columns = ', '.join(self.spec['tokens'])
+        query = f"SELECT id, {self.spec['label']} AS label, updated_at, {columns} FROM {self.entity}"
+        if self.loaded:
+            # Rows stamped in the same second as the last refresh are read again, which is harmless
+            rows = self.db.execute_query(f"{query} WHERE updated_at >= %s", (self._since,))
+        else:
+            rows = self.db.execute_query(query)
+        if rows is None or tombstones is None:
+            raise SearchError(f"Could not read {self.entity}")
+
+        with self._lock:
+            deleted = {row['row_id'] for row in tombstones}
+            changed = {}
+            for row in rows:
+                changed[row['id']] = (row['label'] or '', tokenize(row, self.spec['tokens']))
+            self._apply(changed, deleted - changed.keys())
+            if tombstones:
+                self._last_tombstone = tombstones[-1]['id']
+            stamps = [row['updated_at'] for row in rows if row['updated_at'] is not None]
+            if stamps:
+                self._since = max(stamps + ([self._since] if self._since is not None else []))
+            self.loaded = True
+            self.refreshed_at = time.monotonic()
+        logger.debug(f"{self.entity} search index: {len(rows)} rows and {len(deleted)} deletions applied "
+                     f"in {time.monotonic() - started:.2f}s")
+        return len(rows) + len(deleted)
+
+    def _apply(self, changed, deleted):
+        stale = []
+        fresh = []
+        for row_id in deleted:
+            stale += [(token, row_id) for token in self._tokens.pop(row_id, ())]
+            self._labels.pop(row_id, None)
+        for row_id, (label, tokens) in changed.items():
+            old = self._tokens.get(row_id, set())
+            stale += [(token, row_id) for token in old - tokens]
+            fresh += [(token, row_id) for token in tokens - old]
+            self._tokens[row_id] = tokens
+            self._labels[row_id] = label
+        if len(stale) + len(fresh) > len(self._pairs) * RESORT_RATIO:
+            stale = set(stale)
+            self._pairs = sorted([pair for pair in self._pairs if pair not in stale] + fresh)
+            return
+        for pair in stale:
+            position = bisect_left(self._pairs, pair)
+            if position < len(self._pairs) and self._pairs[position] == pair:
+                del self._pairs[position]
+        for pair in fresh:
+            insort(self._pairs, pair)
+
+    def _prefixed(self, prefix):
+        ids = set()
+        position = bisect_left(self._pairs, (prefix,))
+        while position < len(self._pairs) and self._pairs[position][0].startswith(prefix):
+            ids.add(self._pairs[position][1])
+            position += 1
+        return ids
+
+    def search(self, text, limit=None):
+        """Ids of rows with a token starting with every word of text, in label order"""
+        words = text.lower().split()
+        if not words:
+            return []
+        limit = limit or get_search_config()['result_limit']
+        with self._lock:
+            words.sort(key=len, reverse=True)
+            ids = self._prefixed(words[0])
+            for word in words[1:]:
+                if not ids:
+                    break
+                ids &= self._prefixed(word)
+            return heapq.nsmallest(limit, ids, key=lambda row_id: (self._labels[row_id].lower(), row_id))
+
+    def suggest(self, text, limit=None):
+        """Labels to offer while text is being typed"""
+        limit = limit or get_search_config()['suggestions']
+        ids = self.search(text, limit)
+        with self._lock:
+            return [self._labels[row_id] for row_id in ids if row_id in self._labels]
+
+
+def fulltext_search(entity, text, limit=None, db=None):
+    """Ids of rows matching every word of text in the FULLTEXT columns, best match first
+
+    Words match as prefixes. SQLite has no FULLTEXT index and scans with LIKE.
+    """
+    spec = _spec(entity)
+    words = _WORD.findall(text.lower())
+    if not words:
+        return []
+    limit = limit or get_search_config()['result_limit']
+    db = db or DatabaseConnection()
+    columns = ', '.join(spec['fulltext'])
+    if db.backend == 'mysql':
+        against = ' '.join(f"+{word}*" for word in words)
+        rows = db.execute_query(f"""
+            SELECT id, MATCH({columns}) AGAINST (%s IN BOOLEAN MODE) AS score
+            FROM {entity}
+            WHERE MATCH({columns}) AGAINST (%s IN BOOLEAN MODE)
+            ORDER BY score DESC
+            LIMIT %s
+        """, (against, against, limit))
+    else:
+        matches = ' OR '.join(f"{column} LIKE %s" for column in spec['fulltext'])
+        conditions = ' AND '.join(f"({matches})" for _ in words)
+        params = [f"%{word}%" for word in words for _ in spec['fulltext']]
+        rows = db.execute_query(f"SELECT id FROM {entity} WHERE {conditions} LIMIT %s", (*params, limit))
+    if rows is None:
+        raise SearchError(f"Could not search {entity}")
+    return [row['id'] for row in rows]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_index(entity):
+    """The shared prefix index of an entity; empty until its first refresh"""
+    _spec(entity)
+    with _indexes_lock:
+        if entity not in _indexes:
+            _indexes[entity] = PrefixIndex(entity)
+        return _indexes[entity]
+
+
+def search(entity, text, limit=None):
+    """Ids for a search box: prefix matches from the index, then FULLTEXT matches
+
+    FULLTEXT finds words inside descriptions that the prefix index does not
+    hold; it is only asked for what the index could not fill.
+    """
+    limit = limit or get_search_config()['result_limit']
+    index = get_index(entity)
+    ids = index.search(text, limit) if index.loaded else []
+    if len(ids) < limit:
+        found = set(ids)
+        ids += [row_id for row_id in fulltext_search(entity, text, limit) if row_id not in found][:limit - len(ids)]
+    return ids
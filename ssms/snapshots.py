@@ -0,0 +1,183 @@
+"""
+Stock Snapshots for SSMS
+Periodic per-product stock levels for fast point-in-time inventory queries
+"""
+
+import logging
+import threading
+import time
+from datetime import date, timedelta
+
+from config import get_snapshot_config
+from db_connection import DatabaseConnection
+
+logger = logging.getLogger(__name__)
+
+# Net effect of a movement on stock; ADJUSTMENT quantities are signed
+MOVEMENT_DELTA = "SUM(CASE movement_type WHEN 'OUT' THEN -quantity ELSE quantity END)"
+
+
+class SnapshotError(Exception):
+    """Raised when snapshots cannot be written or read"""
+
+
+def _month_end(day):
+    following = (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return following - timedelta(days=1)
+
+
+def period_ends(start, end, granularity):
+    """Snapshot dates in [start, end]: every day, or the last day of every month"""
+    days = []
+    day = start if granularity == 'daily' else _month_end(start)
+    while day <= end:
+        days.append(day)
+        day = day + timedelta(days=1) if granularity == 'daily' else _month_end(day + timedelta(days=1))
+    return days
+
+
+def _movement_deltas(start, end):
+    """Subquery of net movement per product for created_at in [start, end)"""
+    return f"""
+        SELECT product_id, {MOVEMENT_DELTA} AS delta
+        FROM stock_movements
+        WHERE created_at >= %s AND created_at < %s
+        GROUP BY product_id
+    """, (start, end)
+
+
+class SnapshotEngine:
+    """Writes stock_snapshots and answers "stock of every product on day D"
+
+    A snapshot row holds a product's stock at the end of snapshot_date.
+    Snapshots are computed backwards from the live stock_quantity, so they
+    agree with today's figures even if early history has no movements. Stock
+    on any day is then the nearest earlier snapshot plus at most one period of
+    movements, however many years of movements there are.
+    """
+
+    def __init__(self, granularity=None, progress_callback=None):
+        config = get_snapshot_config()
+        self.granularity = granularity or config['granularity']
+        if self.granularity not in ('daily', 'monthly'):
+            raise SnapshotError(f"Unknown snapshot granularity {self.granularity}")
+        self.backfill_days = config['backfill_days']
+        self.progress_callback = progress_callback
+
+    def latest_complete_period(self, today=None):
+        """The newest snapshot date whose period has fully ended"""
+        today = today or date.today()
+        if self.granularity == 'daily':
+            return today - timedelta(days=1)
+        return today.replace(day=1) - timedelta(days=1)
+
+    def run(self, today=None):
+        """Write any missing snapshots up to the last complete period; returns the dates written"""
+        started = time.monotonic()
+        upto = self.latest_complete_period(today)
+        db = DatabaseConnection()
+        rows = db.execute_query("SELECT MAX(snapshot_date) AS latest FROM stock_snapshots")
+        if rows is None:
+            raise SnapshotError("Could not read stock_snapshots")
+        latest = rows[0]['latest']
+        if isinstance(latest, str):
+            latest = date.fromisoformat(latest)
+        start = latest + timedelta(days=1) if latest else upto - timedelta(days=self.backfill_days)
+        targets = period_ends(start, upto, self.granularity)
+        if not targets:
+            return []
+
+        # Newest first: each snapshot is the one after it minus the movements in between
+        later = None
+        for step, day in enumerate(reversed(targets)):
+            self._report(step * 100 // len(targets), f"Snapshotting stock for {day}...")
+            with db.transaction() as cursor:
+                cursor.execute("DELETE FROM stock_snapshots WHERE snapshot_date = %s", (day,))
+                if later is None:
+                    deltas, params = _movement_deltas(day + timedelta(days=1), date.max)
+                    cursor.execute(f"""
+                        INSERT INTO stock_snapshots (product_id, snapshot_date, stock_quantity)
+                        SELECT p.id, %s, COALESCE(p.stock_quantity, 0) - COALESCE(m.delta, 0)
+                        FROM products p
+                        LEFT JOIN ({deltas}) m ON m.product_id = p.id
+                    """, (day, *params))
+                else:
+                    deltas, params = _movement_deltas(day + timedelta(days=1), later + timedelta(days=1))
+                    cursor.execute(f"""
+                        INSERT INTO stock_snapshots (product_id, snapshot_date, stock_quantity)
+                        SELECT s.product_id, %s, s.stock_quantity - COALESCE(m.delta, 0)
+                        FROM stock_snapshots s
+                        LEFT JOIN ({deltas}) m ON m.product_id = s.product_id
+                        WHERE s.snapshot_date = %s
+                    """, (day, *params, later))
+            later = day
+
+        logger.info(f"Wrote {len(targets)} {self.granularity} stock snapshots "
+                    f"in {time.monotonic() - started:.1f}s")
+        self._report(100, "Snapshots up to date")
+        return targets
+
+    def stock_as_of(self, as_of):
+        """Every product with its stock at the end of as_of, name order
+
+        Rows carry id, name, category, min_stock_level, purchase_price,
+        selling_price, stock_quantity and total_value.
+        """
+        db = DatabaseConnection()
+        rows = db.execute_query(
+            "SELECT MAX(snapshot_date) AS snapshot_date FROM stock_snapshots WHERE snapshot_date <= %s",
+            (as_of,)
+        )
+        if rows is None:
+            raise SnapshotError("Could not read stock_snapshots")
+        snapshot_date = rows[0]['snapshot_date']
+        columns = "p.id, p.name, p.category, p.min_stock_level, p.purchase_price, p.selling_price"
+
+        if snapshot_date:
+            if isinstance(snapshot_date, str):
+                snapshot_date = date.fromisoformat(snapshot_date)
+            deltas, params = _movement_deltas(snapshot_date + timedelta(days=1), as_of + timedelta(days=1))
+            stock = "COALESCE(s.stock_quantity, 0) + COALESCE(m.delta, 0)"
+            query = f"""
+                SELECT {columns}, {stock} AS stock_quantity, ({stock}) * p.selling_price AS total_value
+                FROM products p
+                LEFT JOIN stock_snapshots s ON s.product_id = p.id AND s.snapshot_date = %s
+                LEFT JOIN ({deltas}) m ON m.product_id = p.id
+                ORDER BY p.name ASC
+            """
+            params = (snapshot_date, *params)
+        else:
+            # Older than any snapshot (or none yet): walk back from today's stock
+            deltas, params = _movement_deltas(as_of + timedelta(days=1), date.max)
+            stock = "COALESCE(p.stock_quantity, 0) - COALESCE(m.delta, 0)"
+            query = f"""
+                SELECT {columns}, {stock} AS stock_quantity, ({stock}) * p.selling_price AS total_value
+                FROM products p
+                LEFT JOIN ({deltas}) m ON m.product_id = p.id
+                ORDER BY p.name ASC
+            """
+        result = db.execute_query(query, params)
+        if result is None:
+            raise SnapshotError("Point-in-time stock query failed")
+        return result
+
+    def _report(self, percent, message):
+        if self.progress_callback:
+            self.progress_callback(percent, message)
+
+
+def start_snapshot_job():
+    """Keep snapshots current from a background thread for the life of the process"""
+    interval = get_snapshot_config()['interval']
+
+    def loop():
+        while True:
+            try:
+                SnapshotEngine().run()
+            except Exception as e:
+                logger.error(f"Stock snapshot job failed: {e}")
+            time.sleep(interval)
+
+    thread = threading.Thread(target=loop, name="ssms-stock-snapshots", daemon=True)
+    thread.start()
+    return thread
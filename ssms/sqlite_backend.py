@@ -0,0 +1,360 @@
+"""
+Embedded SQLite Backend for SSMS
+A pymysql-compatible connection over SQLite with MySQL dialect translation
+"""
+
+import logging
+import re
+import sqlite3
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from functools import lru_cache
+
+import pymysql
+
+logger = logging.getLogger(__name__)
+
+PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA cache_size = -65536",  # 64MB page cache
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+)
+
+LOCAL_NOW = "DATETIME('now', 'localtime')"
+LOCAL_TODAY = "DATE('now', 'localtime')"
+
+sqlite3.register_adapter(Decimal, str)
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(timedelta, lambda value: value.total_seconds())
+
+_TOKENS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"|%\((\w+)\)s|%s|%%")
+_FUNCTIONS = re.compile(r"\b(CONCAT|MONTH|YEAR|DAY)\s*\(", re.I)
+_SESSION_SETTING = re.compile(r"^\s*SET\s+(?:SESSION\s+)?(\w+)\s*=\s*(\w+)\s*$", re.I)
+_INLINE_INDEX = re.compile(r"^(?:INDEX|KEY)\s+(\w+)\s*(\(.*\))$", re.I)
+_UNIQUE_KEY = re.compile(r"^UNIQUE\s+(?:KEY|INDEX)\s+\w+\s*(\(.*\))$", re.I)
+_DATE_PARTS = {'MONTH': '%m', 'YEAR': '%Y', 'DAY': '%d'}
+
+
+def split_top_level(text, separator=','):
+    """Split on separators that are not inside parentheses or quotes"""
+    parts, depth, quote, start = [], 0, None, 0
+    for index, char in enumerate(text):
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(text[start:index])
+            start = index + 1
+    parts.append(text[start:])
+    return parts
+
+
+def _matching_paren(text, open_index):
+    """Index of the parenthesis closing the one at open_index"""
+    depth, quote = 0, None
+    for index in range(open_index, len(text)):
+        char = text[index]
+        if quote:
+            if char == quote:
+                quote = None
+        elif char in ("'", '"'):
+            quote = char
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth == 0:
+                return index
+    raise ValueError("Unbalanced parentheses in SQL")
+
+
+def _rewrite_functions(sql):
+    """CONCAT(a, b) -> (a || b); MONTH(x) -> CAST(strftime('%m', x) AS INTEGER)"""
+    match = _FUNCTIONS.search(sql)
+    while match:
+        open_index = match.end() - 1
+        close_index = _matching_paren(sql, open_index)
+        arguments = [_rewrite_functions(part.strip()) for part in split_top_level(sql[open_index + 1:close_index])]
+        name = match.group(1).upper()
+        if name == 'CONCAT':
+            replacement = f"({' || '.join(arguments)})"
+        else:
+            replacement = f"CAST(strftime('{_DATE_PARTS[name]}', {arguments[0]}) AS INTEGER)"
+        sql = sql[:match.start()] + replacement + sql[close_index + 1:]
+        match = _FUNCTIONS.search(sql, match.start() + len(replacement))
+    return sql
+
+
+def _rewrite_placeholders(sql, has_params):
+    """pymysql %s / %(name)s placeholders -> sqlite ? / :name, leaving string literals alone"""
+    def replace(match):
+        token = match.group(0)
+        if token == '%s':
+            return '?'
+        if token == '%%':
+            return '%' if has_params else token
+        if match.group(1):
+            return f":{match.group(1)}"
+        return token
+    return _TOKENS.sub(replace, sql)
+
+
+def _translate_create_table(sql):
+    """Translate a MySQL CREATE TABLE into SQLite DDL plus index and trigger statements"""
+    open_index = sql.index('(')
+    close_index = _matching_paren(sql, open_index)
+    head = sql[:open_index].strip()
+    table = head.split()[-1].strip('`"')
+    statements = []
+    columns = []
+    touch_updated_at = False
+
+    for definition in split_top_level(sql[open_index + 1:close_index]):
+        definition = ' '.join(definition.split())
+        if not definition:
+            continue
+        index = _INLINE_INDEX.match(definition)
+        if index:
+            statements.append(
+                f"CREATE INDEX IF NOT EXISTS {table}_{index.group(1)} ON {table} {index.group(2)}"
+            )
+            continue
+        unique = _UNIQUE_KEY.match(definition)
+        if unique:
+            columns.append(f"UNIQUE {unique.group(1)}")
+            continue
+        if re.search(r"\bON UPDATE CURRENT_TIMESTAMP(?:\(\d\))?", definition, re.I):
+            touch_updated_at = definition.split()[0].strip('`') == 'updated_at'
+            definition = re.sub(r"\s*ON UPDATE CURRENT_TIMESTAMP(?:\(\d\))?", "", definition, flags=re.I)
+        definition = re.sub(r"\b(?:BIG)?INT\s+AUTO_INCREMENT\s+PRIMARY KEY", "INTEGER PRIMARY KEY AUTOINCREMENT",
+                            definition, flags=re.I)
+        definition = re.sub(r"\bENUM\s*\([^)]*\)", "TEXT", definition, flags=re.I)
+        definition = re.sub(r"\bTIMESTAMP\(\d\)", "TIMESTAMP", definition, flags=re.I)
+        definition = re.sub(r"\bDEFAULT CURRENT_TIMESTAMP(?:\(\d\))?", f"DEFAULT ({LOCAL_NOW})",
+                            definition, flags=re.I)
+        columns.append(definition)
+
+    statements.insert(0, f"{head} (\n    " + ",\n    ".join(columns) + "\n)")
+    if touch_updated_at:
+        statements.append(
+            f"CREATE TRIGGER IF NOT EXISTS trg_{table}_updated_at AFTER UPDATE ON {table} "
+            f"FOR EACH ROW WHEN NEW.updated_at IS OLD.updated_at BEGIN "
+            f"UPDATE {table} SET updated_at = {LOCAL_NOW} WHERE rowid = NEW.rowid; END"
+        )
+    return statements
+
+
+def _translate_add_column(table, definition):
+    """ALTER TABLE ADD COLUMN; SQLite only adds columns with a constant default"""
+    definition = re.sub(r"\bENUM\s*\([^)]*\)", "TEXT", definition, flags=re.I)
+    definition = re.sub(r"\bTIMESTAMP\(\d\)", "TIMESTAMP", definition, flags=re.I)
+    definition = re.sub(r"\s*ON UPDATE CURRENT_TIMESTAMP(?:\(\d\))?", "", definition, flags=re.I)
+    stamped = re.search(r"\s*DEFAULT CURRENT_TIMESTAMP(?:\(\d\))?", definition, re.I)
+    if not stamped:
+        return (f"ALTER TABLE {table} ADD COLUMN {definition}",)
+    column = definition.split()[0].strip('`')
+    definition = definition[:stamped.start()] + definition[stamped.end():]
+    # As in MySQL: existing rows get the time of the change, new rows their insert time
+    return (
+        f"ALTER TABLE {table} ADD COLUMN {definition}",
+        f"UPDATE {table} SET {column} = {LOCAL_NOW}",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_{column}_default AFTER INSERT ON {table} "
+        f"FOR EACH ROW WHEN NEW.{column} IS NULL BEGIN "
+        f"UPDATE {table} SET {column} = {LOCAL_NOW} WHERE rowid = NEW.rowid; END",
+    )
+
+
+@lru_cache(maxsize=1024)
+def translate(sql, has_params=True):
+    """Translate one MySQL statement into a tuple of SQLite statements
+
+    Statements with no SQLite equivalent (session settings other than
+    foreign key checks) translate to an empty tuple.
+    """
+    text = sql.strip().rstrip(';').strip()
+    upper = text.upper()
+
+    setting = _SESSION_SETTING.match(text)
+    if setting:
+        if setting.group(1).lower() == 'foreign_key_checks':
+            return (f"PRAGMA foreign_keys = {'ON' if setting.group(2) in ('1', 'ON', 'on') else 'OFF'}",)
+        return ()
+    if upper.startswith('START TRANSACTION'):
+        return ("BEGIN IMMEDIATE",)
+    if upper.startswith('TRUNCATE TABLE'):
+        return (f"DELETE FROM {text.split()[2]}",)
+    if upper.startswith(('ANALYZE TABLE', 'OPTIMIZE TABLE')):
+        return (f"ANALYZE {text.split()[2]}",)
+    if upper.startswith('CREATE TABLE'):
+        return tuple(_translate_create_table(text))
+    # Index names are per table in MySQL but per database in SQLite
+    index = re.match(r"^CREATE\s+(UNIQUE\s+)?INDEX\s+`?(\w+)`?\s+ON\s+`?(\w+)`?\s*(\(.*\))$", text, re.I | re.S)
+    if index:
+        unique, name, table, columns = index.groups()
+        return (f"CREATE {unique or ''}INDEX {table}_{name} ON {table} {columns}",)
+    index = re.match(r"^DROP\s+INDEX\s+`?(\w+)`?\s+ON\s+`?(\w+)`?$", text, re.I)
+    if index:
+        return (f"DROP INDEX {index.group(2)}_{index.group(1)}",)
+    if upper.startswith('ALTER TABLE'):
+        # Online DDL options mean nothing to SQLite
+        text = re.sub(r"\s*,\s*(?:ALGORITHM|LOCK)\s*=\s*\w+", "", text, flags=re.I)
+        index = re.match(r"^ALTER\s+TABLE\s+`?(\w+)`?\s+ADD\s+(?:INDEX|KEY)\s+`?(\w+)`?\s*(\(.*\))$",
+                         text, re.I | re.S)
+        if index:
+            table, name, columns = index.groups()
+            return (f"CREATE INDEX {table}_{name} ON {table} {columns}",)
+        column = re.match(r"^ALTER\s+TABLE\s+`?(\w+)`?\s+ADD\s+(?:COLUMN\s+)?(.*)$", text, re.I | re.S)
+        if column:
+            return _translate_add_column(column.group(1), ' '.join(column.group(2).split()))
+    if upper.startswith('CREATE TRIGGER') and ' BEGIN ' not in f" {upper} ":
+        head, _, body = re.split(r"(FOR EACH ROW)", text, maxsplit=1, flags=re.I)
+        return (f"{head} FOR EACH ROW BEGIN {body.strip()}; END",)
+
+    text = _rewrite_functions(text)
+    text = re.sub(r"\bCURRENT_DATE\(\)|\bCURDATE\(\)", LOCAL_TODAY, text, flags=re.I)
+    text = re.sub(r"\bNOW\(\)|\bCURRENT_TIMESTAMP\(\)", LOCAL_NOW, text, flags=re.I)
+    text = re.sub(r"\bLAST_INSERT_ID\(\)", "last_insert_rowid()", text, flags=re.I)
+    text = re.sub(r"^INSERT\s+IGNORE\b", "INSERT OR IGNORE", text, flags=re.I)
+    text = re.sub(r"\s+FOR UPDATE$", "", text, flags=re.I)
+    duplicate = re.search(r"\bON DUPLICATE KEY UPDATE\b", text, re.I)
+    if duplicate:
+        updates = re.sub(r"\bVALUES\s*\(\s*`?(\w+)`?\s*\)", r"excluded.\1", text[duplicate.end():], flags=re.I)
+        text = f"{text[:duplicate.start()]}ON CONFLICT DO UPDATE SET{updates}"
+    return (_rewrite_placeholders(text, has_params),)
+
+
+def _translate_error(error):
+    """Re-raise sqlite3 errors as the pymysql exceptions callers already handle"""
+    if isinstance(error, sqlite3.IntegrityError):
+        return pymysql.err.IntegrityError(1062, str(error))
+    if isinstance(error, sqlite3.OperationalError):
+        message = str(error)
+        if 'locked' in message or 'busy' in message:
+            return pymysql.err.OperationalError(1205, message)
+        if 'unable to open' in message or 'disk' in message:
+            return pymysql.err.OperationalError(2013, message)
+        # Missing tables and columns, syntax errors: rejected statements, as in MySQL
+        return pymysql.err.ProgrammingError(1064, message)
+    if isinstance(error, sqlite3.ProgrammingError):
+        return pymysql.err.ProgrammingError(1064, str(error))
+    return pymysql.err.DatabaseError(2000, str(error))
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteCursor:
+    """Dictionary cursor mirroring the pymysql DictCursor methods used by SSMS"""
+
+    def __init__(self, connection):
+        self._connection = connection
+        self._cursor = connection.raw.cursor()
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, query, args=None):
+        statements = translate(query, args is not None)
+        try:
+            for statement in statements:
+                # Multi-statement translations are DDL and never take parameters
+                self._cursor.execute(statement, args if args is not None and len(statements) == 1 else ())
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+        return self.rowcount
+
+    def executemany(self, query, args):
+        statements = translate(query, True)
+        try:
+            for statement in statements:
+                self._cursor.executemany(statement, args)
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+        return self.rowcount
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self._cursor.arraysize)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """pymysql-style connection over an SQLite database file"""
+
+    def __init__(self, path, autocommit=True):
+        try:
+            self.raw = sqlite3.connect(path, timeout=5, check_same_thread=False,
+                                       isolation_level=None if autocommit else 'DEFERRED')
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+        self.raw.row_factory = _dict_row
+        for pragma in PRAGMAS:
+            self.raw.execute(pragma)
+
+    @property
+    def open(self):
+        try:
+            self.raw.total_changes
+            return True
+        except sqlite3.ProgrammingError:
+            return False
+
+    def cursor(self):
+        return SQLiteCursor(self)
+
+    def autocommit(self, value):
+        self.raw.isolation_level = None if value else 'DEFERRED'
+
+    def begin(self):
+        # Take the write lock up front so concurrent writers queue instead of deadlocking
+        if not self.raw.in_transaction:
+            self.raw.execute("BEGIN IMMEDIATE")
+
+    def commit(self):
+        self.raw.commit()
+
+    def rollback(self):
+        self.raw.rollback()
+
+    def ping(self, reconnect=False):
+        self.raw.execute("SELECT 1")
+
+    def close(self):
+        self.raw.close()
+
+
+def connect(path, **kwargs):
+    """Open an SQLite database with the SSMS pragmas applied"""
+    return SQLiteConnection(str(path), autocommit=kwargs.get('autocommit', True))
@@ -0,0 +1,366 @@
+"""
+Stock Ledger for SSMS
+Records sales and purchases together with their stock movements in one transaction
+"""
+
+import logging
+import threading
+import time
+from decimal import Decimal
+
+import pymysql
+
+from config import get_stock_config
+from db_connection import DatabaseConnection
+from ssms.customer_stats import record_orders
+from ssms.forecast import RECEIVE_DEMANDS, receive_demands
+from ssms.offline_queue import QUEUED, offline_queue
+
+logger = logging.getLogger(__name__)
+
+# Lock wait timeout and deadlock: the transaction was rolled back and can simply run again
+RETRY_ERRORS = (1205, 1213)
+
+
+class StockError(Exception):
+    """A sale or purchase that cannot be recorded as given"""
+
+
+class UnknownProduct(StockError):
+    def __init__(self, products):
+        self.products = products
+        super().__init__(f"Unknown product: {', '.join(str(p) for p in products)}")
+
+
+class InsufficientStock(StockError):
+    """Raised instead of overselling; shortages lists each product that is short"""
+
+    def __init__(self, shortages):
+        self.shortages = shortages
+        super().__init__("Insufficient stock: " + ", ".join(
+            f"{s['name']} (requested {s['requested']}, available {s['available']})" for s in shortages
+        ))
+
+
+_stats = {'sales': 0, 'purchases': 0, 'lines': 0, 'oversell_rejections': 0, 'lock_retries': 0, 'queued': 0}
+_stats_lock = threading.Lock()
+
+
+def _count(**deltas):
+    with _stats_lock:
+        for name, delta in deltas.items():
+            _stats[name] += delta
+
+
+def ledger_stats():
+    """Counters for the System Information dialog"""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def _line_total(line):
+    return (Decimal(str(line['unit_price'])) * line['quantity'] - Decimal(str(line.get('discount_amount', 0))))
+
+
+class StockLedger:
+    """Applies orders and their stock_movements atomically
+
+    An order is a list of lines, each a dict with product_id or product_name,
+    quantity and unit_price (sales also take discount_amount, purchases
+    batch_number). All lines of an order commit together or not at all.
+    Product rows are locked in id order with SELECT ... FOR UPDATE, so two
+    tills selling the same products queue behind each other instead of
+    deadlocking or overselling.
+    """
+
+    def __init__(self, db=None):
+        config = get_stock_config()
+        self.db = db or DatabaseConnection()
+        self.lock_retries = config['lock_retries']
+        self.allow_oversell = config['allow_oversell']
+
+    def record_sale(self, lines, customer_id=None, customer_name=None, payment_method='Cash',
+                    payment_status='Paid', notes=None):
+        """Record a sale order; returns the new sales ids, one per line
+
+        Raises InsufficientStock, leaving stock untouched, if any line would
+        take a product below zero.
+        """
+        def work(cursor):
+            products = self._lock_products(cursor, lines)
+            quantities = self._quantities(lines, products)
+            if not self.allow_oversell:
+                shortages = [
+                    {"product_id": product_id, "name": products[product_id]['name'],
+                     "requested": quantity, "available": products[product_id]['stock_quantity']}
+                    for product_id, quantity in quantities.items()
+                    if products[product_id]['stock_quantity'] < quantity
+                ]
+                if shortages:
+                    _count(oversell_rejections=1)
+                    raise InsufficientStock(shortages)
+
+            sale_ids = []
+            movements = []
+            for line in lines:
+                product = products[self._product_key(line, products)]
+                discount = Decimal(str(line.get('discount_amount', 0)))
+                cursor.execute("""
+                    INSERT INTO sales (customer_id, customer_name, product_id, product_name, quantity,
+                                       unit_price, total_amount, discount_amount, payment_method,
+                                       payment_status, notes)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, (customer_id, customer_name, product['id'], product['name'], line['quantity'],
+                      line['unit_price'], _line_total(line), discount, payment_method, payment_status, notes))
+                sale_ids.append(cursor.lastrowid)
+                movements.append((product['id'], 'OUT', line['quantity'], 'SALE', cursor.lastrowid, notes))
+
+            self._write_movements(cursor, movements)
+            if customer_id:
+                record_orders(cursor, customer_id, len(lines), sum(_line_total(line) for line in lines))
+            guard = "" if self.allow_oversell else " AND stock_quantity >= %s"
+            updates = [
+                (quantity, product_id) + (() if self.allow_oversell else (quantity,))
+                for product_id, quantity in sorted(quantities.items())
+            ]
+            cursor.executemany(
+                f"UPDATE products SET stock_quantity = stock_quantity - %s WHERE id = %s{guard}", updates
+            )
+            if cursor.rowcount != len(updates):
+                # Only reachable if something changed stock without taking the row lock
+                raise InsufficientStock([])
+            return sale_ids
+
+        sale_ids = self._run(work)
+        _count(sales=1, lines=len(lines))
+        return sale_ids
+
+    def record_purchase(self, lines, supplier_name, purchase_date, payment_method='Bank Transfer',
+                        payment_status='Pending', notes=None, offline=False):
+        """Record a purchase order; returns the new purchases ids, one per line
+
+        With offline=True the order is journaled, and offline_queue.QUEUED is
+        returned, when the server cannot be reached. Receiving goods only adds
+        stock, so it is safe to apply later; sales are never journaled.
+        """
+        def work(cursor):
+            products = self._lock_products(cursor, lines)
+            purchase_ids = []
+            movements = []
+            for line in lines:
+                product = products[self._product_key(line, products)]
+                cursor.execute("""
+                    INSERT INTO purchases (supplier_name, product_id, product_name, batch_number, quantity,
+                                           unit_price, total_amount, purchase_date, payment_method,
+                                           payment_status, notes)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, (supplier_name, product['id'], product['name'], line.get('batch_number') or None,
+                      line['quantity'], line['unit_price'], _line_total(line), purchase_date, payment_method,
+                      payment_status, notes))
+                purchase_ids.append(cursor.lastrowid)
+                movements.append((product['id'], 'IN', line['quantity'], 'PURCHASE', cursor.lastrowid,
+                                  line.get('notes') or notes))
+
+            self._write_movements(cursor, movements)
+            quantities = self._quantities(lines, products)
+            cursor.executemany(
+                "UPDATE products SET stock_quantity = stock_quantity + %s WHERE id = %s",
+                [(quantity, product_id) for product_id, quantity in sorted(quantities.items())]
+            )
+            receive_demands(cursor, quantities)
+            return purchase_ids
+
+        args = (lines, supplier_name, purchase_date, payment_method, payment_status, notes)
+        if offline and offline_queue.has_pending():
+            return self._journal_purchase(*args)
+        try:
+            purchase_ids = self._run(work)
+        except pymysql.err.OperationalError as e:
+            if not offline or e.args[0] < 2000:
+                raise
+            return self._journal_purchase(*args)
+        _count(purchases=1, lines=len(lines))
+        return purchase_ids
+
+    def update_purchase(self, purchase_id, data):
+        """Edit a purchase, correcting stock for any change of product or quantity; returns purchase_id
+
+        The difference is written as signed ADJUSTMENT movements referencing
+        the purchase, in the same transaction as the edit. Raises
+        InsufficientStock if the correction would take a product below zero.
+        """
+        def work(cursor):
+            cursor.execute("SELECT product_id, quantity FROM purchases WHERE id = %s FOR UPDATE", (purchase_id,))
+            old = cursor.fetchone()
+            if old is None:
+                raise StockError(f"Unknown purchase: {purchase_id}")
+            line = {'product_id': data['product_id'], 'product_name': data['product_name'],
+                    'quantity': data['quantity']}
+            lines = [line] + ([{'product_id': old['product_id']}] if old['product_id'] else [])
+            products = self._lock_products(cursor, lines)
+            product = products[self._product_key(line, products)]
+            self._quantities([line], products)
+
+            deltas = {}
+            if old['product_id']:
+                deltas[old['product_id']] = -old['quantity']
+            deltas[product['id']] = deltas.get(product['id'], 0) + data['quantity']
+            deltas = {product_id: delta for product_id, delta in sorted(deltas.items()) if delta}
+            if not self.allow_oversell:
+                shortages = [
+                    {"product_id": product_id, "name": products[product_id]['name'],
+                     "requested": -delta, "available": products[product_id]['stock_quantity']}
+                    for product_id, delta in deltas.items()
+                    if products[product_id]['stock_quantity'] + delta < 0
+                ]
+                if shortages:
+                    _count(oversell_rejections=1)
+                    raise InsufficientStock(shortages)
+
+            cursor.execute("""
+                UPDATE purchases SET supplier_name = %s, product_id = %s, product_name = %s, batch_number = %s,
+                                   quantity = %s, unit_price = %s, total_amount = %s,
+                                   purchase_date = %s, payment_method = %s, payment_status = %s,
+                                   notes = %s, updated_at = NOW()
+                WHERE id = %s
+            """, (data['supplier_name'], product['id'], product['name'], data['batch_number'], data['quantity'],
+                  data['unit_price'], data['total_amount'], data['purchase_date'], data['payment_method'],
+                  data['payment_status'], data['notes'], purchase_id))
+            self._write_movements(cursor, [
+                (product_id, 'ADJUSTMENT', delta, 'PURCHASE', purchase_id, f"Purchase {purchase_id} edited")
+                for product_id, delta in deltas.items()
+            ])
+            cursor.executemany(
+                "UPDATE products SET stock_quantity = stock_quantity + %s WHERE id = %s",
+                [(delta, product_id) for product_id, delta in deltas.items()]
+            )
+            return purchase_id
+
+        return self._run(work)
+
+    def delete_purchase(self, purchase_id):
+        """Delete a purchase and take its stock back out; returns purchase_id
+
+        The removal is written as a negative ADJUSTMENT movement referencing
+        the purchase. Raises InsufficientStock if the stock has already been
+        sold.
+        """
+        def work(cursor):
+            cursor.execute("SELECT product_id, quantity FROM purchases WHERE id = %s FOR UPDATE", (purchase_id,))
+            old = cursor.fetchone()
+            if old is None:
+                raise StockError(f"Unknown purchase: {purchase_id}")
+            if old['product_id']:
+                products = self._lock_products(cursor, [{'product_id': old['product_id']}])
+                product = products[old['product_id']]
+                if not self.allow_oversell and product['stock_quantity'] < old['quantity']:
+                    _count(oversell_rejections=1)
+                    raise InsufficientStock([{"product_id": product['id'], "name": product['name'],
+                                              "requested": old['quantity'],
+                                              "available": product['stock_quantity']}])
+                self._write_movements(cursor, [(product['id'], 'ADJUSTMENT', -old['quantity'], 'PURCHASE',
+                                                purchase_id, f"Purchase {purchase_id} deleted")])
+                cursor.execute("UPDATE products SET stock_quantity = stock_quantity - %s WHERE id = %s",
+                               (old['quantity'], product['id']))
+            cursor.execute("DELETE FROM purchases WHERE id = %s", (purchase_id,))
+            return purchase_id
+
+        return self._run(work)
+
+    def _journal_purchase(self, lines, supplier_name, purchase_date, payment_method, payment_status, notes):
+        """Journal a purchase as statements that replay in one transaction, matching products by name"""
+        statements = []
+        for line in lines:
+            product = ("(SELECT id FROM products WHERE id = %s)" if line.get('product_id')
+                       else "(SELECT id FROM products WHERE name = %s ORDER BY id LIMIT 1)")
+            # MySQL rejects an UPDATE reading its own table in a subquery (error 1093), so the
+            # stock update matches the same row directly
+            target = "id = %s" if line.get('product_id') else "name = %s ORDER BY id LIMIT 1"
+            key = line.get('product_id') or line['product_name']
+            statements += [
+                (f"""
+                    INSERT INTO purchases (supplier_name, product_id, product_name, batch_number, quantity,
+                                           unit_price, total_amount, purchase_date, payment_method,
+                                           payment_status, notes)
+                    VALUES (%s, {product}, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+                """, (supplier_name, key, line.get('product_name'), line.get('batch_number') or None,
+                      line['quantity'], line['unit_price'], _line_total(line), purchase_date, payment_method,
+                      payment_status, notes)),
+                (f"""
+                    INSERT INTO stock_movements (product_id, movement_type, quantity, reference_type,
+                                                 reference_id, notes)
+                    VALUES ({product}, 'IN', %s, 'PURCHASE', LAST_INSERT_ID(), %s)
+                """, (key, line['quantity'], line.get('notes') or notes)),
+                (f"UPDATE products SET stock_quantity = stock_quantity + %s WHERE {target}",
+                 (line['quantity'], key)),
+                (RECEIVE_DEMANDS.format(product=product), (key,)),
+            ]
+        offline_queue.enqueue(statements, entity='purchase', payload={
+            **lines[0], 'supplier_name': supplier_name, 'purchase_date': purchase_date,
+            'total_amount': sum(_line_total(line) for line in lines), 'lines': len(lines),
+        })
+        _count(queued=1)
+        return QUEUED
+
+    def _run(self, work):
+        """Run work(cursor) in a transaction, retrying after deadlocks and lock wait timeouts"""
+        for attempt in range(self.lock_retries + 1):
+            try:
+                with self.db.transaction() as cursor:
+                    return work(cursor)
+            except pymysql.err.OperationalError as e:
+                if e.args[0] not in RETRY_ERRORS or attempt == self.lock_retries:
+                    raise
+                _count(lock_retries=1)
+                logger.warning(f"Stock transaction retried after lock conflict: {e}")
+                time.sleep(0.05 * (attempt + 1))
+
+    def _lock_products(self, cursor, lines):
+        """Lock every product in the order, in id order; returns rows by id and by name"""
+        ids = sorted({line['product_id'] for line in lines if line.get('product_id')})
+        names = sorted({line['product_name'] for line in lines if not line.get('product_id')})
+        clauses, params = [], []
+        if ids:
+            clauses.append(f"id IN ({', '.join(['%s'] * len(ids))})")
+            params += ids
+        if names:
+            clauses.append(f"name IN ({', '.join(['%s'] * len(names))})")
+            params += names
+        if not clauses:
+            raise StockError("An order needs at least one line")
+        cursor.execute(f"""
+            SELECT id, name, stock_quantity FROM products
+            WHERE {' OR '.join(clauses)}
+            ORDER BY id
+            FOR UPDATE
+        """, params)
+        products = {}
+        for row in cursor.fetchall():
+            products[row['id']] = row
+            products.setdefault(row['name'], row)
+        missing = [key for key in ids + names if key not in products]
+        if missing:
+            raise UnknownProduct(missing)
+        return products
+
+    @staticmethod
+    def _product_key(line, products):
+        return line['product_id'] if line.get('product_id') else products[line['product_name']]['id']
+
+    def _quantities(self, lines, products):
+        """Total quantity per product id; an order may list a product more than once"""
+        quantities = {}
+        for line in lines:
+            if line['quantity'] <= 0:
+                raise StockError(f"Quantity must be positive, got {line['quantity']}")
+            product_id = self._product_key(line, products)
+            quantities[product_id] = quantities.get(product_id, 0) + line['quantity']
+        return quantities
+
+    @staticmethod
+    def _write_movements(cursor, movements):
+        cursor.executemany("""
+            INSERT INTO stock_movements (product_id, movement_type, quantity, reference_type,
+                                         reference_id, notes)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, movements)
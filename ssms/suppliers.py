@@ -0,0 +1,123 @@
+"""
+Supplier Performance for SSMS
+Spend, price trend and payment record of every supplier from one grouped query
+"""
+
+import logging
+import re
+from datetime import date, timedelta
+
+from db_connection import DatabaseConnection
+
+logger = logging.getLogger(__name__)
+
+# Unit prices of the last PRICE_WINDOW_DAYS are compared with the window before
+PRICE_WINDOW_DAYS = 90
+
+# Payment terms are counted in these steps; "Net 45" is judged against 60 days
+TERMS_DAYS = (7, 15, 30, 60, 90)
+DEFAULT_TERMS_DAYS = 30
+
+
+class SupplierError(Exception):
+    """Raised when supplier figures cannot be read"""
+
+
+def terms_days(payment_terms):
+    """Days allowed by terms such as "Net 30", rounded up to a TERMS_DAYS step"""
+    match = re.search(r"\d+", payment_terms or "")
+    days = int(match.group()) if match else DEFAULT_TERMS_DAYS
+    return next((step for step in TERMS_DAYS if step >= days), TERMS_DAYS[-1])
+
+
+def supplier_performance(today=None, db=None):
+    """Every supplier in the directory or on a purchase, biggest spend first
+
+    Rows carry name, contact_person, phone, payment_terms, orders, units,
+    spend, avg_unit_price, price_change (recent unit prices against the
+    previous window for the same products, None without overlap),
+    paid_orders, pending_orders, partial_orders, outstanding,
+    overdue_orders (unpaid past the supplier's terms), on_time_rate (share
+    of orders paid or still within terms) and last_purchase.
+    """
+    today = today or date.today()
+    db = db or DatabaseConnection()
+    recent = today - timedelta(days=PRICE_WINDOW_DAYS)
+    prior = recent - timedelta(days=PRICE_WINDOW_DAYS)
+    overdue_columns = ",\n".join(
+        f"SUM(CASE WHEN payment_status <> 'Paid' AND purchase_date < %s THEN 1 ELSE 0 END) AS overdue_{days}"
+        for days in TERMS_DAYS
+    )
+    stats = db.execute_query(f"""
+        SELECT s.*, t.price_index
+        FROM (
+            SELECT supplier_name, COUNT(*) AS orders, SUM(quantity) AS units,
+                   SUM(total_amount) AS spend,
+                   SUM(unit_price * quantity) * 1.0 / NULLIF(SUM(quantity), 0) AS avg_unit_price,
+                   MAX(purchase_date) AS last_purchase,
+                   SUM(CASE WHEN payment_status = 'Paid' THEN 1 ELSE 0 END) AS paid_orders,
+                   SUM(CASE WHEN payment_status = 'Pending' THEN 1 ELSE 0 END) AS pending_orders,
+                   SUM(CASE WHEN payment_status = 'Partially Paid' THEN 1 ELSE 0 END) AS partial_orders,
+                   SUM(CASE WHEN payment_status <> 'Paid' THEN total_amount ELSE 0 END) AS outstanding,
+                   {overdue_columns}
+            FROM purchases
+            GROUP BY supplier_name
+        ) s
+        LEFT JOIN (
+            SELECT supplier_name, SUM(recent_price * recent_units) / SUM(prior_price * recent_units) AS price_index
+            FROM (
+                SELECT supplier_name, product_id,
+                       SUM(CASE WHEN purchase_date >= %s THEN unit_price * quantity END) * 1.0
+                           / SUM(CASE WHEN purchase_date >= %s THEN quantity END) AS recent_price,
+                       SUM(CASE WHEN purchase_date >= %s THEN quantity END) AS recent_units,
+                       SUM(CASE WHEN purchase_date < %s THEN unit_price * quantity END) * 1.0
+                           / SUM(CASE WHEN purchase_date < %s THEN quantity END) AS prior_price
+                FROM purchases
+                WHERE purchase_date >= %s AND product_id IS NOT NULL
+                GROUP BY supplier_name, product_id
+            ) by_product
+            WHERE recent_price IS NOT NULL AND prior_price IS NOT NULL
+            GROUP BY supplier_name
+        ) t ON t.supplier_name = s.supplier_name
+    """, (*(today - timedelta(days=days) for days in TERMS_DAYS), recent, recent, recent, recent, recent, prior))
+    directory = db.execute_query("SELECT name, contact_person, phone, payment_terms FROM suppliers")
+    if stats is None or directory is None:
+        raise SupplierError("Could not read supplier figures")
+
+    suppliers = {
+        supplier['name']: {"contact_person": supplier['contact_person'], "phone": supplier['phone'],
+                           "payment_terms": supplier['payment_terms']}
+        for supplier in directory
+    }
+    rows = []
+    for row in stats:
+        supplier = suppliers.pop(row['supplier_name'], {})
+        terms = supplier.get('payment_terms')
+        overdue = int(row[f"overdue_{terms_days(terms)}"] or 0)
+        rows.append({
+            "name": row['supplier_name'],
+            "contact_person": supplier.get('contact_person'),
+            "phone": supplier.get('phone'),
+            "payment_terms": terms,
+            "orders": row['orders'],
+            "units": int(row['units'] or 0),
+            "spend": float(row['spend'] or 0),
+            "avg_unit_price": float(row['avg_unit_price'] or 0),
+            "price_change": float(row['price_index']) - 1 if row['price_index'] is not None else None,
+            "paid_orders": int(row['paid_orders']),
+            "pending_orders": int(row['pending_orders']),
+            "partial_orders": int(row['partial_orders']),
+            "outstanding": float(row['outstanding'] or 0),
+            "overdue_orders": overdue,
+            "on_time_rate": 1 - overdue / row['orders'],
+            "last_purchase": row['last_purchase'],
+        })
+    # Suppliers nothing has been bought from yet
+    for name, supplier in suppliers.items():
+        rows.append({
+            "name": name, **supplier, "orders": 0, "units": 0, "spend": 0.0, "avg_unit_price": 0.0,
+            "price_change": None, "paid_orders": 0, "pending_orders": 0, "partial_orders": 0,
+            "outstanding": 0.0, "overdue_orders": 0, "on_time_rate": None, "last_purchase": None,
+        })
+    rows.sort(key=lambda row: row['spend'], reverse=True)
+    return rows